@@ -1,3 +1,4 @@
+import json
 import os
 from logging.config import fileConfig
 
@@ -6,7 +7,20 @@ from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.future import Connection
 
 from alembic import context
-from app.api.models import Transaction, User
+from app.api.models import (
+    AccrualChunk,
+    AccrualRule,
+    AccrualRun,
+    AppliedTransfer,
+    ArchivedTransaction,
+    Hold,
+    IdCounter,
+    OutboxEvent,
+    ScheduledTransfer,
+    Transaction,
+    TransferIntent,
+    User,
+)
 from app.core.db import Base
 
 # this is the Alembic Config object, which provides
@@ -48,17 +62,26 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-async def run_migrations_online() -> None:
-    """Запуск миграций в онлайн-режиме."""
-    connectable = create_async_engine(
-        config.get_main_option("sqlalchemy.url"),
-        future=True,
-    )
+def get_database_urls() -> list:
+    """URL основной базы и дополнительных шардов (SHARD_URLS)."""
+    urls = [config.get_main_option("sqlalchemy.url")]
+    shard_urls = os.environ.get("SHARD_URLS")
+    if shard_urls:
+        urls.extend(json.loads(shard_urls))
+    return urls
 
-    async with connectable.connect() as connection:
-        await connection.run_sync(do_run_migrations)
 
-    await connectable.dispose()
+async def run_migrations_online() -> None:
+    """Запуск миграций в онлайн-режиме на всех шардах."""
+    for url in get_database_urls():
+        connectable = create_async_engine(url, future=True)
+        try:
+            async with connectable.connect() as connection:
+                await connection.run_sync(do_run_migrations)
+        finally:
+            # Иначе после ошибки миграции соединения aiosqlite не
+            # закрываются и процесс не завершается.
+            await connectable.dispose()
 
 
 def do_run_migrations(connection: Connection) -> None:
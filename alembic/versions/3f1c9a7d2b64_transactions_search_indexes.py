@@ -0,0 +1,50 @@
+"""transactions search indexes
+
+Revision ID: 3f1c9a7d2b64
+Revises: eedb20a224ed
+Create Date: 2026-10-19 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2b64'
+down_revision: Union[str, None] = 'eedb20a224ed'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_transactions_user_id_id', ['user_id', 'id']),
+    ('ix_transactions_user_id_type_id', ['user_id', 'type', 'id']),
+    ('ix_transactions_user_id_created_at', ['user_id', 'created_at']),
+    ('ix_transactions_user_id_amount', ['user_id', 'amount']),
+    ('ix_transactions_type_created_at', ['type', 'created_at']),
+    ('ix_transactions_created_at', ['created_at']),
+)
+
+
+def upgrade() -> None:
+    # Индексы строятся CONCURRENTLY, чтобы не блокировать запись в журнал.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name,
+                'transactions',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name='transactions',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
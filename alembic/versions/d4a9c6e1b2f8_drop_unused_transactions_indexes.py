@@ -0,0 +1,47 @@
+"""drop unused transactions indexes
+
+Revision ID: d4a9c6e1b2f8
+Revises: c2f8e5a1d7b3
+Create Date: 2026-10-20 14:05:18.207396
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a9c6e1b2f8'
+down_revision: Union[str, None] = 'c2f8e5a1d7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Поиск идет по ключу (id DESC) и обслуживается индексами (user_id, id)
+# и (user_id, type, id), эти индексы его не ускоряют.
+INDEXES = (
+    ('ix_transactions_user_id_amount', ['user_id', 'amount']),
+    ('ix_transactions_type_created_at', ['type', 'created_at']),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.drop_index(
+                name,
+                table_name='transactions',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name,
+                'transactions',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
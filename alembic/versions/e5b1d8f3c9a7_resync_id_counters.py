@@ -0,0 +1,34 @@
+"""resync id counters
+
+Revision ID: e5b1d8f3c9a7
+Revises: d4a9c6e1b2f8
+Create Date: 2026-10-20 16:41:09.512837
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b1d8f3c9a7'
+down_revision: Union[str, None] = 'd4a9c6e1b2f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTED_TABLES = ('users', 'scheduled_transfers', 'holds')
+
+
+def upgrade() -> None:
+    # До этой версии без шардирования ID выдавали последовательности
+    # таблиц, а счетчики оставались на значениях времени миграции.
+    for table in COUNTED_TABLES:
+        op.execute(
+            f"UPDATE id_counters SET last_id = "
+            f"(SELECT COALESCE(MAX(id), 0) FROM {table}) "
+            f"WHERE id = '{table}' "
+            f"AND last_id < (SELECT COALESCE(MAX(id), 0) FROM {table})"
+        )
+
+
+def downgrade() -> None:
+    pass
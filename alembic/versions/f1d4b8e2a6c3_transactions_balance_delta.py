@@ -0,0 +1,239 @@
+"""transactions balance delta
+
+Revision ID: f1d4b8e2a6c3
+Revises: e3b7a1c5d2f4
+Create Date: 2026-10-19 20:12:37.584021
+
+"""
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Sequence, Set, Tuple, Union
+
+import sqlalchemy as sa
+
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1d4b8e2a6c3'
+down_revision: Union[str, None] = 'e3b7a1c5d2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Записи перевода внутри одной базы создавались по очереди (отправитель,
+# затем получатель), до этой версии - каждая в своей транзакции БД со
+# своим created_at. Запись получателя ищется среди следующих записей
+# с той же суммой, созданных не позже этого окна.
+TRANSFER_PAIR_WINDOW = timedelta(seconds=5)
+
+UPDATE_CHUNK_SIZE = 1000
+
+
+def pair_transfers(rows) -> Tuple[Set[int], Set[int]]:
+    """
+    Сопоставление записей переводов (id, user_id, amount, created_at),
+    переданных в порядке ID.
+
+    Запись получателя - следующая по ID запись другого пользователя с
+    той же суммой, созданная не позже TRANSFER_PAIR_WINDOW после записи
+    отправителя. Ранняя запись пары - исходящая.
+
+    Returns:
+        Tuple[Set[int], Set[int]]: ID исходящих и входящих записей пар.
+        Записи без пары в результат не входят.
+    """
+    open_rows: Dict[float, List[tuple]] = defaultdict(list)
+    debits = set()
+    credits = set()
+    for row_id, user_id, amount, created_at in rows:
+        candidates = open_rows[amount]
+        while candidates and (
+            created_at - candidates[0][2] > TRANSFER_PAIR_WINDOW
+        ):
+            candidates.pop(0)
+        for index, (open_id, open_user_id, open_created_at) in enumerate(
+            candidates
+        ):
+            if open_user_id != user_id and open_created_at <= created_at:
+                debits.add(open_id)
+                credits.add(row_id)
+                del candidates[index]
+                break
+        else:
+            candidates.append((row_id, user_id, created_at))
+    return debits, credits
+
+
+def _negate(bind, ids) -> None:
+    """
+    Изменение знака balance_delta записей порциями.
+    """
+    ids = sorted(ids)
+    statement = sa.text(
+        "UPDATE transactions SET balance_delta = -amount WHERE id IN :ids"
+    ).bindparams(sa.bindparam("ids", expanding=True))
+    for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+        bind.execute(statement, {"ids": ids[start:start + UPDATE_CHUNK_SIZE]})
+
+
+class AmbiguousTransfersError(RuntimeError):
+    """
+    Направление части записей переводов не удалось определить.
+    """
+
+    def __init__(self, ids: List[int]):
+        self.ids = ids
+        super().__init__(
+            f"Направление {len(ids)} записей переводов не определено: "
+            f"{ids[:1000]}. Укажите его явно: alembic -x debit_ids=1,2 "
+            f"-x credit_ids=3,4 upgrade head"
+        )
+
+
+def _parse_ids(value: str) -> List[int]:
+    """
+    Разбор списка ID из аргумента -x (через запятую).
+    """
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def backfill_balance_delta(
+    bind,
+    debit_ids: Iterable[int] = (),
+    credit_ids: Iterable[int] = (),
+) -> None:
+    """
+    Заполнение balance_delta существующих транзакций.
+
+    Исходящий перевод не отличить от входящего по самой записи.
+    Межшардовые списания находятся по transfer_intents (создаются в одной
+    транзакции БД со списанием), зачисления - по applied_transfers.
+    Остальные записи переводов сопоставляются парами (pair_transfers).
+    Знак записи без пары задается явно (debit_ids, credit_ids) или
+    определяется по балансу пользователя, если у него одна такая запись
+    и баланс сходится только с одним знаком.
+
+    Raises:
+        AmbiguousTransfersError: Если направление части записей не
+            определено. Миграция прерывается, чтобы эти записи не
+            искажали ряды балансов, выписки и лимиты операций.
+    """
+    bind.execute(sa.text(
+        "UPDATE transactions SET balance_delta = CASE "
+        "WHEN type IN ('WITHDRAW', 'FEE') THEN -amount ELSE amount END"
+    ))
+    bind.execute(sa.text(
+        "UPDATE transactions SET balance_delta = -transactions.amount "
+        "FROM transfer_intents i "
+        "WHERE transactions.type = 'TRANSFER' "
+        "AND i.from_user_id = transactions.user_id "
+        "AND i.amount = transactions.amount "
+        "AND i.created_at = transactions.created_at"
+    ))
+    rows = bind.execute(
+        sa.text(
+            "SELECT t.id, t.user_id, t.amount, t.created_at "
+            "FROM transactions t "
+            "WHERE t.type = 'TRANSFER' "
+            "AND NOT EXISTS (SELECT 1 FROM transfer_intents i "
+            "WHERE i.from_user_id = t.user_id AND i.amount = t.amount "
+            "AND i.created_at = t.created_at) "
+            "AND NOT EXISTS (SELECT 1 FROM applied_transfers a "
+            "WHERE a.to_user_id = t.user_id AND a.amount = t.amount "
+            "AND a.created_at = t.created_at) "
+            "ORDER BY t.id"
+        ).columns(
+            sa.column("id", sa.Integer),
+            sa.column("user_id", sa.Integer),
+            sa.column("amount", sa.Float),
+            sa.column("created_at", sa.DateTime(timezone=True)),
+        )
+    ).all()
+    debits, credits = pair_transfers(rows)
+    _negate(bind, debits)
+
+    transfer_ids = {row_id for row_id, *_ in rows}
+    debit_ids = set(debit_ids) & transfer_ids
+    credit_ids = set(credit_ids) & transfer_ids
+    _negate(bind, debit_ids)
+    unpaired = defaultdict(list)
+    for row_id, user_id, amount, _ in rows:
+        if row_id in debits or row_id in credits:
+            continue
+        if row_id in debit_ids or row_id in credit_ids:
+            continue
+        unpaired[user_id].append((row_id, amount))
+    if not unpaired:
+        return
+    totals = dict(bind.execute(
+        sa.text(
+            "SELECT u.id, u.balance - COALESCE(SUM(t.balance_delta), 0) "
+            "FROM users u LEFT JOIN transactions t ON t.user_id = u.id "
+            "WHERE u.id IN :user_ids GROUP BY u.id, u.balance"
+        ).bindparams(sa.bindparam("user_ids", expanding=True)),
+        {"user_ids": sorted(unpaired)},
+    ).all())
+    resolved = []
+    ambiguous = []
+    for user_id, user_rows in unpaired.items():
+        if len(user_rows) == 1:
+            # Запись пока учтена как входящая: если баланс сходится
+            # только при исходящей, остаток равен -2 * amount.
+            row_id, amount = user_rows[0]
+            residual = totals.get(user_id)
+            if residual is not None and abs(residual) < 0.005:
+                continue
+            if residual is not None and abs(residual + 2 * amount) < 0.005:
+                resolved.append(row_id)
+                continue
+        ambiguous.extend(row_id for row_id, _ in user_rows)
+    _negate(bind, resolved)
+    if ambiguous:
+        raise AmbiguousTransfersError(sorted(ambiguous))
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('balance_delta', sa.Float(), nullable=True))
+    x_args = context.get_x_argument(as_dictionary=True)
+    backfill_balance_delta(
+        op.get_bind(),
+        debit_ids=_parse_ids(x_args.get('debit_ids', '')),
+        credit_ids=_parse_ids(x_args.get('credit_ids', '')),
+    )
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.alter_column('balance_delta', nullable=False)
+    # Покрывающий индекс: ряд балансов читается только из индекса.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_user_id_created_at_delta',
+            'transactions',
+            ['user_id', 'created_at'],
+            unique=False,
+            postgresql_include=['balance_delta'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_transactions_user_id_created_at',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_user_id_created_at',
+            'transactions',
+            ['user_id', 'created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_transactions_user_id_created_at_delta',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('transactions', 'balance_delta')
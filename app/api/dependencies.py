@@ -0,0 +1,170 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+from app.api.models import TransactionType
+from app.api.schemas import HoldCreate, TransactionTransfer, WithdrawRequest
+from app.api.validators import validate_search_user
+from app.core.admission import AdmissionRejected, RateLimited, admission
+from app.core.config import get_settings
+from app.core.db import AsyncSessionLocal, get_shard_router
+from app.core.errors import ErrorMessages
+from app.core.velocity import VelocityLimitExceeded, velocity
+from app.storage.base import MEMORY_BACKEND
+from app.storage.sharded import ShardedLedger
+from app.storage.sql import SqlLedger
+
+
+@asynccontextmanager
+async def _admission_errors():
+    """
+    Преобразует отказ системы контроля нагрузки в быстрый ответ
+    429/503 с заголовком Retry-After.
+    """
+    try:
+        yield
+    except AdmissionRejected as e:
+        if isinstance(e, RateLimited):
+            status_code = status.HTTP_429_TOO_MANY_REQUESTS
+            detail = ErrorMessages.TOO_MANY_REQUESTS
+        else:
+            status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            detail = ErrorMessages.SERVICE_OVERLOADED
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+async def admit_read():
+    """
+    Допуск запроса на чтение с приоритетом над запросами на запись.
+    """
+    async with _admission_errors():
+        async with admission.read():
+            yield
+
+
+async def admit_user_write(user_id: int):
+    """
+    Допуск пополнения или списания по ID пользователя из пути запроса.
+    """
+    async with _admission_errors():
+        async with admission.write(user_id):
+            yield
+
+
+async def admit_transfer(transfer: TransactionTransfer):
+    """
+    Допуск перевода, лимит применяется к пользователю-отправителю.
+    """
+    async with _admission_errors():
+        async with admission.write(transfer.from_user_id):
+            yield
+
+
+async def admit_hold(hold: HoldCreate):
+    """
+    Допуск блокировки средств, лимит применяется к пользователю.
+    """
+    async with _admission_errors():
+        async with admission.write(hold.user_id):
+            yield
+
+
+async def admit_write():
+    """
+    Допуск прочих запросов на запись без лимита по пользователю.
+    """
+    async with _admission_errors():
+        async with admission.write(None):
+            yield
+
+
+async def require_sql_holds():
+    """
+    Отказ в операциях с блокировками средств в хранилище memory:
+    блокировки хранятся в БД, а балансы хранилища memory - в памяти
+    процесса, и доступный баланс разошелся бы с балансом.
+    """
+    if get_settings().storage_backend == MEMORY_BACKEND:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=ErrorMessages.HOLDS_NOT_SUPPORTED,
+        )
+
+
+@asynccontextmanager
+async def _velocity_limit(
+    user_id: int, operation: TransactionType, amount: float
+):
+    """
+    Проверка лимитов операций пользователя за период до обращения к БД.
+    Превышение лимита преобразуется в ответ 429 с заголовком Retry-After,
+    учет операции отменяется, если запрос завершился ошибкой.
+    """
+    try:
+        reservation = velocity.check(user_id, operation, amount)
+    except VelocityLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=ErrorMessages.VELOCITY_LIMIT_EXCEEDED,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    try:
+        yield
+    except BaseException:
+        velocity.release(reservation)
+        raise
+
+
+async def limit_withdraw_velocity(user_id: int, transaction: WithdrawRequest):
+    """
+    Лимиты списаний пользователя из пути запроса.
+    """
+    async with _velocity_limit(
+        user_id, TransactionType.WITHDRAW, transaction.amount
+    ):
+        yield
+
+
+async def limit_transfer_velocity(transfer: TransactionTransfer):
+    """
+    Лимиты переводов, применяются к пользователю-отправителю.
+    """
+    async with _velocity_limit(
+        transfer.from_user_id, TransactionType.TRANSFER, transfer.amount
+    ):
+        yield
+
+
+async def get_ledger(request: Request):
+    """
+    Хранилище основных операций: общее хранилище в памяти процесса,
+    если оно включено, хранилище с маршрутизацией по шардам при
+    нескольких базах, иначе SQL-хранилище с сессией БД на время запроса.
+    """
+    ledger = getattr(request.app.state, "ledger", None)
+    if ledger is not None:
+        yield ledger
+        return
+    router = get_shard_router()
+    if router.sharded:
+        yield ShardedLedger(router)
+        return
+    async with AsyncSessionLocal() as db:
+        yield SqlLedger(db)
+
+
+async def get_search_session(user_id: Optional[int] = None):
+    """
+    Сессия для поиска транзакций. При шардировании поиск выполняется
+    только на шарде пользователя, поэтому user_id обязателен.
+    """
+    router = get_shard_router()
+    if router.sharded:
+        validate_search_user(user_id)
+    async with router.session_for_user(user_id) as db:
+        yield db
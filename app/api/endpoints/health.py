@@ -0,0 +1,51 @@
+import os
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from app.api.schemas import HealthResponse, MessageResponse, MetricsResponse
+from app.core.admission import admission
+from app.core.db import get_engine
+from app.core.errors import ErrorMessages
+from app.core.messages import Messages
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/", response_model=HealthResponse)
+async def read_health():
+    """
+    Состояние воркера, обработавшего запрос: пул соединений с БД
+    и загрузка системы контроля нагрузки.
+    """
+    return HealthResponse(
+        pid=os.getpid(),
+        pool=get_engine().pool.status(),
+        active_requests=admission.limiter.active,
+        queued_requests=admission.limiter.queued,
+    )
+
+
+@router.get("/ready", response_model=MessageResponse)
+async def read_readiness(request: Request):
+    """
+    Готовность воркера принимать запросы: отвечает 200 только после
+    прогрева пула соединений и до начала остановки.
+    """
+    if not request.app.state.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=ErrorMessages.SERVICE_NOT_READY,
+        )
+    return MessageResponse(message=Messages.SERVICE_READY_MESSAGE)
+
+
+@router.get("/metrics", response_model=MetricsResponse)
+async def read_metrics():
+    """
+    Счетчики воркера, обработавшего запрос: число операций над балансами,
+    повторов и конфликтов по режимам конкурентного доступа.
+    """
+    return MetricsResponse(
+        uptime=metrics.uptime, counters=metrics.snapshot()
+    )
@@ -0,0 +1,185 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.api.dependencies import (
+    admit_hold,
+    admit_read,
+    admit_write,
+    require_sql_holds,
+)
+from app.api.schemas import HoldCapture, HoldCreate, HoldResponse
+from app.api.validators import validate_hold_exists, validate_user_exists
+from app.core.db import get_shard_router
+from app.core.errors import (
+    ErrorMessages,
+    HoldAmountExceededError,
+    HoldNotActiveError,
+    InsufficientFundsError,
+)
+from app.crud.holds import capture_hold, find_hold, place_hold, release_hold
+from app.crud.ids import allocate_id
+
+router = APIRouter(dependencies=[Depends(require_sql_holds)])
+
+
+@router.post(
+    "/",
+    response_model=HoldResponse,
+    dependencies=[Depends(admit_hold)],
+)
+async def create_hold(hold: HoldCreate):
+    """
+    Блокировка средств пользователя.
+
+    Сумма блокировки остается на балансе, но недоступна для списаний
+    и переводов до списания, снятия или истечения блокировки.
+    """
+    try:
+        shard_router = get_shard_router()
+        async with shard_router.session() as db:
+            hold_id = await allocate_id(db, "holds")
+        async with shard_router.session_for_user(hold.user_id) as db:
+            db_hold = await place_hold(
+                db, hold.user_id, hold.amount, hold.ttl_seconds, hold_id
+            )
+            validate_user_exists(db_hold)
+            return HoldResponse.model_validate(db_hold)
+
+    except HTTPException as e:
+        raise e
+
+    except InsufficientFundsError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ErrorMessages.INSUFFICIENT_FUNDS,
+        )
+
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
+
+
+@router.get(
+    "/{hold_id}",
+    response_model=HoldResponse,
+    dependencies=[Depends(admit_read)],
+)
+async def read_hold(hold_id: int):
+    """
+    Получение блокировки средств по ID.
+    """
+    try:
+        _, db_hold = await find_hold(get_shard_router(), hold_id)
+        validate_hold_exists(db_hold)
+        return HoldResponse.model_validate(db_hold)
+
+    except HTTPException as e:
+        raise e
+
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
+
+
+@router.post(
+    "/{hold_id}/capture",
+    response_model=HoldResponse,
+    dependencies=[Depends(admit_write)],
+)
+async def capture_existing_hold(hold_id: int, capture: HoldCapture):
+    """
+    Списание заблокированных средств (всей суммы или ее части).
+
+    Списание выполняется одной операцией, остаток блокировки снимается.
+    """
+    try:
+        shard_router = get_shard_router()
+        shard, db_hold = await find_hold(shard_router, hold_id)
+        validate_hold_exists(db_hold)
+        async with shard_router.session(shard) as db:
+            db_hold = await capture_hold(db, hold_id, capture.amount)
+            validate_hold_exists(db_hold)
+            return HoldResponse.model_validate(db_hold)
+
+    except HTTPException as e:
+        raise e
+
+    except HoldNotActiveError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=ErrorMessages.HOLD_NOT_ACTIVE,
+        )
+
+    except HoldAmountExceededError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ErrorMessages.HOLD_AMOUNT_EXCEEDED,
+        )
+
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
+
+
+@router.post(
+    "/{hold_id}/release",
+    response_model=HoldResponse,
+    dependencies=[Depends(admit_write)],
+)
+async def release_existing_hold(hold_id: int):
+    """
+    Снятие блокировки средств без списания.
+    """
+    try:
+        shard_router = get_shard_router()
+        shard, db_hold = await find_hold(shard_router, hold_id)
+        validate_hold_exists(db_hold)
+        async with shard_router.session(shard) as db:
+            db_hold = await release_hold(db, hold_id)
+            validate_hold_exists(db_hold)
+            return HoldResponse.model_validate(db_hold)
+
+    except HTTPException as e:
+        raise e
+
+    except HoldNotActiveError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=ErrorMessages.HOLD_NOT_ACTIVE,
+        )
+
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
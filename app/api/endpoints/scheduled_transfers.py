@@ -0,0 +1,134 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.api.dependencies import admit_read, admit_write
+from app.api.schemas import ScheduledTransferCreate, ScheduledTransferResponse
+from app.api.validators import (
+    validate_scheduled_transfer_exists,
+    validate_users_exist,
+)
+from app.core.db import get_shard_router
+from app.core.errors import ErrorMessages
+from app.crud.ids import allocate_id
+from app.crud.scheduled_transfers import (
+    cancel_scheduled_transfer,
+    create_scheduled_transfer,
+    find_scheduled_transfer,
+)
+from app.crud.users import get_user_by_id
+
+router = APIRouter()
+
+
+@router.post(
+    "/",
+    response_model=ScheduledTransferResponse,
+    dependencies=[Depends(admit_write)],
+)
+async def create_new_scheduled_transfer(transfer: ScheduledTransferCreate):
+    """
+    Создание разового или регулярного перевода.
+
+    Перевод хранится на шарде отправителя.
+    """
+    try:
+        shard_router = get_shard_router()
+        async with shard_router.session_for_user(transfer.to_user_id) as db:
+            to_user = await get_user_by_id(db, transfer.to_user_id)
+        async with shard_router.session_for_user(
+            transfer.from_user_id
+        ) as db:
+            from_user = await get_user_by_id(db, transfer.from_user_id)
+        validate_users_exist(from_user, to_user)
+        async with shard_router.session() as db:
+            transfer_id = await allocate_id(db, "scheduled_transfers")
+        async with shard_router.session_for_user(
+            transfer.from_user_id
+        ) as db:
+            db_transfer = await create_scheduled_transfer(
+                db, transfer, transfer_id
+            )
+        return ScheduledTransferResponse.model_validate(db_transfer)
+
+    except HTTPException as e:
+        raise e
+
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
+
+
+@router.get(
+    "/{transfer_id}",
+    response_model=ScheduledTransferResponse,
+    dependencies=[Depends(admit_read)],
+)
+async def read_scheduled_transfer(transfer_id: int):
+    """
+    Получение запланированного перевода по ID.
+    """
+    try:
+        _, db_transfer = await find_scheduled_transfer(
+            get_shard_router(), transfer_id
+        )
+        validate_scheduled_transfer_exists(db_transfer)
+        return ScheduledTransferResponse.model_validate(db_transfer)
+
+    except HTTPException as e:
+        raise e
+
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
+
+
+@router.delete(
+    "/{transfer_id}",
+    response_model=ScheduledTransferResponse,
+    dependencies=[Depends(admit_write)],
+)
+async def delete_scheduled_transfer(transfer_id: int):
+    """
+    Отмена запланированного перевода.
+    """
+    try:
+        shard_router = get_shard_router()
+        shard, db_transfer = await find_scheduled_transfer(
+            shard_router, transfer_id
+        )
+        validate_scheduled_transfer_exists(db_transfer)
+        async with shard_router.session(shard) as db:
+            db_transfer = await cancel_scheduled_transfer(db, transfer_id)
+        validate_scheduled_transfer_exists(db_transfer)
+        return ScheduledTransferResponse.model_validate(db_transfer)
+
+    except HTTPException as e:
+        raise e
+
+    except SQLAlchemyError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
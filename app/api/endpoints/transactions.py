@@ -1,4 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -13,27 +24,40 @@ from app.api.schemas import (
     TransferResponse,
     TransactionDeposit,
     TransactionHistoryResponse,
+    TransactionSearchItem,
+    TransactionSearchResponse,
     TransactionTransfer,
+    TransactionType,
     UserTransactionsResponse,
     WithdrawRequest,
 )
+from app.api.dependencies import (
+    admit_read,
+    admit_transfer,
+    admit_user_write,
+    get_ledger,
+    get_search_session,
+    limit_transfer_velocity,
+    limit_withdraw_velocity,
+)
+from app.api.etags import etag_matches, make_etag, not_modified
+from app.api.models import TransactionType as DBTransactionType
 from app.api.validators import (
-    validate_positive_amount,
+    validate_amount_range,
+    validate_date_range,
     validate_sufficient_funds,
-    validate_transfer_users,
     validate_user_exists,
     validate_users_exist,
 )
-from app.core.db import get_async_session
-from app.core.errors import ErrorMessages
+from app.core.db import release_session
+from app.core.errors import ErrorMessages, InsufficientFundsError
 from app.core.messages import Messages
 from app.crud.transactions import (
-    deposit_to_user,
-    get_user_transactions,
-    transfer_funds,
-    withdraw_from_user,
+    estimate_transactions_count,
+    search_transactions,
 )
 from app.crud.users import get_user_by_id
+from app.storage.base import LedgerBackend
 
 
 router = APIRouter()
@@ -43,20 +67,20 @@ router = APIRouter()
     "/deposit/{user_id}",
     response_model=DepositResponse,
     responses=deposit_responses,
+    dependencies=[Depends(admit_user_write)],
 )
 async def deposit_funds(
     user_id: int,
     transaction: TransactionDeposit,
-    db: AsyncSession = Depends(get_async_session),
+    ledger: LedgerBackend = Depends(get_ledger),
 ):
     """
     Пополнение баланса пользователя.
     """
     try:
-        validate_positive_amount(transaction.amount)
-        db_user = await deposit_to_user(db, user_id, transaction.amount)
+        db_user = await ledger.deposit(user_id, transaction.amount)
         validate_user_exists(db_user)
-        await db.commit()
+        await ledger.commit()
         return DepositResponse(
             message=(
                 f"{Messages.SUCCESS_DEPOSIT_MESSAGE.value} - {db_user.balance}"
@@ -64,7 +88,7 @@ async def deposit_funds(
             )
 
     except SQLAlchemyError:
-        await db.rollback()
+        await ledger.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
@@ -74,7 +98,7 @@ async def deposit_funds(
         raise e
 
     except Exception:
-        await db.rollback()
+        await ledger.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
@@ -85,22 +109,27 @@ async def deposit_funds(
     "/withdraw/{user_id}",
     response_model=WithdrawResponse,
     responses=withdraw_responses,
+    dependencies=[
+        Depends(limit_withdraw_velocity),
+        Depends(admit_user_write),
+    ],
 )
 async def withdraw_funds(
     user_id: int,
     transaction: WithdrawRequest,
-    db: AsyncSession = Depends(get_async_session),
+    ledger: LedgerBackend = Depends(get_ledger),
 ):
     """
     Списание средств с баланса пользователя.
     """
     try:
-        validate_positive_amount(transaction.amount)
-        db_user = await get_user_by_id(db, user_id)
+        db_user = await ledger.get_user(user_id)
         validate_user_exists(db_user)
-        validate_sufficient_funds(db_user.balance, transaction.amount)
-        db_user = await withdraw_from_user(db, user_id, transaction.amount)
-        await db.commit()
+        validate_sufficient_funds(
+            db_user.available_balance, transaction.amount
+        )
+        db_user = await ledger.withdraw(user_id, transaction.amount)
+        await ledger.commit()
         return WithdrawResponse(
             message=(
                 f"{Messages.SUCCESS_WITHDRAW_MESSAGE.value}-{db_user.balance}"
@@ -108,7 +137,7 @@ async def withdraw_funds(
             )
 
     except SQLAlchemyError:
-        await db.rollback()
+        await ledger.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
@@ -117,8 +146,14 @@ async def withdraw_funds(
     except HTTPException as e:
         raise e
 
+    except InsufficientFundsError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ErrorMessages.INSUFFICIENT_FUNDS,
+        )
+
     except Exception:
-        await db.rollback()
+        await ledger.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
@@ -126,33 +161,39 @@ async def withdraw_funds(
 
 
 @router.post(
-    "/transfer", response_model=TransferResponse, responses=transfer_responses
+    "/transfer",
+    response_model=TransferResponse,
+    responses=transfer_responses,
+    dependencies=[
+        Depends(limit_transfer_velocity),
+        Depends(admit_transfer),
+    ],
 )
 async def transfer_funds_between_users(
     transfer: TransactionTransfer,
-    db: AsyncSession = Depends(get_async_session),
+    ledger: LedgerBackend = Depends(get_ledger),
 ):
     """
     Перевод средств между пользователями.
     """
     try:
-        validate_positive_amount(transfer.amount)
-        validate_transfer_users(transfer.from_user_id, transfer.to_user_id)
-        from_user = await get_user_by_id(db, transfer.from_user_id)
-        to_user = await get_user_by_id(db, transfer.to_user_id)
+        from_user = await ledger.get_user(transfer.from_user_id)
+        to_user = await ledger.get_user(transfer.to_user_id)
         validate_users_exist(from_user, to_user)
-        validate_sufficient_funds(from_user.balance, transfer.amount)
-        await transfer_funds(
-            db, transfer.from_user_id, transfer.to_user_id, transfer.amount
+        validate_sufficient_funds(
+            from_user.available_balance, transfer.amount
+        )
+        await ledger.transfer(
+            transfer.from_user_id, transfer.to_user_id, transfer.amount
         )
-        await db.commit()
+        await ledger.commit()
 
         return TransferResponse(
             message=f"{Messages.SUCCESS_TRANSFER_MESSAGE.value}"
             )
 
     except SQLAlchemyError:
-        await db.rollback()
+        await ledger.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
@@ -161,25 +202,52 @@ async def transfer_funds_between_users(
     except HTTPException as e:
         raise e
 
+    except InsufficientFundsError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ErrorMessages.INSUFFICIENT_FUNDS,
+        )
+
     except Exception:
-        await db.rollback()
+        await ledger.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
         )
 
 
-@router.get("/{user_id}/history", response_model=UserTransactionsResponse)
+@router.get(
+    "/{user_id}/history",
+    response_model=UserTransactionsResponse,
+    dependencies=[Depends(admit_read)],
+)
 async def read_user_transactions(
-    user_id: int, db: AsyncSession = Depends(get_async_session)
+    user_id: int,
+    request: Request,
+    response: Response,
+    ledger: LedgerBackend = Depends(get_ledger),
 ):
     """
     Получение истории операций по пользователю.
+
+    Ответ содержит ETag. Если переданный в If-None-Match ETag актуален,
+    возвращается 304 без тела, история не читается и не сериализуется.
     """
     try:
-        db_user = await get_user_by_id(db, user_id)
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            version = await ledger.get_user_version(user_id)
+            if version is not None:
+                etag = make_etag("history", user_id, version)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+        db_user = await ledger.get_user(user_id)
         validate_user_exists(db_user)
-        transactions = await get_user_transactions(db, user_id)
+        response.headers["ETag"] = make_etag(
+            "history", user_id, db_user.version
+        )
+        transactions = await ledger.get_transactions(user_id)
+        await ledger.release()
         serialized_transactions = [
             TransactionHistoryResponse(
                 id=transaction.id,
@@ -196,6 +264,84 @@ async def read_user_transactions(
     except HTTPException as e:
         raise e
 
+    except SQLAlchemyError:
+        await ledger.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        await ledger.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
+
+
+@router.get(
+    "/search",
+    response_model=TransactionSearchResponse,
+    dependencies=[Depends(admit_read)],
+)
+async def search_user_transactions(
+    user_id: Optional[int] = None,
+    type: Optional[TransactionType] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[int] = Query(default=None, gt=0),
+    limit: int = Query(default=50, gt=0, le=500),
+    db: AsyncSession = Depends(get_search_session),
+):
+    """
+    Поиск транзакций по пользователю, типу, диапазону сумм и дат.
+
+    Результаты отдаются от новых к старым. Для получения следующей страницы
+    нужно передать next_cursor из предыдущего ответа. При шардировании
+    поиск возможен только по одному пользователю. Транзакции закрытого
+    счета при поиске по пользователю не возвращаются.
+    """
+    try:
+        validate_amount_range(amount_min, amount_max)
+        validate_date_range(date_from, date_to)
+        if user_id is not None and await get_user_by_id(db, user_id) is None:
+            await release_session(db)
+            return TransactionSearchResponse(
+                transactions=[], next_cursor=None, estimated_total=0
+            )
+        filters = dict(
+            user_id=user_id,
+            transaction_type=DBTransactionType(type) if type else None,
+            amount_min=amount_min,
+            amount_max=amount_max,
+            date_from=date_from,
+            date_to=date_to,
+        )
+        transactions, next_cursor = await search_transactions(
+            db, limit, cursor, **filters
+        )
+        estimated_total = await estimate_transactions_count(db, **filters)
+        await release_session(db)
+        return TransactionSearchResponse(
+            transactions=[
+                TransactionSearchItem(
+                    id=transaction.id,
+                    user_id=transaction.user_id,
+                    amount=transaction.amount,
+                    type=transaction.type,
+                    created_at=transaction.created_at,
+                )
+                for transaction in transactions
+            ],
+            next_cursor=next_cursor,
+            estimated_total=estimated_total,
+        )
+
+    except HTTPException as e:
+        raise e
+
     except SQLAlchemyError:
         await db.rollback()
         raise HTTPException(
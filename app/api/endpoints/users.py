@@ -1,64 +1,331 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from contextlib import aclosing
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.schemas import UserBase, UserResponse
+from app.api.dependencies import (
+    admit_read,
+    admit_user_write,
+    admit_write,
+    get_ledger,
+)
+from app.api.etags import etag_matches, make_etag, not_modified
+from app.api.schemas import (
+    BalanceSeriesBucket,
+    BalanceSeriesResponse,
+    UserBase,
+    UserResponse,
+)
 from app.api.validators import (
+    validate_date_range,
+    validate_series_buckets,
     validate_user_does_not_exist,
     validate_user_exists,
 )
-from app.core.db import get_async_session
-from app.core.errors import ErrorMessages
-from app.core.serializers import serialize_model
-from app.crud.users import create_user, get_user_by_id
+from app.core.config import get_settings
+from app.core.db import get_shard_router, get_user_session, release_session
+from app.core.errors import AccountNotEmptyError, ErrorMessages
+from app.core.events import broker
+from app.crud.balance_series import (
+    BUCKET_SECONDS,
+    DEFAULT_SERIES_PERIOD,
+    MAX_SERIES_BUCKETS,
+    align_to_bucket,
+    count_buckets,
+    get_balance_series,
+    to_utc,
+)
+from app.crud.outbox import get_last_event_id, get_user_events
+from app.crud.users import get_user_by_id
+from app.storage.base import LedgerBackend
 
 router = APIRouter()
 
 
-@router.post("/", response_model=UserResponse)
+@router.post(
+    "/", response_model=UserResponse, dependencies=[Depends(admit_write)]
+)
 async def create_new_user(
-    user: UserBase, db: AsyncSession = Depends(get_async_session)
+    user: UserBase, ledger: LedgerBackend = Depends(get_ledger)
 ):
     """
     Создание нового пользователя.
     """
     try:
-        await validate_user_does_not_exist(db, user.name)
-        db_user = await create_user(db, user)
-        user_data = serialize_model(db_user)
-        await db.commit()
-        return UserResponse(**user_data)
+        validate_user_does_not_exist(await ledger.get_user_by_name(user.name))
+        db_user = await ledger.create_user(user.name)
+        await ledger.commit()
+        return UserResponse.model_validate(db_user)
 
     except HTTPException as e:
         raise e
 
     except SQLAlchemyError:
-        await db.rollback()
+        await ledger.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
         )
 
     except Exception:
-        await db.rollback()
+        await ledger.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Неизвестная ошибка",
         )
 
 
-@router.get("/{user_id}", response_model=UserResponse)
+@router.get(
+    "/{user_id}",
+    response_model=UserResponse,
+    dependencies=[Depends(admit_read)],
+)
 async def read_user(
-    user_id: int, db: AsyncSession = Depends(get_async_session)
+    user_id: int,
+    request: Request,
+    response: Response,
+    ledger: LedgerBackend = Depends(get_ledger),
 ):
     """
     Получение информации о пользователе по ID.
+
+    Ответ содержит ETag. Если переданный в If-None-Match ETag актуален,
+    возвращается 304 без тела после одного запроса версии пользователя.
+    """
+    try:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            version = await ledger.get_user_version(user_id)
+            if version is not None:
+                etag = make_etag("user", user_id, version)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+        db_user = await ledger.get_user(user_id)
+        await ledger.release()
+        validate_user_exists(db_user)
+        response.headers["ETag"] = make_etag("user", user_id, db_user.version)
+        return UserResponse.model_validate(db_user)
+
+    except HTTPException as e:
+        raise e
+
+    except SQLAlchemyError:
+        await ledger.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        await ledger.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
+
+
+@router.delete(
+    "/{user_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(admit_user_write)],
+)
+async def close_account(
+    user_id: int, ledger: LedgerBackend = Depends(get_ledger)
+):
+    """
+    Закрытие счета пользователя.
+
+    Счет закрывается сразу: после этого операции по нему отклоняются, а
+    пользователь и его транзакции не возвращаются при чтении. История
+    операций переносится в архив и удаляется в фоне. Закрыть можно
+    только счет с нулевым балансом.
+    """
+    try:
+        db_user = await ledger.close_user(user_id)
+        validate_user_exists(db_user)
+        await ledger.commit()
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    except HTTPException as e:
+        raise e
+
+    except AccountNotEmptyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=ErrorMessages.ACCOUNT_NOT_EMPTY,
+        )
+
+    except SQLAlchemyError:
+        await ledger.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        await ledger.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
+
+
+@router.get(
+    "/{user_id}/balance-series",
+    response_model=BalanceSeriesResponse,
+    dependencies=[Depends(admit_read)],
+)
+async def read_balance_series(
+    user_id: int,
+    date_from: Optional[datetime] = Query(default=None, alias="from"),
+    date_to: Optional[datetime] = Query(default=None, alias="to"),
+    bucket: BalanceSeriesBucket = BalanceSeriesBucket.DAY,
+    db: AsyncSession = Depends(get_user_session),
+):
+    """
+    Ряд балансов пользователя по часам или дням для графика.
+
+    Интервалы выравниваются по UTC, ряд начинается с интервала, в который
+    попадает from. Для каждого интервала возвращается баланс на его конец.
+    По умолчанию to - текущее время, from - сутки (bucket=hour) или
+    30 дней (bucket=day) до to.
+    """
+    try:
+        date_to = to_utc(date_to or datetime.now(timezone.utc))
+        if date_from is None:
+            date_from = date_to - DEFAULT_SERIES_PERIOD[bucket.value]
+        date_from = to_utc(date_from)
+        validate_date_range(date_from, date_to)
+        bucket_seconds = BUCKET_SECONDS[bucket.value]
+        start = align_to_bucket(date_from, bucket_seconds)
+        bucket_count = count_buckets(start, date_to, bucket_seconds)
+        validate_series_buckets(bucket_count, MAX_SERIES_BUCKETS)
+        balances = await get_balance_series(
+            db, user_id, start, bucket_count, bucket_seconds
+        )
+        await release_session(db)
+        validate_user_exists(balances)
+        return BalanceSeriesResponse(
+            user_id=user_id,
+            bucket=bucket,
+            timestamps=[
+                datetime.fromtimestamp(
+                    start.timestamp() + number * bucket_seconds, timezone.utc
+                )
+                for number in range(bucket_count)
+            ],
+            balances=balances.tolist(),
+        )
+
+    except HTTPException as e:
+        raise e
+
+    except SQLAlchemyError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.DATABASE_ERROR_MESSAGE,
+        )
+
+    except Exception:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
+        )
+
+
+async def _iter_user_events(user_id: int, last_event_id: int):
+    """
+    Бесконечный генератор событий пользователя, начиная с last_event_id.
+
+    Между пробуждениями соединение с БД не удерживается: каждая выборка
+    выполняется в отдельной короткой сессии. Если новых событий нет дольше
+    интервала keepalive, генерируется None.
+    """
+    keepalive_interval = get_settings().events_keepalive_interval
+    shard_router = get_shard_router()
+    with broker.subscribe(user_id) as wakeup:
+        while True:
+            wakeup.clear()
+            async with shard_router.session_for_user(user_id) as db:
+                events = await get_user_events(db, user_id, last_event_id)
+            for db_event in events:
+                last_event_id = db_event.id
+                yield db_event
+            if events:
+                continue
+            try:
+                await asyncio.wait_for(
+                    wakeup.wait(), timeout=keepalive_interval
+                )
+            except asyncio.TimeoutError:
+                yield None
+
+
+async def _sse_stream(user_id: int, last_event_id: int):
+    """
+    Форматирование событий пользователя в формате Server-Sent Events.
+    """
+    async with aclosing(_iter_user_events(user_id, last_event_id)) as events:
+        async for db_event in events:
+            if db_event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield (
+                f"id: {db_event.id}\n"
+                f"event: {db_event.event_type}\n"
+                f"data: {json.dumps(db_event.payload)}\n\n"
+            )
+
+
+@router.get("/{user_id}/events", dependencies=[Depends(admit_read)])
+async def stream_user_events(
+    user_id: int,
+    last_event_id: Optional[int] = Query(default=None, ge=0),
+    last_event_id_header: Optional[int] = Header(
+        default=None, alias="Last-Event-ID"
+    ),
+    db: AsyncSession = Depends(get_user_session),
+):
+    """
+    Поток событий изменения баланса пользователя (Server-Sent Events).
+
+    Для продолжения потока после переподключения нужно передать ID
+    последнего полученного события в заголовке Last-Event-ID или в
+    параметре last_event_id. События хранятся outbox_retention секунд,
+    более старые пропущенные события не воспроизводятся.
     """
     try:
         db_user = await get_user_by_id(db, user_id)
         validate_user_exists(db_user)
-        user_data = serialize_model(db_user)
-        return UserResponse(**user_data)
+        if last_event_id is None:
+            last_event_id = last_event_id_header
+        if last_event_id is None:
+            last_event_id = await get_last_event_id(db, user_id)
+        await release_session(db)
+        return StreamingResponse(
+            _sse_stream(user_id, last_event_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     except HTTPException as e:
         raise e
@@ -76,3 +343,43 @@ async def read_user(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=ErrorMessages.UNDEFINED_ERROR_MESSAGE,
         )
+
+
+@router.websocket("/{user_id}/events/ws")
+async def user_events_websocket(
+    websocket: WebSocket,
+    user_id: int,
+    last_event_id: Optional[int] = Query(default=None, ge=0),
+):
+    """
+    Поток событий изменения баланса пользователя через WebSocket.
+    """
+    async with get_shard_router().session_for_user(user_id) as db:
+        db_user = await get_user_by_id(db, user_id)
+        if db_user is None:
+            await websocket.close(
+                code=status.WS_1008_POLICY_VIOLATION,
+                reason=ErrorMessages.USER_NOT_FOUND.value,
+            )
+            return
+        if last_event_id is None:
+            last_event_id = await get_last_event_id(db, user_id)
+
+    await websocket.accept()
+    try:
+        async with aclosing(
+            _iter_user_events(user_id, last_event_id)
+        ) as events:
+            async for db_event in events:
+                if db_event is None:
+                    await websocket.send_json({"event": "keepalive"})
+                    continue
+                await websocket.send_json(
+                    {
+                        "id": db_event.id,
+                        "event": db_event.event_type,
+                        "data": db_event.payload,
+                    }
+                )
+    except WebSocketDisconnect:
+        pass
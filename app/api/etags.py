@@ -0,0 +1,37 @@
+from typing import Optional
+
+from fastapi import Response, status
+
+
+def make_etag(resource: str, user_id: int, version: int) -> str:
+    """
+    Слабый ETag ресурса пользователя по версии его строки.
+
+    Версия увеличивается при каждом изменении баланса, то есть и при
+    каждой новой записи в истории операций пользователя.
+    """
+    return f'W/"{resource}-{user_id}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Слабое сравнение заголовка If-None-Match с ETag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Ответ 304 без тела.
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+    )
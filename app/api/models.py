@@ -2,9 +2,18 @@ from enum import Enum
 
 from sqlalchemy import Column, DateTime
 from sqlalchemy import Enum as SQLEnum
-from sqlalchemy import Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 from app.core.db import Base
 
@@ -16,23 +25,51 @@ class User(Base):
     Attributes:
         id (int): Уникальный идентификатор пользователя.
         name (str): Имя пользователя.
-        balance (float): Баланс пользователя.
+        balance (float): Баланс пользователя (учетный, включая
+            заблокированные средства).
+        held_balance (float): Сумма активных блокировок средств.
         created_at (DateTime): Время создания записи пользователя.
+        version (int): Версия строки, увеличивается при каждом изменении.
+        closed_at (DateTime): Время закрытия счета. Закрытый счет не
+            изменяется и не возвращается при чтении, его данные удаляет
+            app.workers.purger.
         transactions (relationship): Связь с транзакциями пользователя.
     """
 
     __tablename__ = "users"
+    __table_args__ = (
+        Index(
+            "ix_users_closed_at",
+            "closed_at",
+            postgresql_where=text("closed_at IS NOT NULL"),
+        ),
+    )
 
     id: int = Column(Integer, primary_key=True, index=True)
     name: str = Column(String, index=True)
     balance: float = Column(Float, default=0.0)
+    held_balance: float = Column(
+        Float, nullable=False, default=0.0, server_default="0"
+    )
     created_at: DateTime = Column(
         DateTime(timezone=True), server_default=func.now()
     )
+    version: int = Column(Integer, nullable=False, server_default="1")
+    closed_at: DateTime = Column(DateTime(timezone=True))
     transactions = relationship(
         "Transaction", order_by="Transaction.id", back_populates="user"
     )
 
+    # UPDATE пользователя всегда сравнивает и увеличивает версию строки.
+    __mapper_args__ = {"version_id_col": version}
+
+    @property
+    def available_balance(self) -> float:
+        """
+        Доступный баланс: учетный баланс без заблокированных средств.
+        """
+        return self.balance - (self.held_balance or 0.0)
+
 
 class TransactionType(str, Enum):
     """
@@ -42,6 +79,9 @@ class TransactionType(str, Enum):
     DEPOSIT = "deposit"
     WITHDRAW = "withdraw"
     TRANSFER = "transfer"
+    INTEREST = "interest"
+    FEE = "fee"
+    CAPTURE = "capture"
 
 
 class Transaction(Base):
@@ -53,18 +93,412 @@ class Transaction(Base):
         user_id (int): Внешний ключ для связи с пользователем.
         amount (float): Сумма транзакции.
         type (TransactionType): Тип транзакции.
+        balance_delta (float): Изменение баланса пользователя: сумма со
+            знаком (отрицательная для списаний и исходящих переводов).
         created_at (DateTime): Время создания записи транзакции.
         user (relationship): Обратная связь с пользователем.
     """
 
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_user_id_id", "user_id", "id"),
+        Index("ix_transactions_user_id_type_id", "user_id", "type", "id"),
+        Index(
+            "ix_transactions_user_id_created_at_delta",
+            "user_id",
+            "created_at",
+            postgresql_include=["balance_delta"],
+        ),
+        Index("ix_transactions_created_at", "created_at"),
+    )
 
     id: int = Column(Integer, primary_key=True, index=True)
     user_id: int = Column(Integer, ForeignKey("users.id"))
     amount: float = Column(Float)
     type: TransactionType = Column(SQLEnum(TransactionType))
+    balance_delta: float = Column(Float, nullable=False)
     created_at: DateTime = Column(
         DateTime(timezone=True), server_default=func.now()
     )
 
     user = relationship("User", back_populates="transactions")
+
+
+class ArchivedTransaction(Base):
+    """
+    Транзакция закрытого счета, перенесенная из transactions перед
+    удалением данных счета. Хранит исходные ID транзакции и пользователя.
+
+    Attributes:
+        id (int): ID транзакции в transactions.
+        user_id (int): Пользователь (без внешнего ключа: строка
+            пользователя удаляется).
+        amount (float): Сумма транзакции.
+        type (TransactionType): Тип транзакции.
+        balance_delta (float): Изменение баланса пользователя.
+        created_at (DateTime): Время создания транзакции.
+        archived_at (DateTime): Время переноса в архив.
+    """
+
+    __tablename__ = "transactions_archive"
+    __table_args__ = (
+        Index("ix_transactions_archive_user_id_id", "user_id", "id"),
+    )
+
+    id: int = Column(Integer, primary_key=True, autoincrement=False)
+    user_id: int = Column(Integer, nullable=False)
+    amount: float = Column(Float, nullable=False)
+    type: TransactionType = Column(SQLEnum(TransactionType), nullable=False)
+    balance_delta: float = Column(Float, nullable=False)
+    created_at: DateTime = Column(DateTime(timezone=True))
+    archived_at: DateTime = Column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class OutboxEvent(Base):
+    """
+    Событие изменения баланса, записанное в одной транзакции БД
+    с самим изменением (transactional outbox).
+
+    Attributes:
+        id (int): Уникальный идентификатор события, растет монотонно.
+        user_id (int): Пользователь, баланс которого изменился.
+        event_type (str): Тип события.
+        payload (dict): Данные события.
+        created_at (DateTime): Время создания события.
+    """
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index("ix_outbox_events_user_id_id", "user_id", "id"),
+    )
+
+    id: int = Column(Integer, primary_key=True)
+    user_id: int = Column(Integer, ForeignKey("users.id"), nullable=False)
+    event_type: str = Column(String, nullable=False)
+    payload: dict = Column(JSON, nullable=False)
+    created_at: DateTime = Column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class ScheduledTransferStatus(str, Enum):
+    """
+    Статусы запланированного перевода.
+    """
+
+    ACTIVE = "active"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class ScheduledTransfer(Base):
+    """
+    Запланированный (разовый или регулярный) перевод средств.
+
+    Attributes:
+        id (int): Уникальный идентификатор перевода.
+        from_user_id (int): Пользователь-отправитель.
+        to_user_id (int): Пользователь-получатель.
+        amount (float): Сумма перевода.
+        interval_seconds (int): Период повторения, None для разового.
+        next_run_at (DateTime): Время следующего выполнения.
+        status (ScheduledTransferStatus): Статус перевода.
+        attempts (int): Число неудачных попыток подряд.
+        last_error (str): Причина последней неудачи.
+        created_at (DateTime): Время создания записи.
+    """
+
+    __tablename__ = "scheduled_transfers"
+    __table_args__ = (
+        Index(
+            "ix_scheduled_transfers_due",
+            "next_run_at",
+            postgresql_where=text("status = 'ACTIVE'"),
+        ),
+    )
+
+    id: int = Column(Integer, primary_key=True)
+    from_user_id: int = Column(
+        Integer, ForeignKey("users.id"), nullable=False, index=True
+    )
+    # Без внешнего ключа: получатель может находиться на другом шарде.
+    to_user_id: int = Column(Integer, nullable=False)
+    amount: float = Column(Float, nullable=False)
+    interval_seconds: int = Column(Integer)
+    next_run_at: DateTime = Column(DateTime(timezone=True), nullable=False)
+    status: ScheduledTransferStatus = Column(
+        SQLEnum(ScheduledTransferStatus),
+        nullable=False,
+        default=ScheduledTransferStatus.ACTIVE,
+    )
+    attempts: int = Column(Integer, nullable=False, default=0)
+    last_error: str = Column(String)
+    created_at: DateTime = Column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class HoldStatus(str, Enum):
+    """
+    Статусы блокировки средств.
+    """
+
+    ACTIVE = "active"
+    CAPTURED = "captured"
+    RELEASED = "released"
+    EXPIRED = "expired"
+
+
+class Hold(Base):
+    """
+    Блокировка средств (авторизация). Пока блокировка активна, ее сумма
+    входит в users.held_balance и недоступна для списаний и переводов.
+    Блокировка списывается (capture), снимается (release) или истекает
+    в expires_at, после чего ее снимает app.workers.hold_sweeper.
+
+    Attributes:
+        id (int): Уникальный идентификатор блокировки.
+        user_id (int): Пользователь, средства которого заблокированы.
+        amount (float): Заблокированная сумма.
+        captured_amount (float): Списанная сумма (не больше amount).
+        status (HoldStatus): Статус блокировки.
+        expires_at (DateTime): Время истечения блокировки.
+        created_at (DateTime): Время создания блокировки.
+        finished_at (DateTime): Время списания, снятия или истечения.
+    """
+
+    __tablename__ = "holds"
+    __table_args__ = (
+        Index(
+            "ix_holds_expires_at",
+            "expires_at",
+            postgresql_where=text("status = 'ACTIVE'"),
+        ),
+    )
+
+    id: int = Column(Integer, primary_key=True)
+    user_id: int = Column(
+        Integer, ForeignKey("users.id"), nullable=False, index=True
+    )
+    amount: float = Column(Float, nullable=False)
+    captured_amount: float = Column(Float)
+    status: HoldStatus = Column(
+        SQLEnum(HoldStatus), nullable=False, default=HoldStatus.ACTIVE
+    )
+    expires_at: DateTime = Column(DateTime(timezone=True), nullable=False)
+    created_at: DateTime = Column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    finished_at: DateTime = Column(DateTime(timezone=True))
+
+
+class IdCounter(Base):
+    """
+    Счетчик глобальных ID сущности (пользователей, запланированных
+    переводов, блокировок). Используются счетчики основной базы
+    (шарда 0).
+
+    Attributes:
+        id (str): Имя таблицы сущности.
+        last_id (int): Последний выданный ID.
+    """
+
+    __tablename__ = "id_counters"
+
+    id: str = Column(String, primary_key=True)
+    last_id: int = Column(Integer, nullable=False, default=0)
+
+
+class TransferIntentStatus(str, Enum):
+    """
+    Статусы межшардового перевода.
+    """
+
+    PENDING = "pending"
+    COMPLETED = "completed"
+    COMPENSATED = "compensated"
+
+
+class TransferIntent(Base):
+    """
+    Межшардовый перевод, хранится на шарде отправителя и создается
+    в одной транзакции БД со списанием средств.
+
+    Attributes:
+        id (str): Уникальный идентификатор перевода.
+        from_user_id (int): Пользователь-отправитель.
+        to_user_id (int): Пользователь-получатель (на другом шарде).
+        amount (float): Сумма перевода.
+        status (TransferIntentStatus): Статус перевода.
+        created_at (DateTime): Время списания средств.
+    """
+
+    __tablename__ = "transfer_intents"
+    __table_args__ = (
+        Index(
+            "ix_transfer_intents_pending",
+            "created_at",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
+
+    id: str = Column(String(32), primary_key=True)
+    from_user_id: int = Column(
+        Integer, ForeignKey("users.id"), nullable=False
+    )
+    to_user_id: int = Column(Integer, nullable=False)
+    amount: float = Column(Float, nullable=False)
+    status: TransferIntentStatus = Column(
+        SQLEnum(TransferIntentStatus),
+        nullable=False,
+        default=TransferIntentStatus.PENDING,
+    )
+    created_at: DateTime = Column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class AppliedTransfer(Base):
+    """
+    Отметка о зачислении межшардового перевода, хранится на шарде
+    получателя. Создается в одной транзакции БД с зачислением, поэтому
+    повторное выполнение перевода не зачисляет средства дважды.
+
+    Attributes:
+        id (str): Идентификатор перевода (TransferIntent.id).
+        to_user_id (int): Пользователь-получатель.
+        amount (float): Сумма перевода.
+        credited (bool): Были ли зачислены средства (False, если
+            получатель не найден и перевод нужно вернуть отправителю).
+        created_at (DateTime): Время зачисления.
+    """
+
+    __tablename__ = "applied_transfers"
+
+    id: str = Column(String(32), primary_key=True)
+    to_user_id: int = Column(Integer, nullable=False)
+    amount: float = Column(Float, nullable=False)
+    credited: bool = Column(Boolean, nullable=False)
+    created_at: DateTime = Column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class AccrualRuleType(str, Enum):
+    """
+    Типы правил пакетного начисления.
+    """
+
+    INTEREST = "interest"
+    FEE = "fee"
+
+
+class AccrualRule(Base):
+    """
+    Правило начисления процентов или списания комиссии.
+
+    Сумма для счета: balance * rate + fixed_amount, округленная до сотых.
+    Комиссия не превышает доступный баланс (без заблокированных
+    средств).
+
+    Attributes:
+        id (int): Уникальный идентификатор правила.
+        name (str): Уникальное имя правила.
+        rule_type (AccrualRuleType): Начисление или списание.
+        rate (float): Доля от баланса.
+        fixed_amount (float): Фиксированная сумма.
+        min_balance (float): Минимальный баланс, с которого применяется
+            правило.
+        created_at (DateTime): Время создания правила.
+    """
+
+    __tablename__ = "accrual_rules"
+
+    id: int = Column(Integer, primary_key=True)
+    name: str = Column(String, nullable=False, unique=True)
+    rule_type: AccrualRuleType = Column(
+        SQLEnum(AccrualRuleType), nullable=False
+    )
+    rate: float = Column(Float, nullable=False, default=0.0)
+    fixed_amount: float = Column(Float, nullable=False, default=0.0)
+    min_balance: float = Column(Float, nullable=False, default=0.0)
+    created_at: DateTime = Column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class AccrualRunStatus(str, Enum):
+    """
+    Статусы запуска пакетного начисления.
+    """
+
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+
+class AccrualRun(Base):
+    """
+    Запуск правила за период. Хранится в основной базе, одно правило
+    применяется за период не больше одного раза.
+
+    Attributes:
+        id (int): Уникальный идентификатор запуска.
+        rule_id (int): Применяемое правило.
+        period (str): Период, например 2026-10.
+        status (AccrualRunStatus): Статус запуска.
+        chunk_size (int): Размер диапазона ID пользователей в порции.
+        max_user_id (int): Максимальный ID пользователя на момент запуска.
+        created_at (DateTime): Время запуска.
+        finished_at (DateTime): Время завершения.
+    """
+
+    __tablename__ = "accrual_runs"
+    __table_args__ = (
+        UniqueConstraint("rule_id", "period", name="uq_accrual_runs_rule"),
+    )
+
+    id: int = Column(Integer, primary_key=True)
+    rule_id: int = Column(
+        Integer, ForeignKey("accrual_rules.id"), nullable=False
+    )
+    period: str = Column(String, nullable=False)
+    status: AccrualRunStatus = Column(
+        SQLEnum(AccrualRunStatus),
+        nullable=False,
+        default=AccrualRunStatus.RUNNING,
+    )
+    chunk_size: int = Column(Integer, nullable=False)
+    max_user_id: int = Column(Integer, nullable=False)
+    created_at: DateTime = Column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    finished_at: DateTime = Column(DateTime(timezone=True))
+
+
+class AccrualChunk(Base):
+    """
+    Выполненная порция запуска. Хранится в базе (шарде), где были
+    изменены балансы, и создается в одной транзакции БД с изменением,
+    поэтому при возобновлении запуска порция не применяется повторно.
+
+    Attributes:
+        run_id (int): Запуск (AccrualRun.id в основной базе).
+        start_id (int): Начало диапазона ID пользователей.
+        accounts (int): Число измененных счетов.
+        total_amount (float): Сумма начислений или списаний.
+        created_at (DateTime): Время выполнения порции.
+    """
+
+    __tablename__ = "accrual_chunks"
+
+    id = None
+    run_id: int = Column(Integer, primary_key=True)
+    start_id: int = Column(Integer, primary_key=True)
+    accounts: int = Column(Integer, nullable=False)
+    total_amount: float = Column(Float, nullable=False)
+    created_at: DateTime = Column(
+        DateTime(timezone=True), server_default=func.now()
+    )
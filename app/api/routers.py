@@ -1,6 +1,12 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import transactions, users
+from app.api.endpoints import (
+    health,
+    holds,
+    scheduled_transfers,
+    transactions,
+    users,
+)
 
 router = APIRouter()
 
@@ -9,3 +15,10 @@ router.include_router(users.router, prefix="/users", tags=("users",))
 router.include_router(
     transactions.router, prefix="/transactions", tags=("transactions",)
 )
+router.include_router(
+    scheduled_transfers.router,
+    prefix="/scheduled-transfers",
+    tags=("scheduled transfers",),
+)
+router.include_router(holds.router, prefix="/holds", tags=("holds",))
+router.include_router(health.router, prefix="/health", tags=("health",))
@@ -1,8 +1,44 @@
 from datetime import datetime
 from enum import Enum
-from typing import List
+from typing import Annotated, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import AfterValidator, BaseModel, Field, model_validator
+
+from app.core.errors import ErrorMessages
+
+
+def _check_positive_amount(amount: float) -> float:
+    """
+    Проверяет, что сумма положительная.
+    """
+    if amount <= 0:
+        raise ValueError(ErrorMessages.INVALID_AMOUNT.value)
+    return amount
+
+
+def _check_positive_interval(
+    interval_seconds: Optional[int],
+) -> Optional[int]:
+    """
+    Проверяет, что период повторения положительный.
+    """
+    if interval_seconds is not None and interval_seconds <= 0:
+        raise ValueError(ErrorMessages.INVALID_INTERVAL.value)
+    return interval_seconds
+
+
+def _check_positive_ttl(ttl_seconds: int) -> int:
+    """
+    Проверяет, что срок блокировки положительный.
+    """
+    if ttl_seconds <= 0:
+        raise ValueError(ErrorMessages.INVALID_HOLD_TTL.value)
+    return ttl_seconds
+
+
+# Сумма операции в запросе. Неположительная сумма отклоняется при
+# разборе запроса (422), до обращения к БД.
+PositiveAmount = Annotated[float, AfterValidator(_check_positive_amount)]
 
 
 class TransactionType(str, Enum):
@@ -13,10 +49,16 @@ class TransactionType(str, Enum):
         DEPOSIT: Тип транзакции "пополнение".
         WITHDRAW: Тип транзакции "списание".
         TRANSFER: Тип транзакции "перевод".
+        INTEREST: Тип транзакции "начисление процентов".
+        FEE: Тип транзакции "списание комиссии".
+        CAPTURE: Тип транзакции "списание заблокированных средств".
     """
     DEPOSIT = "deposit"
     WITHDRAW = "withdraw"
     TRANSFER = "transfer"
+    INTEREST = "interest"
+    FEE = "fee"
+    CAPTURE = "capture"
 
 
 class UserBase(BaseModel):
@@ -56,9 +98,9 @@ class TransactionDeposit(BaseModel):
     Схема для пополнения баланса.
 
     Атрибуты:
-        amount: Сумма для пополнения.
+        amount: Сумма для пополнения (положительная).
     """
-    amount: float = Field(example=100.0)
+    amount: PositiveAmount = Field(example=100.0)
 
 
 class TransactionHistoryResponse(BaseModel):
@@ -77,18 +119,59 @@ class TransactionHistoryResponse(BaseModel):
     created_at: datetime
 
 
-class TransactionTransfer(BaseModel):
+class TransactionSearchItem(TransactionHistoryResponse):
     """
-    Схема для перевода средств между пользователями.
+    Схема транзакции в результатах поиска.
+
+    Атрибуты:
+        user_id: Идентификатор пользователя, связанного с транзакцией.
+    """
+    user_id: int = Field(example=1)
+
+
+class TransactionSearchResponse(BaseModel):
+    """
+    Схема для отображения страницы результатов поиска транзакций.
+
+    Атрибуты:
+        transactions: Транзакции текущей страницы.
+        next_cursor: Курсор следующей страницы (None для последней).
+        estimated_total: Оценка общего числа найденных транзакций.
+    """
+    transactions: List[TransactionSearchItem]
+    next_cursor: Optional[int] = Field(default=None, example=100)
+    estimated_total: int = Field(example=1000)
+
+
+class TransferUsers(BaseModel):
+    """
+    Базовая схема запроса перевода между разными пользователями.
 
     Атрибуты:
         from_user_id: Идентификатор пользователя-отправителя.
-        to_user_id: Идентификатор пользователя-получателя средства.
-        amount: Сумма перевода.
+        to_user_id: Идентификатор пользователя-получателя.
     """
     from_user_id: int = 1
     to_user_id: int = 2
-    amount: float = 100
+
+    @model_validator(mode="after")
+    def check_different_users(self):
+        """
+        Проверяет, что перевод выполняется между разными пользователями.
+        """
+        if self.from_user_id == self.to_user_id:
+            raise ValueError(ErrorMessages.TRANSFER_SAME_USER.value)
+        return self
+
+
+class TransactionTransfer(TransferUsers):
+    """
+    Схема для перевода средств между пользователями.
+
+    Атрибуты:
+        amount: Сумма перевода (положительная).
+    """
+    amount: PositiveAmount = 100
 
 
 class UserResponse(UserBase):
@@ -98,10 +181,14 @@ class UserResponse(UserBase):
     Атрибуты:
         id: Уникальный идентификатор пользователя.
         balance: Текущий баланс пользователя.
+        held_balance: Сумма заблокированных средств.
+        available_balance: Баланс, доступный для списаний и переводов.
         created_at: Дата и время создания пользователя.
     """
     id: int = Field(example=1)
     balance: float = Field(example=100)
+    held_balance: float = Field(example=30)
+    available_balance: float = Field(example=70)
     created_at: datetime
 
     class Config:
@@ -120,6 +207,34 @@ class UserTransactionsResponse(BaseModel):
     transactions: List[TransactionHistoryResponse]
 
 
+class BalanceSeriesBucket(str, Enum):
+    """
+    Перечисление для интервалов ряда балансов.
+
+    Атрибуты:
+        HOUR: Интервал в один час.
+        DAY: Интервал в одни сутки.
+    """
+    HOUR = "hour"
+    DAY = "day"
+
+
+class BalanceSeriesResponse(BaseModel):
+    """
+    Схема для отображения ряда балансов пользователя.
+
+    Атрибуты:
+        user_id: Идентификатор пользователя.
+        bucket: Длина интервала.
+        timestamps: Начала интервалов (UTC).
+        balances: Баланс на конец каждого интервала.
+    """
+    user_id: int = Field(example=1)
+    bucket: BalanceSeriesBucket
+    timestamps: List[datetime]
+    balances: List[float] = Field(example=[100.0, 150.0])
+
+
 class MessageResponse(BaseModel):
     """
     Базовая схема для ответа с сообщением.
@@ -165,6 +280,140 @@ class WithdrawRequest(BaseModel):
     Схема для запроса списания средств.
 
     Атрибуты:
-        amount: Сумма для списания.
+        amount: Сумма для списания (положительная).
+    """
+    amount: PositiveAmount = Field(example=100.0)
+
+
+class HealthResponse(BaseModel):
     """
+    Схема для отображения состояния воркера.
+
+    Атрибуты:
+        pid: Идентификатор процесса воркера.
+        pool: Состояние пула соединений с базой данных.
+        active_requests: Число выполняемых запросов.
+        queued_requests: Число запросов в очереди.
+    """
+    pid: int = Field(example=12345)
+    pool: str
+    active_requests: int = Field(example=3)
+    queued_requests: int = Field(example=0)
+
+
+class MetricsResponse(BaseModel):
+    """
+    Схема для отображения счетчиков воркера.
+
+    Атрибуты:
+        uptime: Время работы воркера в секундах.
+        counters: Значения счетчиков, сгруппированные по имени и метке.
+    """
+    uptime: float = Field(example=3600.0)
+    counters: Dict[str, Dict[str, float]] = Field(
+        example={"balance_operations": {"pessimistic": 1000}}
+    )
+
+
+class ScheduledTransferCreate(TransferUsers):
+    """
+    Схема для создания запланированного перевода.
+
+    Атрибуты:
+        amount: Сумма перевода (положительная).
+        run_at: Время первого выполнения.
+        interval_seconds: Период повторения в секундах (для разового
+            перевода не указывается).
+    """
+    amount: PositiveAmount = 100
+    run_at: datetime
+    interval_seconds: Annotated[
+        Optional[int], AfterValidator(_check_positive_interval)
+    ] = Field(default=None, example=2592000)
+
+
+class ScheduledTransferResponse(BaseModel):
+    """
+    Схема для отображения запланированного перевода.
+
+    Атрибуты:
+        id: Уникальный идентификатор перевода.
+        from_user_id: Идентификатор пользователя-отправителя.
+        to_user_id: Идентификатор пользователя-получателя.
+        amount: Сумма перевода.
+        interval_seconds: Период повторения в секундах.
+        next_run_at: Время следующего выполнения.
+        status: Статус перевода.
+        attempts: Число неудачных попыток подряд.
+        last_error: Причина последней неудачи.
+        created_at: Дата и время создания перевода.
+    """
+    id: int = Field(example=1)
+    from_user_id: int = Field(example=1)
+    to_user_id: int = Field(example=2)
+    amount: float = Field(example=100.0)
+    interval_seconds: Optional[int] = Field(example=2592000)
+    next_run_at: datetime
+    status: str = Field(example="active")
+    attempts: int = Field(example=0)
+    last_error: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class HoldCreate(BaseModel):
+    """
+    Схема для блокировки средств.
+
+    Атрибуты:
+        user_id: Идентификатор пользователя.
+        amount: Блокируемая сумма (положительная).
+        ttl_seconds: Срок блокировки в секундах, после которого она
+            снимается автоматически.
+    """
+    user_id: int = Field(example=1)
+    amount: PositiveAmount = Field(example=100.0)
+    ttl_seconds: Annotated[int, AfterValidator(_check_positive_ttl)] = Field(
+        default=604800, example=604800
+    )
+
+
+class HoldCapture(BaseModel):
+    """
+    Схема для списания заблокированных средств.
+
+    Атрибуты:
+        amount: Списываемая сумма (положительная, не больше
+            заблокированной). По умолчанию списывается вся сумма,
+            остаток блокировки снимается.
+    """
+    amount: Optional[PositiveAmount] = Field(default=None, example=80.0)
+
+
+class HoldResponse(BaseModel):
+    """
+    Схема для отображения блокировки средств.
+
+    Атрибуты:
+        id: Уникальный идентификатор блокировки.
+        user_id: Идентификатор пользователя.
+        amount: Заблокированная сумма.
+        captured_amount: Списанная сумма.
+        status: Статус блокировки.
+        expires_at: Время истечения блокировки.
+        created_at: Дата и время создания блокировки.
+        finished_at: Время списания, снятия или истечения.
+    """
+    id: int = Field(example=1)
+    user_id: int = Field(example=1)
     amount: float = Field(example=100.0)
+    captured_amount: Optional[float] = Field(default=None, example=80.0)
+    status: str = Field(example="active")
+    expires_at: datetime
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,7 @@
+from datetime import datetime
+from typing import Optional
+
 from fastapi import HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
 from app.api.models import User
 from app.core.errors import ErrorMessages
@@ -16,12 +17,10 @@ def validate_user_exists(user: User) -> None:
         )
 
 
-async def validate_user_does_not_exist(db: AsyncSession, name: str) -> None:
+def validate_user_does_not_exist(existing_user: User) -> None:
     """
     Проверяет, что пользователь с таким именем не существует.
     """
-    result = await db.execute(select(User).filter(User.name == name))
-    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -29,46 +28,96 @@ async def validate_user_does_not_exist(db: AsyncSession, name: str) -> None:
         )
 
 
-def validate_positive_amount(amount: float) -> None:
+def validate_sufficient_funds(user_balance: float, amount: float) -> None:
     """
-    Проверяет, что сумма положительная.
+    Проверяет, что на балансе достаточно средств.
     """
-    if amount <= 0:
+    if user_balance < amount:
         raise HTTPException(
-            status_code=400, detail=ErrorMessages.INVALID_AMOUNT
+            status_code=400, detail=ErrorMessages.INSUFFICIENT_FUNDS
         )
 
 
-def validate_sufficient_funds(user_balance: float, amount: float) -> None:
+def validate_users_exist(from_user: User, to_user: User) -> None:
     """
-    Проверяет, что на балансе достаточно средств.
+    Проверяет, что оба пользователя существуют. Если нет обоих,
+    сообщается об отправителе.
     """
-    if user_balance < amount:
+    if not from_user:
         raise HTTPException(
-            status_code=400, detail=ErrorMessages.INSUFFICIENT_FUNDS
+            status_code=404, detail=ErrorMessages.USER_SENDER_NOT_FOUND
+        )
+
+    if not to_user:
+        raise HTTPException(
+            status_code=404, detail=ErrorMessages.USER_RECIPIENT_NOT_FOUND
         )
 
 
-def validate_transfer_users(from_user_id: int, to_user_id: int) -> None:
+def validate_amount_range(
+    amount_min: Optional[float], amount_max: Optional[float]
+) -> None:
     """
-    Проверяет, что перевод выполняется между разными пользователями.
+    Проверяет, что минимальная сумма не больше максимальной.
     """
-    if from_user_id == to_user_id:
+    if (
+        amount_min is not None
+        and amount_max is not None
+        and amount_min > amount_max
+    ):
         raise HTTPException(
-            status_code=400, detail=ErrorMessages.TRANSFER_SAME_USER
+            status_code=400, detail=ErrorMessages.INVALID_AMOUNT_RANGE
         )
 
 
-def validate_users_exist(from_user: User, to_user: User) -> None:
+def validate_date_range(
+    date_from: Optional[datetime], date_to: Optional[datetime]
+) -> None:
     """
-    Проверяет, что оба пользователя существуют.
+    Проверяет, что начало периода раньше его конца.
     """
-    if from_user and not to_user:
+    if date_from is not None and date_to is not None and date_from >= date_to:
         raise HTTPException(
-            status_code=404, detail=ErrorMessages.USER_RECIPIENT_NOT_FOUND
+            status_code=400, detail=ErrorMessages.INVALID_DATE_RANGE
         )
 
-    if not from_user and to_user:
+
+def validate_search_user(user_id: Optional[int]) -> None:
+    """
+    Проверяет, что поиск транзакций ограничен одним пользователем.
+    """
+    if user_id is None:
         raise HTTPException(
-            status_code=404, detail=ErrorMessages.USER_SENDER_NOT_FOUND
+            status_code=400, detail=ErrorMessages.SEARCH_USER_REQUIRED
+        )
+
+
+def validate_scheduled_transfer_exists(scheduled_transfer) -> None:
+    """
+    Проверяет, существует ли запланированный перевод.
+    """
+    if scheduled_transfer is None:
+        raise HTTPException(
+            status_code=404,
+            detail=ErrorMessages.SCHEDULED_TRANSFER_NOT_FOUND,
+        )
+
+
+def validate_series_buckets(bucket_count: int, max_buckets: int) -> None:
+    """
+    Проверяет, что ряд балансов не длиннее max_buckets интервалов.
+    """
+    if bucket_count > max_buckets:
+        raise HTTPException(
+            status_code=400, detail=ErrorMessages.TOO_MANY_BUCKETS
+        )
+
+
+def validate_hold_exists(hold) -> None:
+    """
+    Проверяет, существует ли блокировка средств.
+    """
+    if hold is None:
+        raise HTTPException(
+            status_code=404, detail=ErrorMessages.HOLD_NOT_FOUND
         )
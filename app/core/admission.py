@@ -0,0 +1,280 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Deque, Dict, Optional
+
+from .config import Settings, get_settings
+
+
+class Priority(IntEnum):
+    """
+    Приоритет запроса при ожидании свободного слота.
+
+    Атрибуты:
+        READ: Дешевые запросы на чтение, обслуживаются в первую очередь.
+        WRITE: Запросы, изменяющие баланс.
+    """
+
+    READ = 0
+    WRITE = 1
+
+
+class AdmissionRejected(Exception):
+    """
+    Запрос отклонен системой контроля нагрузки.
+
+    Attributes:
+        retry_after: Через сколько секунд имеет смысл повторить запрос.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimited(AdmissionRejected):
+    """
+    Пользователь превысил лимит частоты операций.
+    """
+
+
+class Overloaded(AdmissionRejected):
+    """
+    Сервис перегружен: очередь переполнена или время ожидания истекло.
+    """
+
+
+class TokenBucket:
+    """
+    Корзина токенов для ограничения частоты операций.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Забирает один токен.
+
+        Returns:
+            float: 0, если токен выдан, иначе время до появления токена.
+        """
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class UserRateLimiter:
+    """
+    Ограничитель частоты операций по пользователям.
+    Хранит корзины последних активных пользователей (LRU).
+    """
+
+    def __init__(self, rate: float, burst: int, max_users: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+
+    def check(self, user_id: int) -> None:
+        """
+        Проверяет лимит пользователя.
+
+        Raises:
+            RateLimited: Если токены пользователя закончились.
+        """
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(
+                self.rate, self.burst
+            )
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        wait = bucket.take()
+        if wait:
+            raise RateLimited(wait)
+
+
+class ConcurrencyLimiter:
+    """
+    Глобальное ограничение числа одновременно выполняемых запросов.
+
+    Лимит равен емкости пула соединений с БД. Запросы на запись не могут
+    занять последние read_reserve слотов, а при освобождении слота первыми
+    обслуживаются ожидающие запросы на чтение. Запрос, не дождавшийся слота
+    за queue_timeout, отклоняется.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        read_reserve: int,
+        queue_timeout: float,
+        max_queue: int,
+    ):
+        self.limit = limit
+        self.write_limit = max(1, limit - read_reserve)
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: Dict[Priority, Deque[asyncio.Future]] = {
+            Priority.READ: deque(),
+            Priority.WRITE: deque(),
+        }
+
+    @property
+    def queued(self) -> int:
+        """
+        Число запросов, ожидающих слот.
+        """
+        return sum(map(len, self._waiters.values()))
+
+    def _capacity(self, priority: Priority) -> int:
+        """
+        Число слотов, доступных запросам с указанным приоритетом.
+        """
+        if priority is Priority.READ:
+            return self.limit
+        return self.write_limit
+
+    def _wake(self) -> None:
+        """
+        Передает свободные слоты ожидающим запросам в порядке приоритета.
+        """
+        for priority in (Priority.READ, Priority.WRITE):
+            waiters = self._waiters[priority]
+            while waiters and self.active < self._capacity(priority):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self.active += 1
+                    waiter.set_result(None)
+
+    async def acquire(self, priority: Priority) -> None:
+        """
+        Занимает слот.
+
+        Raises:
+            Overloaded: Если очередь переполнена или время ожидания слота
+                истекло.
+        """
+        waiters = self._waiters[priority]
+        if not waiters and self.active < self._capacity(priority):
+            self.active += 1
+            return
+        if self.queued >= self.max_queue:
+            raise Overloaded(self.queue_timeout)
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+                waiters.remove(waiter)
+        if waiter.cancelled():
+            raise Overloaded(self.queue_timeout)
+
+    def release(self) -> None:
+        """
+        Освобождает слот.
+        """
+        self.active -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority):
+        """
+        Контекстный менеджер, удерживающий слот на время выполнения запроса.
+        """
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class AdmissionController:
+    """
+    Контроль нагрузки: глобальный лимит конкурентности и лимиты
+    пользователей на операции изменения баланса.
+
+    Лимиты строятся из настроек при вызове configure или при первом
+    обращении.
+    """
+
+    def __init__(self):
+        self._limiter: Optional[ConcurrencyLimiter] = None
+        self._user_limiter: Optional[UserRateLimiter] = None
+
+    def configure(self, settings: Settings) -> None:
+        """
+        Построение лимитов из настроек приложения.
+        """
+        self._limiter = ConcurrencyLimiter(
+            limit=settings.db_pool_size + settings.db_max_overflow,
+            read_reserve=settings.admission_read_reserve,
+            queue_timeout=settings.admission_queue_timeout,
+            max_queue=settings.admission_max_queue,
+        )
+        self._user_limiter = UserRateLimiter(
+            settings.user_write_rate, settings.user_write_burst
+        )
+
+    @property
+    def limiter(self) -> ConcurrencyLimiter:
+        """
+        Глобальный лимит конкурентности.
+        """
+        if self._limiter is None:
+            self.configure(get_settings())
+        return self._limiter
+
+    @property
+    def user_limiter(self) -> UserRateLimiter:
+        """
+        Лимиты пользователей на операции изменения баланса.
+        """
+        if self._user_limiter is None:
+            self.configure(get_settings())
+        return self._user_limiter
+
+    @asynccontextmanager
+    async def read(self):
+        """
+        Допуск запроса на чтение.
+        """
+        async with self.limiter.slot(Priority.READ):
+            yield
+
+    @asynccontextmanager
+    async def write(self, user_id: Optional[int]):
+        """
+        Допуск запроса на изменение баланса пользователя.
+        """
+        if user_id is not None:
+            self.user_limiter.check(user_id)
+        async with self.limiter.slot(Priority.WRITE):
+            yield
+
+
+admission = AdmissionController()
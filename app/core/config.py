@@ -1,10 +1,32 @@
+from functools import lru_cache
 from pathlib import Path
+from typing import List, Literal, Optional
 
 from dotenv import load_dotenv
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
-load_dotenv(env_path)
+
+
+class VelocityRuleSettings(BaseModel):
+    """
+    Правило ограничения операций пользователя за скользящее окно.
+
+    Attributes:
+        name: Имя правила (метка в счетчиках).
+        operations: Операции, к которым применяется правило: withdraw
+            и/или transfer (исходящие переводы).
+        window: Длина окна (в секундах).
+        max_count: Максимальное число операций в окне.
+        max_amount: Максимальная сумма операций в окне.
+    """
+
+    name: str
+    operations: List[Literal["withdraw", "transfer"]]
+    window: float
+    max_count: Optional[int] = None
+    max_amount: Optional[float] = None
 
 
 class Settings(BaseSettings):
@@ -16,6 +38,94 @@ class Settings(BaseSettings):
         database_url: URL подключения к базе данных.
         secret: Секретный ключ.
         postgres_db: Название базы данных PostgreSQL.
+        db_pool_size: Размер пула соединений с базой данных.
+        db_max_overflow: Число соединений сверх размера пула.
+        db_connection_budget: Общее число соединений с БД на все процессы
+            приложения при запуске через app.serve.
+        admission_queue_timeout: Максимальное время ожидания запроса в
+            очереди на выполнение (в секундах).
+        admission_max_queue: Максимальная длина очереди ожидающих запросов.
+        admission_read_reserve: Число слотов, зарезервированных под чтение.
+        user_write_rate: Скорость пополнения токенов на изменение баланса
+            для одного пользователя (в секунду).
+        user_write_burst: Максимальное число токенов пользователя.
+        events_keepalive_interval: Интервал отправки keepalive подписчикам
+            событий (в секундах).
+        db_warm_up: Прогревать ли пул соединений при запуске приложения.
+        balance_concurrency_mode: Режим изменения балансов: pessimistic
+            (блокировка строк) или optimistic (сравнение версий).
+        balance_max_retries: Максимальное число повторов операции
+            при конфликте.
+        balance_retry_base_delay: Базовая пауза перед повтором (в секундах).
+        scheduler_workers: Число воркеров запланированных переводов в
+            процессе приложения (0 - не запускать).
+        scheduler_batch_size: Число переводов, захватываемых за раз.
+        scheduler_group_size: Число переводов пачки, выполняемых в одной
+            транзакции БД.
+        scheduler_poll_interval: Пауза между проверками при отсутствии
+            наступивших переводов (в секундах).
+        scheduler_max_attempts: Число неудачных попыток, после которого
+            перевод помечается неудачным.
+        scheduler_retry_base_delay: Базовая пауза перед повтором
+            неудачного перевода (в секундах).
+        storage_backend: Хранилище основных операций: sql (база данных)
+            или memory (память процесса с журналом на диске, только
+            один воркер).
+        ledger_data_dir: Каталог журнала и снимков хранилища memory
+            (пустая строка - без сохранения на диск).
+        ledger_snapshot_interval: Число операций между снимками
+            хранилища memory.
+        ledger_wal_fsync: Дожидаться ли записи журнала на диск перед
+            ответом на запрос.
+        shard_urls: URL дополнительных баз данных (шардов). Пользователи
+            распределяются между database_url и этими базами
+            консистентным хешированием по ID.
+        shard_virtual_nodes: Число точек каждого шарда на кольце хешей.
+        transfer_recovery_interval: Пауза между проверками незавершенных
+            межшардовых переводов (в секундах).
+        transfer_recovery_delay: Возраст незавершенного межшардового
+            перевода, после которого его завершает восстановление
+            (в секундах).
+        accrual_chunk_size: Размер диапазона ID пользователей в порции
+            пакетного начисления.
+        accrual_concurrency: Число порций пакетного начисления,
+            выполняемых параллельно.
+        velocity_rules: Правила ограничения списаний и переводов за
+            скользящее окно (JSON-список VelocityRuleSettings).
+        velocity_buckets: Число интервалов, на которые делится окно
+            правила. Точность окна - window / velocity_buckets.
+        log_format: Формат логов: json или text.
+        log_queue_size: Максимальное число записей в очереди вывода
+            логов, записи сверх него отбрасываются.
+        sql_log_sample_rate: Доля запросов к БД, выводимых в лог
+            (от 0 до 1).
+        sql_slow_query_threshold: Длительность запроса к БД, начиная
+            с которой он выводится в лог как медленный (в секундах).
+        purge_interval: Пауза между проверками закрытых счетов, данные
+            которых нужно удалить (в секундах).
+        purge_chunk_size: Число транзакций или событий, удаляемых
+            в одной транзакции БД.
+        purge_chunk_delay: Пауза между порциями удаления (в секундах).
+        purge_max_replication_lag: Отставание реплик PostgreSQL, при
+            котором удаление приостанавливается (в секундах).
+        outbox_retention: Окно воспроизведения событий (в секундах):
+            события старше удаляются фоновой очисткой, и переподключение
+            с Last-Event-ID старше окна получает только более новые
+            события (0 - не удалять).
+        statement_output_dir: Каталог файлов ежемесячных выписок.
+        statement_batch_size: Число выписок в пачке, передаваемой в
+            процесс формирования.
+        statement_fetch_size: Число строк, читаемых из курсора за раз.
+        statement_processes: Число процессов формирования выписок
+            (0 - по числу ядер).
+        hold_sweep_interval: Пауза между проверками истекших блокировок
+            средств (в секундах).
+        hold_sweep_batch_size: Число истекших блокировок, снимаемых
+            в одной транзакции БД.
+        background_workers: Запускать ли в процессе приложения фоновые
+            воркеры: запланированные переводы, восстановление межшардовых
+            переводов, очистку закрытых счетов и снятие истекших
+            блокировок. app.serve запускает их только в воркере 0.
 
     """
 
@@ -23,6 +133,55 @@ class Settings(BaseSettings):
     database_url: str
     secret: str
     postgres_db: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_connection_budget: int = 90
+    admission_queue_timeout: float = 0.5
+    admission_max_queue: int = 100
+    admission_read_reserve: int = 2
+    user_write_rate: float = 5.0
+    user_write_burst: int = 10
+    events_keepalive_interval: float = 15.0
+    db_warm_up: bool = True
+    balance_concurrency_mode: Literal["pessimistic", "optimistic"] = (
+        "pessimistic"
+    )
+    balance_max_retries: int = 5
+    balance_retry_base_delay: float = 0.005
+    scheduler_workers: int = 2
+    scheduler_batch_size: int = 100
+    scheduler_group_size: int = 10
+    scheduler_poll_interval: float = 1.0
+    scheduler_max_attempts: int = 5
+    scheduler_retry_base_delay: float = 60.0
+    storage_backend: Literal["sql", "memory"] = "sql"
+    ledger_data_dir: str = "data/ledger"
+    ledger_snapshot_interval: int = 100_000
+    ledger_wal_fsync: bool = False
+    shard_urls: List[str] = []
+    shard_virtual_nodes: int = 100
+    transfer_recovery_interval: float = 5.0
+    transfer_recovery_delay: float = 30.0
+    accrual_chunk_size: int = 1000
+    accrual_concurrency: int = 4
+    velocity_rules: List[VelocityRuleSettings] = []
+    velocity_buckets: int = 60
+    log_format: Literal["json", "text"] = "json"
+    log_queue_size: int = 10_000
+    sql_log_sample_rate: float = 0.0
+    sql_slow_query_threshold: float = 0.5
+    purge_interval: float = 60.0
+    purge_chunk_size: int = 500
+    purge_chunk_delay: float = 0.1
+    purge_max_replication_lag: float = 10.0
+    outbox_retention: float = 86400.0
+    statement_output_dir: str = "data/statements"
+    statement_batch_size: int = 500
+    statement_fetch_size: int = 10_000
+    statement_processes: int = 0
+    hold_sweep_interval: float = 5.0
+    hold_sweep_batch_size: int = 100
+    background_workers: bool = True
 
     class Config:
         """Мета-настройки для класса Settings"""
@@ -32,4 +191,31 @@ class Settings(BaseSettings):
         extra: str = "ignore"
 
 
-settings = Settings()
+def background_connections(settings: Settings) -> int:
+    """
+    Число соединений с БД, которые одновременно занимают фоновые воркеры
+    процесса: по одному на воркер запланированных переводов, очистку
+    закрытых счетов, снятие блокировок и восстановление переводов.
+    """
+    if not settings.background_workers:
+        return 0
+    return settings.scheduler_workers + 3
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Настройки приложения. Создаются при первом обращении, а не при
+    импорте модуля.
+    """
+    load_dotenv(env_path)
+    return Settings()
+
+
+def __getattr__(name: str):
+    """
+    Ленивый доступ к settings для обратной совместимости.
+    """
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,22 @@
+import asyncio
+import bisect
+import hashlib
+from typing import Awaitable, Callable, List, Optional
+
 from sqlalchemy import Column, Integer
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import declarative_base, declared_attr
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.expression import ClauseElement
 
-from .config import settings
+from .config import background_connections, get_settings
+from .log import instrument_engine
 
 
 class PreBase:
@@ -23,20 +37,236 @@ class PreBase:
 
 Base = declarative_base(cls=PreBase)
 
-engine = create_async_engine(settings.database_url, echo=True)
 
-AsyncSessionLocal = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
+class explain(Executable, ClauseElement):
+    """
+    Конструкция EXPLAIN (FORMAT JSON) для произвольного запроса.
+    Параметры исходного запроса остаются связанными.
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    """
+    Компиляция EXPLAIN для PostgreSQL.
+    """
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+class ShardRouter:
+    """
+    Распределение пользователей между базами данных (шардами).
+
+    Шард пользователя выбирается консистентным хешированием по ID: каждый
+    шард занимает virtual_nodes точек на кольце хешей, и пользователь
+    относится к первой точке после хеша своего ID. При добавлении шарда
+    на него переходит примерно 1/N пользователей.
+
+    Шард 0 - основная база (database_url), на ней же хранятся счетчики
+    глобальных ID.
+    """
+
+    def __init__(
+        self,
+        engines: List[AsyncEngine],
+        sessionmakers: List[async_sessionmaker],
+        virtual_nodes: int = 100,
+    ):
+        self.engines = engines
+        self.sessionmakers = sessionmakers
+        points = sorted(
+            (_ring_hash(f"shard-{shard}-{node}"), shard)
+            for shard in range(len(engines))
+            for node in range(virtual_nodes)
+        )
+        self._ring_hashes = [point for point, _ in points]
+        self._ring_shards = [shard for _, shard in points]
+
+    @property
+    def count(self) -> int:
+        """
+        Число шардов.
+        """
+        return len(self.engines)
+
+    @property
+    def sharded(self) -> bool:
+        """
+        Распределены ли данные между несколькими базами.
+        """
+        return len(self.engines) > 1
+
+    def shard_for(self, user_id: int) -> int:
+        """
+        Номер шарда пользователя.
+        """
+        if not self.sharded:
+            return 0
+        index = bisect.bisect(self._ring_hashes, _ring_hash(str(user_id)))
+        return self._ring_shards[index % len(self._ring_shards)]
+
+    def session(self, shard: int = 0) -> AsyncSession:
+        """
+        Новая сессия шарда.
+        """
+        return self.sessionmakers[shard]()
+
+    def session_for_user(self, user_id: int) -> AsyncSession:
+        """
+        Новая сессия шарда пользователя.
+        """
+        return self.session(self.shard_for(user_id))
+
+
+def _ring_hash(key: str) -> int:
+    """
+    Позиция ключа на кольце хешей.
+    """
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+engine: Optional[AsyncEngine] = None
+
+shard_router: Optional[ShardRouter] = None
+
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession, expire_on_commit=False
 )
 
 
+def _create_engine(url: str) -> AsyncEngine:
+    settings = get_settings()
+    async_engine = create_async_engine(
+        url,
+        echo=False,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow
+        + background_connections(settings),
+    )
+    instrument_engine(async_engine)
+    return async_engine
+
+
+def init_engine() -> AsyncEngine:
+    """
+    Создание движка БД и привязка к нему фабрики сессий.
+    Для дополнительных шардов создаются отдельные движки.
+    Повторный вызов возвращает уже созданный движок.
+    """
+    global engine, shard_router
+    if engine is None:
+        settings = get_settings()
+        engine = _create_engine(settings.database_url)
+        AsyncSessionLocal.configure(bind=engine)
+        engines = [engine]
+        sessionmakers = [AsyncSessionLocal]
+        for url in settings.shard_urls:
+            shard_engine = _create_engine(url)
+            engines.append(shard_engine)
+            sessionmakers.append(
+                async_sessionmaker(
+                    shard_engine, class_=AsyncSession, expire_on_commit=False
+                )
+            )
+        shard_router = ShardRouter(
+            engines, sessionmakers, settings.shard_virtual_nodes
+        )
+    return engine
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Движок БД, создается при первом обращении.
+    """
+    return engine if engine is not None else init_engine()
+
+
+def get_shard_router() -> ShardRouter:
+    """
+    Маршрутизатор шардов, создается вместе с движком БД.
+    """
+    get_engine()
+    return shard_router
+
+
+async def dispose_engine() -> None:
+    """
+    Закрытие всех соединений пулов и сброс движков.
+    """
+    global engine, shard_router
+    if engine is not None:
+        for shard_engine in shard_router.engines:
+            await shard_engine.dispose()
+        engine = None
+        shard_router = None
+
+
+async def warm_up_pool(
+    warm_up: Callable[[AsyncSession], Awaitable[None]], connections: int
+) -> None:
+    """
+    Заполнение пулов всех шардов соединениями и их прогрев.
+
+    Сессии открываются одновременно, поэтому каждая получает отдельное
+    соединение, на котором выполняется warm_up.
+    """
+
+    async def _warm_up_connection(sessionmaker: async_sessionmaker):
+        async with sessionmaker() as db:
+            await warm_up(db)
+
+    await asyncio.gather(
+        *(
+            _warm_up_connection(sessionmaker)
+            for sessionmaker in get_shard_router().sessionmakers
+            for _ in range(connections)
+        )
+    )
+
+
+async def release_session(session: AsyncSession) -> None:
+    """
+    Возврат соединения сессии в пул после последнего обращения к БД
+    в запросе, не дожидаясь построения и отправки ответа.
+
+    Незафиксированная транзакция откатывается, загруженные объекты
+    отсоединяются от сессии, но сохраняют значения атрибутов. При
+    следующем обращении сессия снова получит соединение из пула.
+    """
+    await session.close()
+
+
 async def get_async_session():
     """
     Асинхронный контекстный менеджер для работы с сессией базы данных.
     Предоставляет сессию и закрывает её после завершения работы.
 
+    Сессия получает соединение из пула только при первом запросе к БД
+    и возвращает его при фиксации или откате транзакции. Чтобы не
+    удерживать соединение на время построения ответа, после последнего
+    чтения вызывается release_session.
+
     Yields:
         AsyncSession: Асинхронная сессия для выполнения операций с БД.
     """
+    get_engine()
     async with AsyncSessionLocal() as async_session:
         yield async_session
+
+
+async def get_user_session(user_id: int):
+    """
+    Сессия шарда пользователя из пути запроса. Соединение, как и в
+    get_async_session, берется из пула только при первом запросе к БД.
+
+    Yields:
+        AsyncSession: Асинхронная сессия шарда пользователя.
+    """
+    async with get_shard_router().session_for_user(user_id) as async_session:
+        yield async_session
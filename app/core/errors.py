@@ -11,6 +11,34 @@ class ErrorMessages(str, Enum):
     INSUFFICIENT_FUNDS: Возвращается,когда у пользователя недостаточно средств.
     INVALID_AMOUNT: Возвращается, когда сумма транзакции не положительная.
     TRANSFER_SAME_USER: Возвращается, когда пользователь делает перевод себе.
+    INVALID_AMOUNT_RANGE: Возвращается, когда минимальная сумма больше
+    максимальной.
+    INVALID_DATE_RANGE: Возвращается, когда начало периода позже конца.
+    TOO_MANY_REQUESTS: Возвращается, когда пользователь превысил лимит
+    операций изменения баланса.
+    SERVICE_OVERLOADED: Возвращается, когда сервис перегружен и запрос
+    не дождался своей очереди.
+    SERVICE_NOT_READY: Возвращается, пока приложение запускается или
+    останавливается.
+    SCHEDULED_TRANSFER_NOT_FOUND: Возвращается, когда запланированный
+    перевод не найден.
+    INVALID_INTERVAL: Возвращается, когда период повторения не положительный.
+    SEARCH_USER_REQUIRED: Возвращается, когда при шардировании поиск
+    транзакций запрошен без пользователя.
+    TOO_MANY_BUCKETS: Возвращается, когда ряд балансов содержит слишком
+    много интервалов.
+    VELOCITY_LIMIT_EXCEEDED: Возвращается, когда списание или перевод
+    превышает лимит операций пользователя за период.
+    ACCOUNT_NOT_EMPTY: Возвращается, когда закрываемый счет не пуст:
+    на балансе есть средства или исходящие переводы не завершены.
+    HOLD_NOT_FOUND: Возвращается, когда блокировка средств не найдена.
+    HOLD_NOT_ACTIVE: Возвращается, когда блокировка уже списана, снята
+    или истекла.
+    HOLD_AMOUNT_EXCEEDED: Возвращается, когда списываемая сумма больше
+    заблокированной.
+    INVALID_HOLD_TTL: Возвращается, когда срок блокировки не положительный.
+    HOLDS_NOT_SUPPORTED: Возвращается при работе с блокировками средств
+    в хранилище memory.
     """
 
     USER_NOT_FOUND = "Пользователь не найден"
@@ -20,5 +48,80 @@ class ErrorMessages(str, Enum):
     INSUFFICIENT_FUNDS = "Недостаточно средств на балансе"
     INVALID_AMOUNT = "Сумма должна быть положительной"
     TRANSFER_SAME_USER = "Нельзя переводить средства самому себе"
+    INVALID_AMOUNT_RANGE = "Минимальная сумма больше максимальной"
+    INVALID_DATE_RANGE = "Начало периода должно быть раньше конца"
+    TOO_MANY_REQUESTS = "Слишком много операций, повторите позже"
+    SERVICE_OVERLOADED = "Сервис перегружен, повторите позже"
+    SERVICE_NOT_READY = "Сервис еще не готов принимать запросы"
+    SCHEDULED_TRANSFER_NOT_FOUND = "Запланированный перевод не найден"
+    INVALID_INTERVAL = "Период повторения должен быть положительным"
+    SEARCH_USER_REQUIRED = "Для поиска транзакций нужно указать user_id"
+    TOO_MANY_BUCKETS = "Слишком много интервалов, сократите период"
+    VELOCITY_LIMIT_EXCEEDED = "Превышен лимит операций за период"
+    ACCOUNT_NOT_EMPTY = (
+        "Счет можно закрыть только с нулевым балансом и без "
+        "незавершенных переводов"
+    )
+    HOLD_NOT_FOUND = "Блокировка средств не найдена"
+    HOLD_NOT_ACTIVE = "Блокировка уже списана, снята или истекла"
+    HOLD_AMOUNT_EXCEEDED = "Сумма списания больше заблокированной суммы"
+    INVALID_HOLD_TTL = "Срок блокировки должен быть положительным"
+    HOLDS_NOT_SUPPORTED = (
+        "Блокировка средств не поддерживается хранилищем memory"
+    )
     DATABASE_ERROR_MESSAGE = "Ошибка базы данных."
     UNDEFINED_ERROR_MESSAGE = "Неизвестная ошибка."
+
+
+class InsufficientFundsError(Exception):
+    """
+    Недостаточно средств на балансе пользователя для операции.
+
+    Attributes:
+        user_id: Пользователь, у которого недостаточно средств.
+    """
+
+    def __init__(self, user_id: int):
+        super().__init__(user_id)
+        self.user_id = user_id
+
+
+class AccountNotEmptyError(Exception):
+    """
+    Счет нельзя закрыть: на балансе есть средства или исходящие
+    переводы еще не завершены.
+
+    Attributes:
+        user_id: Пользователь, счет которого закрывается.
+    """
+
+    def __init__(self, user_id: int):
+        super().__init__(user_id)
+        self.user_id = user_id
+
+
+class HoldNotActiveError(Exception):
+    """
+    Блокировку нельзя списать или снять: она уже списана, снята или
+    истекла.
+
+    Attributes:
+        hold_id: Блокировка средств.
+    """
+
+    def __init__(self, hold_id: int):
+        super().__init__(hold_id)
+        self.hold_id = hold_id
+
+
+class HoldAmountExceededError(Exception):
+    """
+    Списываемая сумма больше суммы блокировки.
+
+    Attributes:
+        hold_id: Блокировка средств.
+    """
+
+    def __init__(self, hold_id: int):
+        super().__init__(hold_id)
+        self.hold_id = hold_id
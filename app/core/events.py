@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "balance_events"
+
+_CHANGED_USERS_KEY = "outbox_changed_users"
+
+
+class EventBroker:
+    """
+    Диспетчер пробуждения подписчиков на события пользователей.
+
+    Сами события хранятся в таблице outbox, брокер только сообщает
+    подписчикам, что для пользователя появились новые события. В одиночном
+    режиме пробуждение происходит после фиксации транзакции в этом же
+    процессе, при работе с PostgreSQL дополнительно используется
+    LISTEN/NOTIFY для пробуждения подписчиков на других узлах.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Event]] = defaultdict(set)
+        self._listeners: List[asyncio.Task] = []
+
+    @contextmanager
+    def subscribe(self, user_id: int):
+        """
+        Подписка на пробуждения по событиям пользователя.
+
+        Yields:
+            asyncio.Event: Флаг, выставляемый при появлении новых событий.
+        """
+        wakeup = asyncio.Event()
+        self._subscribers[user_id].add(wakeup)
+        try:
+            yield wakeup
+        finally:
+            subscribers = self._subscribers[user_id]
+            subscribers.discard(wakeup)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def wake(self, user_ids: Iterable[int]) -> None:
+        """
+        Пробуждение подписчиков указанных пользователей.
+        """
+        for user_id in user_ids:
+            for wakeup in self._subscribers.get(user_id, ()):
+                wakeup.set()
+
+    def wake_all(self) -> None:
+        """
+        Пробуждение всех подписчиков, например после потери связи с БД.
+        """
+        self.wake(list(self._subscribers))
+
+    @staticmethod
+    def mark_changed(db, user_id: int) -> None:
+        """
+        Отмечает пользователя, подписчиков которого нужно разбудить
+        после фиксации транзакции сессии.
+        """
+        db.info.setdefault(_CHANGED_USERS_KEY, set()).add(user_id)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        """
+        Обработчик NOTIFY от PostgreSQL.
+        """
+        try:
+            self.wake((int(payload),))
+        except ValueError:
+            logger.warning("Некорректное уведомление %r", payload)
+
+    async def _listen(self, engine: AsyncEngine) -> None:
+        """
+        Прослушивание канала NOTIFY с переподключением при ошибках.
+        Используется отдельное соединение вне пула приложения.
+        """
+        import asyncpg
+
+        dsn = engine.url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        delay = 1
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                delay = 1
+                # Уведомления могли быть пропущены, пока соединения не было.
+                self.wake_all()
+                while not connection.is_closed():
+                    await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка прослушивания %s", NOTIFY_CHANNEL)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def start(self, engines: Iterable[AsyncEngine]) -> None:
+        """
+        Запуск прослушивания NOTIFY на каждой базе (шарде) PostgreSQL.
+        """
+        if self._listeners:
+            return
+        self._listeners = [
+            asyncio.create_task(self._listen(engine))
+            for engine in engines
+            if engine.dialect.name == "postgresql"
+        ]
+
+    async def stop(self) -> None:
+        """
+        Остановка прослушивания NOTIFY.
+        """
+        for listener in self._listeners:
+            listener.cancel()
+        await asyncio.gather(*self._listeners, return_exceptions=True)
+        self._listeners = []
+
+
+broker = EventBroker()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    """
+    Пробуждение локальных подписчиков после фиксации транзакции.
+    """
+    user_ids = session.info.pop(_CHANGED_USERS_KEY, None)
+    if user_ids:
+        broker.wake(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    """
+    Сброс отметок об изменениях при откате транзакции.
+    """
+    session.info.pop(_CHANGED_USERS_KEY, None)
@@ -0,0 +1,253 @@
+"""
+Структурированное логирование.
+
+Записи форматируются в JSON (или текст) и выводятся фоновым потоком:
+обработчик корневого логгера только кладет запись в очередь, поэтому
+цикл событий не блокируется на вводе-выводе. Если очередь заполнена,
+запись отбрасывается и учитывается в счетчике log_dropped.
+
+Каждая запись содержит correlation_id запроса, в рамках которого она
+создана. ID берется из заголовка X-Correlation-ID (или X-Request-ID)
+либо генерируется и возвращается в заголовке ответа; внутри запроса он
+передается через contextvars во все вызовы, включая запросы к БД.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .config import get_settings
+from .metrics import metrics
+
+CORRELATION_ID_HEADER = "x-correlation-id"
+REQUEST_ID_HEADER = "x-request-id"
+
+correlation_id: ContextVar[Optional[str]] = ContextVar(
+    "correlation_id", default=None
+)
+
+sql_logger = logging.getLogger("app.sql")
+
+# Атрибуты LogRecord, которые не выводятся как дополнительные поля.
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "correlation_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирование записи в одну строку JSON.
+
+    Поля, переданные через extra, добавляются в запись как есть.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", None),
+            "pid": record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class CorrelationIdFilter(logging.Filter):
+    """
+    Добавление correlation_id текущего контекста в запись. Выполняется
+    в потоке, создавшем запись, до передачи в очередь.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Обработчик, передающий записи в очередь без ожидания.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("log_dropped")
+
+
+def _start_listener() -> None:
+    """
+    Запуск фонового потока вывода с новой очередью.
+    """
+    global _listener
+    settings = get_settings()
+    output = logging.StreamHandler()
+    if settings.log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(
+            logging.Formatter(
+                "%(asctime)s %(levelname)s [%(name)s] "
+                "[%(correlation_id)s] %(message)s"
+            )
+        )
+    _handler.queue = queue.Queue(settings.log_queue_size)
+    _listener = logging.handlers.QueueListener(_handler.queue, output)
+    _listener.start()
+
+
+def _restart_after_fork() -> None:
+    """
+    Поток вывода не переживает fork, поэтому в дочернем процессе
+    (воркере app.serve) он запускается заново.
+    """
+    if _handler is not None:
+        _start_listener()
+
+
+def setup_logging(level: str = "INFO") -> None:
+    """
+    Настройка корневого логгера: очередь и фоновый поток вывода.
+    Повторный вызов меняет только уровень.
+    """
+    global _handler
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if _handler is not None:
+        return
+    _handler = NonBlockingQueueHandler(queue.Queue())
+    _handler.addFilter(CorrelationIdFilter())
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    _start_listener()
+    os.register_at_fork(after_in_child=_restart_after_fork)
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """
+    Вывод оставшихся в очереди записей и остановка фонового потока.
+    """
+    if _listener is not None:
+        _listener.stop()
+
+
+def _redact(parameters) -> object:
+    """
+    Параметры запроса без значений: только типы.
+    """
+    if isinstance(parameters, dict):
+        return {
+            key: type(value).__name__ for key, value in parameters.items()
+        }
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"{len(parameters)} rows"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Логирование запросов движка вместо echo.
+
+    Доля sql_log_sample_rate запросов выводится на уровне INFO без
+    параметров. Запросы дольше sql_slow_query_threshold секунд выводятся
+    на уровне WARNING с длительностью и типами параметров (значения
+    параметров не выводятся).
+    """
+    settings = get_settings()
+    sample_rate = settings.sql_log_sample_rate
+    slow_threshold = settings.sql_slow_query_threshold
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info["query_started_at"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        started_at = conn.info.pop("query_started_at", None)
+        if started_at is None:
+            return
+        duration_ms = round((time.perf_counter() - started_at) * 1000, 2)
+        if duration_ms >= slow_threshold * 1000:
+            metrics.increment("sql_slow_queries")
+            sql_logger.warning(
+                "Медленный запрос",
+                extra={
+                    "statement": statement,
+                    "parameters": _redact(parameters),
+                    "duration_ms": duration_ms,
+                },
+            )
+        elif sample_rate and random.random() < sample_rate:
+            sql_logger.info(
+                "Запрос",
+                extra={"statement": statement, "duration_ms": duration_ms},
+            )
+
+
+class CorrelationIdMiddleware:
+    """
+    ASGI middleware: correlation_id запроса из заголовка или новый,
+    передается в контекст запроса и в заголовок ответа.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        value = headers.get(CORRELATION_ID_HEADER.encode()) or headers.get(
+            REQUEST_ID_HEADER.encode()
+        )
+        request_id = value.decode("latin-1")[:128] if value else None
+        request_id = request_id or uuid.uuid4().hex
+        token = correlation_id.set(request_id)
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (
+                        CORRELATION_ID_HEADER.encode(),
+                        request_id.encode("latin-1"),
+                    )
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            correlation_id.reset(token)
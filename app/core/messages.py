@@ -9,8 +9,10 @@ class Messages(str, Enum):
     SUCCESS_TRANSFER_MESSAGE: Сообщение об успешном переводе средств.
     SUCCESS_WITHDRAW_MESSAGE: Сообщение об успешном списании средств.
     SUCCESS_DEPOSIT_MESSAGE: Сообщение об успешном пополнении баланса.
+    SERVICE_READY_MESSAGE: Сообщение о готовности сервиса.
     """
 
     SUCCESS_TRANSFER_MESSAGE = "Перевод успешно выполнен."
     SUCCESS_WITHDRAW_MESSAGE = "Средства успешно списаны. Текущий баланс"
     SUCCESS_DEPOSIT_MESSAGE = "Баланс успешно пополнен. Текущий баланс"
+    SERVICE_READY_MESSAGE = "Сервис готов принимать запросы"
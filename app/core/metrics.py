@@ -0,0 +1,48 @@
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+
+class Metrics:
+    """
+    Простые счетчики процесса в памяти.
+
+    Каждый счетчик определяется именем и меткой, например
+    ("balance_operations", "optimistic"). Скорость считается делением
+    значения на uptime.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self._counters: Dict[Tuple[str, str], float] = defaultdict(float)
+
+    def increment(self, name: str, label: str = "", value: float = 1) -> None:
+        """
+        Увеличение счетчика.
+        """
+        self._counters[(name, label)] += value
+
+    def get(self, name: str, label: str = "") -> float:
+        """
+        Текущее значение счетчика.
+        """
+        return self._counters.get((name, label), 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Значения всех счетчиков, сгруппированные по имени.
+        """
+        result: Dict[str, Dict[str, float]] = defaultdict(dict)
+        for (name, label), value in self._counters.items():
+            result[name][label] = value
+        return dict(result)
+
+    @property
+    def uptime(self) -> float:
+        """
+        Время с момента создания счетчиков (в секундах).
+        """
+        return time.monotonic() - self.started_at
+
+
+metrics = Metrics()
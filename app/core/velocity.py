@@ -0,0 +1,312 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from app.api.models import TransactionType
+
+from .config import Settings, VelocityRuleSettings, get_settings
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class VelocityLimitExceeded(Exception):
+    """
+    Операция нарушает правило ограничения операций за окно.
+
+    Attributes:
+        rule: Имя нарушенного правила.
+        retry_after: Через сколько секунд операция уложится в лимит
+            (не меньше 1).
+    """
+
+    def __init__(self, rule: str, retry_after: float):
+        super().__init__(rule, retry_after)
+        self.rule = rule
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class WindowCounter:
+    """
+    Число и сумма операций пользователя за скользящее окно.
+
+    Окно разбито на size интервалов, которые хранятся в кольцевых
+    буферах; суммы по окну поддерживаются при добавлении операций и
+    сдвиге окна, поэтому проверка не зависит от числа операций.
+    """
+
+    __slots__ = ("counts", "amounts", "last_bucket", "count", "amount")
+
+    def __init__(self, size: int, bucket: int):
+        self.counts = [0] * size
+        self.amounts = [0.0] * size
+        self.last_bucket = bucket
+        self.count = 0
+        self.amount = 0.0
+
+    def advance(self, bucket: int) -> None:
+        """
+        Сдвиг окна так, чтобы bucket был последним интервалом.
+        """
+        size = len(self.counts)
+        if bucket <= self.last_bucket:
+            return
+        if bucket - self.last_bucket >= size:
+            self.counts = [0] * size
+            self.amounts = [0.0] * size
+            self.count = 0
+            self.amount = 0.0
+        else:
+            for expired in range(self.last_bucket + 1, bucket + 1):
+                slot = expired % size
+                self.count -= self.counts[slot]
+                self.amount -= self.amounts[slot]
+                self.counts[slot] = 0
+                self.amounts[slot] = 0.0
+            if self.count == 0:
+                self.amount = 0.0
+        self.last_bucket = bucket
+
+    def add(self, bucket: int, amount: float, count: int = 1) -> None:
+        """
+        Учет операции (или отмена учета при отрицательных значениях)
+        в интервале bucket. Интервалы за пределами окна игнорируются.
+        """
+        self.advance(bucket)
+        size = len(self.counts)
+        if bucket <= self.last_bucket - size:
+            return
+        slot = bucket % size
+        self.counts[slot] += count
+        self.amounts[slot] += amount
+        self.count += count
+        self.amount += amount
+        if self.count == 0:
+            self.amount = 0.0
+
+    def expiring(self):
+        """
+        Число и сумма операций интервалов окна от старых к новым
+        с номерами интервалов.
+        """
+        size = len(self.counts)
+        first_bucket = self.last_bucket - size + 1
+        for bucket in range(first_bucket, self.last_bucket + 1):
+            slot = bucket % size
+            yield bucket, self.counts[slot], self.amounts[slot]
+
+
+class VelocityRule:
+    """
+    Правило с окном, разбитым на интервалы, и счетчиками пользователей.
+
+    Счетчики хранятся в порядке последней операции пользователя, поэтому
+    счетчики пользователей без операций в окне удаляются с начала.
+    """
+
+    def __init__(self, settings: VelocityRuleSettings, buckets: int):
+        self.name = settings.name
+        self.operations = frozenset(
+            TransactionType(operation) for operation in settings.operations
+        )
+        self.window = settings.window
+        self.max_count = settings.max_count
+        self.max_amount = settings.max_amount
+        self.size = buckets
+        self.bucket_width = settings.window / buckets
+        self._counters: "OrderedDict[int, WindowCounter]" = OrderedDict()
+
+    def bucket(self, timestamp: float) -> int:
+        """
+        Номер интервала, в который попадает момент времени.
+        """
+        return int(timestamp // self.bucket_width)
+
+    def counter(self, user_id: int, bucket: int) -> WindowCounter:
+        """
+        Счетчик пользователя, сдвинутый к интервалу bucket.
+        """
+        counter = self._counters.get(user_id)
+        if counter is None:
+            counter = self._counters[user_id] = WindowCounter(
+                self.size, bucket
+            )
+        counter.advance(bucket)
+        return counter
+
+    def touch(self, user_id: int, bucket: int) -> None:
+        """
+        Отметка операции пользователя и удаление счетчиков, окна которых
+        уже не содержат операций.
+        """
+        self._counters.move_to_end(user_id)
+        while self._counters:
+            user_id, counter = next(iter(self._counters.items()))
+            if counter.last_bucket > bucket - self.size:
+                break
+            del self._counters[user_id]
+
+    def release(self, user_id: int, bucket: int, amount: float) -> None:
+        """
+        Отмена учета операции пользователя в интервале bucket.
+        """
+        counter = self._counters.get(user_id)
+        if counter is not None:
+            counter.add(bucket, -amount, -1)
+
+    def exceeds(self, counter: WindowCounter, amount: float) -> bool:
+        """
+        Нарушит ли операция на сумму amount правило.
+        """
+        if self.max_count is not None and counter.count + 1 > self.max_count:
+            return True
+        return (
+            self.max_amount is not None
+            and counter.amount + amount > self.max_amount
+        )
+
+    def retry_after(
+        self, counter: WindowCounter, amount: float, now: float
+    ) -> float:
+        """
+        Время до выхода из окна операций, после которого операция на
+        сумму amount уложится в лимиты.
+        """
+        count, total = counter.count, counter.amount
+        for bucket, bucket_count, bucket_amount in counter.expiring():
+            count -= bucket_count
+            total -= bucket_amount
+            count_ok = self.max_count is None or count + 1 <= self.max_count
+            amount_ok = (
+                self.max_amount is None or total + amount <= self.max_amount
+            )
+            if count_ok and amount_ok:
+                return (bucket + self.size) * self.bucket_width - now
+        return self.window
+
+
+# Учтенная операция: правило, пользователь, интервал, сумма.
+Reservation = List[Tuple[VelocityRule, int, int, float]]
+
+
+class VelocityChecker:
+    """
+    Ограничение списаний и переводов пользователя за скользящие окна.
+
+    Проверка выполняется в памяти процесса до обращения к БД. Операция
+    учитывается сразу при проверке, чтобы параллельные запросы не
+    превысили лимит, и учет отменяется, если операция не выполнена.
+    При запуске счетчики восстанавливаются по операциям из хранилища.
+
+    Правила строятся из настроек при вызове configure или при первом
+    обращении.
+    """
+
+    def __init__(self):
+        self._rules: Optional[List[VelocityRule]] = None
+
+    def configure(self, settings: Settings) -> None:
+        """
+        Построение правил из настроек приложения.
+        """
+        self._rules = [
+            VelocityRule(rule, settings.velocity_buckets)
+            for rule in settings.velocity_rules
+        ]
+
+    @property
+    def rules(self) -> List[VelocityRule]:
+        """
+        Правила ограничения операций.
+        """
+        if self._rules is None:
+            self.configure(get_settings())
+        return self._rules
+
+    def check(
+        self,
+        user_id: int,
+        operation: TransactionType,
+        amount: float,
+        now: Optional[float] = None,
+    ) -> Reservation:
+        """
+        Проверка и учет операции пользователя.
+
+        Returns:
+            Reservation: Учтенная операция для отмены учета (release).
+
+        Raises:
+            VelocityLimitExceeded: Если операция нарушает одно из правил.
+        """
+        if now is None:
+            now = time.time()
+        rules = [rule for rule in self.rules if operation in rule.operations]
+        for rule in rules:
+            counter = rule.counter(user_id, rule.bucket(now))
+            metrics.increment("velocity_checks", rule.name)
+            if rule.exceeds(counter, amount):
+                metrics.increment("velocity_rejections", rule.name)
+                raise VelocityLimitExceeded(
+                    rule.name, rule.retry_after(counter, amount, now)
+                )
+        reservation = []
+        for rule in rules:
+            bucket = rule.bucket(now)
+            rule.counter(user_id, bucket).add(bucket, amount)
+            rule.touch(user_id, bucket)
+            reservation.append((rule, user_id, bucket, amount))
+        return reservation
+
+    def release(self, reservation: Reservation) -> None:
+        """
+        Отмена учета операции, которая не была выполнена.
+        """
+        for rule, user_id, bucket, amount in reservation:
+            rule.release(user_id, bucket, amount)
+
+    def record(
+        self,
+        user_id: int,
+        operation: TransactionType,
+        amount: float,
+        created_at: datetime,
+    ) -> None:
+        """
+        Учет выполненной операции без проверки лимитов.
+        """
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        timestamp = created_at.timestamp()
+        for rule in self.rules:
+            if operation in rule.operations:
+                bucket = rule.bucket(timestamp)
+                rule.counter(user_id, bucket).add(bucket, amount)
+                rule.touch(user_id, bucket)
+
+    async def rebuild(self, ledger) -> int:
+        """
+        Восстановление счетчиков по операциям хранилища за самое длинное
+        окно правил.
+
+        Returns:
+            int: Число учтенных операций.
+        """
+        if not self.rules:
+            return 0
+        window = max(rule.window for rule in self.rules)
+        since = datetime.now(timezone.utc) - timedelta(seconds=window)
+        recorded = 0
+        for user_id, operation, amount, created_at in (
+            await ledger.get_debits_since(since)
+        ):
+            self.record(user_id, operation, amount, created_at)
+            recorded += 1
+        logger.info("Счетчики лимитов восстановлены: операций %d", recorded)
+        return recorded
+
+
+velocity = VelocityChecker()
@@ -0,0 +1,254 @@
+from typing import Optional, Set, Tuple
+
+from sqlalchemy import Float, Numeric, case, cast, func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.models import (
+    AccrualChunk,
+    AccrualRule,
+    AccrualRuleType,
+    AccrualRun,
+    AccrualRunStatus,
+    Transaction,
+    TransactionType,
+    User,
+)
+from app.crud.outbox import add_balance_events
+
+users_table = User.__table__
+
+
+async def get_accrual_rule(db: AsyncSession, name: str):
+    """
+    Получение правила начисления по имени.
+    """
+    result = await db.execute(
+        select(AccrualRule).filter(AccrualRule.name == name)
+    )
+    return result.scalars().first()
+
+
+async def save_accrual_rule(
+    db: AsyncSession,
+    name: str,
+    rule_type: AccrualRuleType,
+    rate: float = 0.0,
+    fixed_amount: float = 0.0,
+    min_balance: float = 0.0,
+):
+    """
+    Создание правила начисления или изменение существующего.
+    """
+    db_rule = await get_accrual_rule(db, name)
+    if db_rule is None:
+        db_rule = AccrualRule(name=name)
+        db.add(db_rule)
+    db_rule.rule_type = rule_type
+    db_rule.rate = rate
+    db_rule.fixed_amount = fixed_amount
+    db_rule.min_balance = min_balance
+    await db.commit()
+    await db.refresh(db_rule)
+    return db_rule
+
+
+async def get_or_create_accrual_run(
+    db: AsyncSession,
+    rule_id: int,
+    period: str,
+    chunk_size: int,
+    max_user_id: int,
+):
+    """
+    Получение запуска правила за период или создание нового.
+
+    Запуск, созданный ранее, возвращается с исходными размером порции и
+    диапазоном ID, поэтому после сбоя порции совпадают с уже выполненными.
+    """
+    result = await db.execute(
+        select(AccrualRun).filter(
+            AccrualRun.rule_id == rule_id, AccrualRun.period == period
+        )
+    )
+    db_run = result.scalars().first()
+    if db_run is None:
+        db_run = AccrualRun(
+            rule_id=rule_id,
+            period=period,
+            status=AccrualRunStatus.RUNNING,
+            chunk_size=chunk_size,
+            max_user_id=max_user_id,
+        )
+        db.add(db_run)
+        await db.commit()
+        await db.refresh(db_run)
+    return db_run
+
+
+async def finish_accrual_run(db: AsyncSession, run_id: int) -> None:
+    """
+    Отметка запуска завершенным.
+    """
+    await db.execute(
+        update(AccrualRun)
+        .where(AccrualRun.id == run_id)
+        .values(status=AccrualRunStatus.COMPLETED, finished_at=func.now())
+    )
+    await db.commit()
+
+
+async def get_max_user_id(db: AsyncSession) -> int:
+    """
+    Максимальный ID пользователя в базе (0, если пользователей нет).
+    """
+    result = await db.execute(select(func.max(User.id)))
+    return result.scalar() or 0
+
+
+async def get_finished_chunks(db: AsyncSession, run_id: int) -> Set[int]:
+    """
+    Начала диапазонов порций запуска, уже выполненных в этой базе.
+    """
+    result = await db.execute(
+        select(AccrualChunk.start_id).filter(AccrualChunk.run_id == run_id)
+    )
+    return set(result.scalars().all())
+
+
+def _accrual_amount(rule: AccrualRule):
+    """
+    SQL-выражение суммы начисления или списания для строки пользователя.
+    """
+    amount = users_table.c.balance * rule.rate + rule.fixed_amount
+    if rule.rule_type == AccrualRuleType.FEE:
+        # Комиссия не списывает заблокированные средства.
+        available = users_table.c.balance - users_table.c.held_balance
+        amount = case((available < amount, available), else_=amount)
+    return cast(func.round(cast(amount, Numeric), 2), Float)
+
+
+async def apply_accrual_chunk(
+    db: AsyncSession,
+    run_id: int,
+    rule: AccrualRule,
+    start_id: int,
+    end_id: int,
+) -> Tuple[int, float]:
+    """
+    Применение правила к пользователям с ID из [start_id, end_id)
+    в текущей транзакции БД без фиксации.
+
+    Балансы меняются одним UPDATE ... FROM ... RETURNING, операции и
+    события записываются многострочными INSERT. Вместе с изменениями
+    записывается отметка о выполнении порции.
+
+    Returns:
+        Tuple[int, float]: Число измененных счетов и сумма изменений.
+    """
+    amounts = (
+        select(users_table.c.id, _accrual_amount(rule).label("amount"))
+        .where(
+            users_table.c.id >= start_id,
+            users_table.c.id < end_id,
+            users_table.c.balance > 0,
+            users_table.c.balance >= rule.min_balance,
+        )
+        .order_by(users_table.c.id)
+        .with_for_update()
+        .subquery()
+    )
+    sign = 1 if rule.rule_type == AccrualRuleType.INTEREST else -1
+    statement = (
+        update(users_table)
+        .where(users_table.c.id == amounts.c.id, amounts.c.amount > 0)
+        .values(
+            balance=users_table.c.balance + sign * amounts.c.amount,
+            version=users_table.c.version + 1,
+        )
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        result = await db.execute(
+            statement.returning(
+                users_table.c.id, users_table.c.balance, amounts.c.amount
+            )
+        )
+        rows = result.all()
+    else:
+        # SQLite не позволяет возвращать столбцы таблиц из FROM.
+        result = await db.execute(select(amounts.c.id, amounts.c.amount))
+        changed = dict(result.all())
+        result = await db.execute(
+            statement.returning(users_table.c.id, users_table.c.balance)
+        )
+        rows = [
+            (user_id, balance, changed[user_id])
+            for user_id, balance in result.all()
+        ]
+
+    transaction_type = (
+        TransactionType.INTEREST
+        if rule.rule_type == AccrualRuleType.INTEREST
+        else TransactionType.FEE
+    )
+    if rows:
+        result = await db.execute(
+            insert(Transaction).returning(
+                Transaction.id,
+                Transaction.user_id,
+                sort_by_parameter_order=True,
+            ),
+            [
+                {
+                    "user_id": user_id,
+                    "amount": amount,
+                    "type": transaction_type,
+                    "balance_delta": sign * amount,
+                }
+                for user_id, _, amount in rows
+            ],
+        )
+        transaction_ids = dict(
+            (user_id, transaction_id)
+            for transaction_id, user_id in result.all()
+        )
+        await add_balance_events(
+            db,
+            [
+                {
+                    "user_id": user_id,
+                    "transaction_id": transaction_ids[user_id],
+                    "type": transaction_type,
+                    "amount": amount,
+                    "balance": balance,
+                }
+                for user_id, balance, amount in rows
+            ],
+        )
+    total_amount = sum(amount for _, _, amount in rows)
+    db.add(
+        AccrualChunk(
+            run_id=run_id,
+            start_id=start_id,
+            accounts=len(rows),
+            total_amount=total_amount,
+        )
+    )
+    await db.flush()
+    return len(rows), total_amount
+
+
+async def get_accrual_run_totals(
+    db: AsyncSession, run_id: int
+) -> Tuple[int, Optional[float]]:
+    """
+    Число измененных счетов и сумма по выполненным порциям запуска
+    в этой базе.
+    """
+    result = await db.execute(
+        select(
+            func.coalesce(func.sum(AccrualChunk.accounts), 0),
+            func.sum(AccrualChunk.total_amount),
+        ).filter(AccrualChunk.run_id == run_id)
+    )
+    return tuple(result.one())
@@ -0,0 +1,111 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import Integer, cast, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.models import Transaction, User
+
+BUCKET_SECONDS = {"hour": 3600, "day": 86400}
+
+# Период ряда, если начало не указано.
+DEFAULT_SERIES_PERIOD = {"hour": timedelta(days=1), "day": timedelta(days=30)}
+
+# Максимальное число интервалов в одном ряду.
+MAX_SERIES_BUCKETS = 10_000
+
+
+def to_utc(value: datetime) -> datetime:
+    """
+    Приведение времени к UTC. Время без часового пояса считается UTC.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def align_to_bucket(value: datetime, bucket_seconds: int) -> datetime:
+    """
+    Начало интервала, в который попадает время value.
+    """
+    timestamp = to_utc(value).timestamp()
+    return datetime.fromtimestamp(
+        timestamp - timestamp % bucket_seconds, timezone.utc
+    )
+
+
+def count_buckets(
+    start: datetime, date_to: datetime, bucket_seconds: int
+) -> int:
+    """
+    Число интервалов от start до date_to (последний может быть неполным).
+    """
+    seconds = (to_utc(date_to) - start).total_seconds()
+    return max(math.ceil(seconds / bucket_seconds), 0)
+
+
+async def get_balance_series(
+    db: AsyncSession,
+    user_id: int,
+    start: datetime,
+    bucket_count: int,
+    bucket_seconds: int,
+) -> Optional[np.ndarray]:
+    """
+    Баланс пользователя на конец каждого интервала ряда.
+
+    Из БД читаются только баланс на начало ряда (текущий баланс минус
+    изменения после start, одним запросом) и суммы изменений по
+    интервалам (GROUP BY по номеру интервала). Балансы считаются
+    накопительной суммой массива изменений; интервалы без операций
+    сохраняют баланс предыдущего.
+
+    Returns:
+        Optional[np.ndarray]: Балансы, округленные до сотых, или None,
+        если пользователя нет.
+    """
+    end = start + timedelta(seconds=bucket_count * bucket_seconds)
+    changes_after_start = (
+        select(func.coalesce(func.sum(Transaction.balance_delta), 0.0))
+        .where(
+            Transaction.user_id == user_id,
+            Transaction.created_at >= start,
+        )
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(User.balance - changes_after_start).where(
+            User.id == user_id, User.closed_at.is_(None)
+        )
+    )
+    start_balance = result.scalar()
+    if start_balance is None:
+        return None
+
+    offset = (
+        func.extract("epoch", Transaction.created_at) - start.timestamp()
+    ) / bucket_seconds
+    if db.get_bind().dialect.name == "postgresql":
+        bucket = func.floor(offset)
+    else:
+        bucket = cast(offset, Integer)
+    bucket = bucket.label("bucket")
+    result = await db.execute(
+        select(bucket, func.sum(Transaction.balance_delta))
+        .where(
+            Transaction.user_id == user_id,
+            Transaction.created_at >= start,
+            Transaction.created_at < end,
+        )
+        .group_by(bucket)
+    )
+    rows = result.all()
+
+    deltas = np.zeros(bucket_count)
+    if rows:
+        buckets, sums = np.array(rows, dtype=np.float64).T
+        deltas[buckets.astype(np.int64)] = sums
+    return np.round(start_balance + np.cumsum(deltas), 2)
@@ -0,0 +1,101 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.api.models import User
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+PESSIMISTIC = "pessimistic"
+OPTIMISTIC = "optimistic"
+
+# Коды ошибок PostgreSQL, после которых операцию можно повторить:
+# serialization_failure и deadlock_detected.
+RETRYABLE_SQLSTATES = ("40001", "40P01")
+
+T = TypeVar("T")
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Проверяет, вызвана ли ошибка конфликтом параллельных изменений.
+    """
+    if isinstance(error, StaleDataError):
+        return True
+    if isinstance(error, DBAPIError):
+        orig = error.orig
+        sqlstate = getattr(orig, "sqlstate", None) or getattr(
+            orig, "pgcode", None
+        )
+        return sqlstate in RETRYABLE_SQLSTATES
+    return False
+
+
+async def get_user_for_update(db: AsyncSession, user_id: int):
+    """
+    Получение пользователя для изменения баланса.
+
+    В пессимистичном режиме строка блокируется (SELECT ... FOR UPDATE).
+    В оптимистичном режиме блокировки нет: при фиксации UPDATE сравнивает
+    версию строки, и конфликт приводит к повтору операции.
+    Закрытые счета не возвращаются.
+    """
+    query = (
+        select(User)
+        .filter(User.id == user_id, User.closed_at.is_(None))
+        .execution_options(populate_existing=True)
+    )
+    if get_settings().balance_concurrency_mode == PESSIMISTIC:
+        query = query.with_for_update()
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
+async def run_balance_operation(
+    db: AsyncSession,
+    operation: Callable[..., Awaitable[T]],
+    *args,
+) -> T:
+    """
+    Выполнение операции над балансами с фиксацией транзакции.
+
+    При конфликте версий или ошибке сериализации транзакция откатывается,
+    и операция повторяется после случайной паузы (экспоненциальный
+    backoff с jitter). Для выбора режима по каждому режиму считаются
+    операции, повторы, конфликты, отказы и суммарное время выполнения.
+    """
+    settings = get_settings()
+    mode = settings.balance_concurrency_mode
+    started_at = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            result = await operation(db, *args)
+            await db.commit()
+            break
+        except Exception as e:
+            await db.rollback()
+            if not is_retryable_error(e):
+                raise
+            metrics.increment("balance_conflicts", mode)
+            if attempt >= settings.balance_max_retries:
+                metrics.increment("balance_failures", mode)
+                raise
+            attempt += 1
+            metrics.increment("balance_retries", mode)
+            await asyncio.sleep(
+                random.uniform(
+                    0, settings.balance_retry_base_delay * 2**attempt
+                )
+            )
+    metrics.increment("balance_operations", mode)
+    metrics.increment(
+        "balance_operations_seconds", mode, time.perf_counter() - started_at
+    )
+    return result
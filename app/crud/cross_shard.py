@@ -0,0 +1,211 @@
+"""
+Межшардовые переводы (saga).
+
+1. На шарде отправителя в одной транзакции БД списываются средства и
+   создается TransferIntent в статусе PENDING.
+2. На шарде получателя в одной транзакции БД зачисляются средства и
+   создается отметка AppliedTransfer. Если отметка уже есть, шаг
+   считается выполненным. Если получателя нет, создается отметка без
+   зачисления.
+3. На шарде отправителя перевод помечается выполненным, а если средства
+   не были зачислены - средства возвращаются отправителю.
+
+Все шаги идемпотентны. Переводы, прерванные между шагами, завершает
+восстановление (app.workers.transfer_recovery).
+"""
+import logging
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.models import (
+    AppliedTransfer,
+    TransactionType,
+    TransferIntent,
+    TransferIntentStatus,
+)
+from app.core.db import ShardRouter
+from app.core.errors import InsufficientFundsError
+from app.crud.concurrency import get_user_for_update, run_balance_operation
+from app.crud.outbox import add_balance_event
+from app.crud.transactions import add_transaction
+
+logger = logging.getLogger(__name__)
+
+
+async def begin_transfer(
+    db: AsyncSession, from_user_id: int, to_user_id: int, amount: float
+) -> Optional[TransferIntent]:
+    """
+    Шаг 1: списание средств отправителя и создание перевода в текущей
+    транзакции БД без фиксации. Возвращает None, если отправителя нет.
+
+    Raises:
+        InsufficientFundsError: Если у отправителя недостаточно средств.
+    """
+    from_user = await get_user_for_update(db, from_user_id)
+    if from_user is None:
+        return None
+    if from_user.available_balance < amount:
+        raise InsufficientFundsError(from_user_id)
+    from_user.balance -= amount
+    db_transaction = add_transaction(
+        db, from_user_id, amount, TransactionType.TRANSFER, -amount
+    )
+    db_intent = TransferIntent(
+        id=uuid.uuid4().hex,
+        from_user_id=from_user_id,
+        to_user_id=to_user_id,
+        amount=amount,
+        status=TransferIntentStatus.PENDING,
+    )
+    db.add(db_intent)
+    await db.flush()
+    await add_balance_event(db, from_user, db_transaction)
+    return db_intent
+
+
+async def _credit_transfer(
+    db: AsyncSession, intent_id: str, to_user_id: int, amount: float
+) -> bool:
+    """
+    Шаг 2 в текущей транзакции БД без фиксации.
+
+    Returns:
+        bool: Были ли средства зачислены получателю.
+    """
+    result = await db.execute(
+        select(AppliedTransfer.credited).filter(
+            AppliedTransfer.id == intent_id
+        )
+    )
+    credited = result.scalar()
+    if credited is not None:
+        return credited
+    to_user = await get_user_for_update(db, to_user_id)
+    credited = to_user is not None
+    db.add(
+        AppliedTransfer(
+            id=intent_id,
+            to_user_id=to_user_id,
+            amount=amount,
+            credited=credited,
+        )
+    )
+    if credited:
+        to_user.balance += amount
+        db_transaction = add_transaction(
+            db, to_user_id, amount, TransactionType.TRANSFER
+        )
+    await db.flush()
+    if credited:
+        await add_balance_event(db, to_user, db_transaction)
+    return credited
+
+
+async def credit_transfer(
+    db: AsyncSession, intent_id: str, to_user_id: int, amount: float
+) -> bool:
+    """
+    Шаг 2: зачисление средств получателю с фиксацией.
+
+    Если тот же перевод параллельно зачисляется в другом процессе,
+    одна из транзакций получает конфликт по ключу отметки и читает
+    результат другой.
+
+    Returns:
+        bool: Были ли средства зачислены получателю.
+    """
+    try:
+        return await run_balance_operation(
+            db, _credit_transfer, intent_id, to_user_id, amount
+        )
+    except IntegrityError:
+        return await run_balance_operation(
+            db, _credit_transfer, intent_id, to_user_id, amount
+        )
+
+
+async def _finish_transfer(
+    db: AsyncSession, intent_id: str, credited: bool
+) -> Optional[TransferIntent]:
+    """
+    Шаг 3 в текущей транзакции БД без фиксации.
+    """
+    result = await db.execute(
+        select(TransferIntent)
+        .filter(TransferIntent.id == intent_id)
+        .with_for_update()
+    )
+    db_intent = result.scalars().first()
+    if db_intent is None or db_intent.status != TransferIntentStatus.PENDING:
+        return db_intent
+    if credited:
+        db_intent.status = TransferIntentStatus.COMPLETED
+        return db_intent
+    from_user = await get_user_for_update(db, db_intent.from_user_id)
+    from_user.balance += db_intent.amount
+    db_transaction = add_transaction(
+        db, from_user.id, db_intent.amount, TransactionType.DEPOSIT
+    )
+    db_intent.status = TransferIntentStatus.COMPENSATED
+    await db.flush()
+    await add_balance_event(db, from_user, db_transaction)
+    return db_intent
+
+
+async def finish_transfer(
+    db: AsyncSession, intent_id: str, credited: bool
+) -> Optional[TransferIntent]:
+    """
+    Шаг 3: завершение перевода или возврат средств отправителю
+    с фиксацией.
+    """
+    return await run_balance_operation(
+        db, _finish_transfer, intent_id, credited
+    )
+
+
+async def complete_transfer(
+    router: ShardRouter,
+    intent_id: str,
+    from_user_id: int,
+    to_user_id: int,
+    amount: float,
+) -> None:
+    """
+    Выполнение шагов 2 и 3 для перевода, средства по которому уже
+    списаны.
+    """
+    async with router.session_for_user(to_user_id) as db:
+        credited = await credit_transfer(db, intent_id, to_user_id, amount)
+    async with router.session_for_user(from_user_id) as db:
+        db_intent = await finish_transfer(db, intent_id, credited)
+    if db_intent is not None and not credited:
+        logger.warning(
+            "Перевод %s возвращен: получатель %d не найден",
+            intent_id,
+            to_user_id,
+        )
+
+
+async def get_stale_transfers(
+    db: AsyncSession, created_before: datetime, limit: int
+) -> List[TransferIntent]:
+    """
+    Незавершенные переводы шарда, созданные раньше created_before.
+    """
+    result = await db.execute(
+        select(TransferIntent)
+        .filter(
+            TransferIntent.status == TransferIntentStatus.PENDING,
+            TransferIntent.created_at < created_before,
+        )
+        .order_by(TransferIntent.created_at)
+        .limit(limit)
+    )
+    return result.scalars().all()
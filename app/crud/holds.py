@@ -0,0 +1,245 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.models import Hold, HoldStatus, TransactionType, User
+from app.core.db import ShardRouter
+from app.core.errors import (
+    HoldAmountExceededError,
+    HoldNotActiveError,
+    InsufficientFundsError,
+)
+from app.crud.balance_series import to_utc
+from app.crud.concurrency import get_user_for_update, run_balance_operation
+from app.crud.outbox import add_balance_event
+from app.crud.transactions import add_transaction
+
+
+async def get_hold(db: AsyncSession, hold_id: int):
+    """
+    Получение блокировки средств по ID.
+    """
+    result = await db.execute(select(Hold).filter(Hold.id == hold_id))
+    return result.scalars().first()
+
+
+async def find_hold(
+    router: ShardRouter, hold_id: int
+) -> Tuple[Optional[int], Optional[Hold]]:
+    """
+    Поиск блокировки средств на всех шардах.
+
+    Returns:
+        Tuple: Номер шарда и блокировка (None, None, если блокировки нет).
+    """
+    for shard in range(router.count):
+        async with router.session(shard) as db:
+            db_hold = await get_hold(db, hold_id)
+        if db_hold is not None:
+            return shard, db_hold
+    return None, None
+
+
+async def _place_hold(
+    db: AsyncSession,
+    user_id: int,
+    amount: float,
+    ttl_seconds: int,
+    hold_id: Optional[int],
+):
+    """
+    Блокировка средств в текущей транзакции БД без фиксации.
+
+    Доступный баланс проверяется по строке пользователя, поэтому для
+    проверки не нужно суммировать активные блокировки.
+    """
+    db_user = await get_user_for_update(db, user_id)
+    if db_user is None:
+        return None
+    if db_user.available_balance < amount:
+        raise InsufficientFundsError(user_id)
+    db_user.held_balance += amount
+    db_hold = Hold(
+        id=hold_id,
+        user_id=user_id,
+        amount=amount,
+        status=HoldStatus.ACTIVE,
+        expires_at=datetime.now(timezone.utc)
+        + timedelta(seconds=ttl_seconds),
+    )
+    db.add(db_hold)
+    await db.flush()
+    return db_hold
+
+
+async def place_hold(
+    db: AsyncSession,
+    user_id: int,
+    amount: float,
+    ttl_seconds: int,
+    hold_id: Optional[int] = None,
+):
+    """
+    Блокировка средств пользователя на ttl_seconds секунд. Блокировка
+    создается на шарде пользователя с ID, выданным основной базой.
+
+    Raises:
+        InsufficientFundsError: Если доступных средств недостаточно.
+    """
+    db_hold = await run_balance_operation(
+        db, _place_hold, user_id, amount, ttl_seconds, hold_id
+    )
+    if db_hold is not None:
+        await db.refresh(db_hold)
+    return db_hold
+
+
+async def _get_active_hold_for_update(db: AsyncSession, hold_id: int):
+    """
+    Получение активной блокировки с блокировкой строки.
+
+    Блокировка, срок которой истек, считается неактивной, даже если
+    ее еще не снял app.workers.hold_sweeper.
+
+    Raises:
+        HoldNotActiveError: Если блокировка не активна.
+    """
+    result = await db.execute(
+        select(Hold)
+        .filter(Hold.id == hold_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    db_hold = result.scalars().first()
+    if db_hold is None:
+        return None
+    if db_hold.status != HoldStatus.ACTIVE or to_utc(
+        db_hold.expires_at
+    ) <= datetime.now(timezone.utc):
+        raise HoldNotActiveError(hold_id)
+    return db_hold
+
+
+async def _capture_hold(
+    db: AsyncSession, hold_id: int, amount: Optional[float]
+):
+    """
+    Списание заблокированных средств в текущей транзакции БД без
+    фиксации. Вся сумма блокировки освобождается, списывается amount.
+    """
+    db_hold = await _get_active_hold_for_update(db, hold_id)
+    if db_hold is None:
+        return None
+    if amount is None:
+        amount = db_hold.amount
+    elif amount > db_hold.amount:
+        raise HoldAmountExceededError(hold_id)
+    db_user = await get_user_for_update(db, db_hold.user_id)
+    db_user.held_balance -= db_hold.amount
+    db_user.balance -= amount
+    db_hold.status = HoldStatus.CAPTURED
+    db_hold.captured_amount = amount
+    db_hold.finished_at = datetime.now(timezone.utc)
+    db_transaction = add_transaction(
+        db, db_user.id, amount, TransactionType.CAPTURE
+    )
+    await db.flush()
+    await add_balance_event(db, db_user, db_transaction)
+    return db_hold
+
+
+async def capture_hold(
+    db: AsyncSession, hold_id: int, amount: Optional[float] = None
+):
+    """
+    Списание заблокированных средств: одна операция и одно изменение
+    баланса. Остаток блокировки сверх amount снимается.
+
+    Raises:
+        HoldNotActiveError: Если блокировка уже списана, снята или истекла.
+        HoldAmountExceededError: Если amount больше суммы блокировки.
+    """
+    return await run_balance_operation(db, _capture_hold, hold_id, amount)
+
+
+async def _release_hold(db: AsyncSession, hold_id: int):
+    """
+    Снятие блокировки в текущей транзакции БД без фиксации.
+    """
+    db_hold = await _get_active_hold_for_update(db, hold_id)
+    if db_hold is None:
+        return None
+    db_user = await get_user_for_update(db, db_hold.user_id)
+    db_user.held_balance -= db_hold.amount
+    db_hold.status = HoldStatus.RELEASED
+    db_hold.finished_at = datetime.now(timezone.utc)
+    await db.flush()
+    return db_hold
+
+
+async def release_hold(db: AsyncSession, hold_id: int):
+    """
+    Снятие блокировки: средства снова доступны, баланс не меняется.
+
+    Raises:
+        HoldNotActiveError: Если блокировка уже списана, снята или истекла.
+    """
+    return await run_balance_operation(db, _release_hold, hold_id)
+
+
+async def release_expired_holds(db: AsyncSession, limit: int) -> int:
+    """
+    Снятие пачки истекших блокировок с фиксацией.
+
+    Блокировки выбираются по индексу ix_holds_expires_at с SKIP LOCKED,
+    поэтому параллельные воркеры снимают разные пачки. Заблокированные
+    суммы пачки вычитаются из балансов пользователей одним UPDATE,
+    строки пользователей блокируются в порядке возрастания ID.
+
+    Returns:
+        int: Число снятых блокировок.
+    """
+    result = await db.execute(
+        select(Hold.id, Hold.user_id, Hold.amount)
+        .filter(
+            Hold.status == HoldStatus.ACTIVE,
+            Hold.expires_at <= func.now(),
+        )
+        .order_by(Hold.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if not rows:
+        await db.rollback()
+        return 0
+    held: Dict[int, float] = defaultdict(float)
+    for _, user_id, amount in rows:
+        held[user_id] += amount
+    await db.execute(
+        select(User.id)
+        .filter(User.id.in_(held))
+        .order_by(User.id)
+        .with_for_update()
+    )
+    await db.execute(
+        update(User)
+        .where(User.id.in_(held))
+        .values(
+            held_balance=User.held_balance - case(held, value=User.id),
+            version=User.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(Hold)
+        .where(Hold.id.in_([hold_id for hold_id, *_ in rows]))
+        .values(status=HoldStatus.EXPIRED, finished_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return len(rows)
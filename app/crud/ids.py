@@ -0,0 +1,24 @@
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.models import IdCounter
+
+
+async def allocate_id(db: AsyncSession, name: str) -> int:
+    """
+    Выдача следующего глобального ID сущности с фиксацией.
+
+    Используется и без шардирования: последовательности таблиц не
+    продвигаются, поэтому включение шардирования на работающей базе
+    (и обратное отключение) не приводит к повтору ID. Сессия должна
+    принадлежать основной базе (шарду 0).
+    """
+    result = await db.execute(
+        update(IdCounter)
+        .where(IdCounter.id == name)
+        .values(last_id=IdCounter.last_id + 1)
+        .returning(IdCounter.last_id)
+    )
+    new_id = result.scalar_one()
+    await db.commit()
+    return new_id
@@ -0,0 +1,106 @@
+from typing import List
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.models import OutboxEvent, Transaction, User
+from app.core.events import NOTIFY_CHANNEL, broker
+
+BALANCE_CHANGED_EVENT = "balance_changed"
+
+
+async def add_balance_event(
+    db: AsyncSession, db_user: User, db_transaction: Transaction
+):
+    """
+    Запись события изменения баланса в outbox в текущей транзакции БД.
+
+    Подписчики будут разбужены только после фиксации транзакции: локальные
+    через хук after_commit, на других узлах - через NOTIFY PostgreSQL,
+    который доставляется в момент COMMIT.
+    """
+    db_event = OutboxEvent(
+        user_id=db_user.id,
+        event_type=BALANCE_CHANGED_EVENT,
+        payload={
+            "transaction_id": db_transaction.id,
+            "type": db_transaction.type.value,
+            "amount": db_transaction.amount,
+            "balance": db_user.balance,
+        },
+    )
+    db.add(db_event)
+    broker.mark_changed(db, db_user.id)
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(
+            select(func.pg_notify(NOTIFY_CHANNEL, str(db_user.id)))
+        )
+    return db_event
+
+
+async def add_balance_events(db: AsyncSession, events: List[dict]) -> None:
+    """
+    Запись событий изменения баланса многих пользователей одним
+    многострочным INSERT в текущей транзакции БД.
+
+    Args:
+        events: Словари с ключами user_id, transaction_id, type, amount
+            и balance.
+    """
+    if not events:
+        return
+    await db.execute(
+        insert(OutboxEvent),
+        [
+            {
+                "user_id": event["user_id"],
+                "event_type": BALANCE_CHANGED_EVENT,
+                "payload": {
+                    "transaction_id": event["transaction_id"],
+                    "type": event["type"].value,
+                    "amount": event["amount"],
+                    "balance": event["balance"],
+                },
+            }
+            for event in events
+        ],
+    )
+    user_ids = [event["user_id"] for event in events]
+    for user_id in user_ids:
+        broker.mark_changed(db, user_id)
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(
+            text(
+                "SELECT pg_notify(:channel, user_id::text) "
+                "FROM unnest(CAST(:user_ids AS integer[])) AS user_id"
+            ),
+            {"channel": NOTIFY_CHANNEL, "user_ids": user_ids},
+        )
+
+
+async def get_user_events(
+    db: AsyncSession, user_id: int, after_id: int = 0, limit: int = 100
+):
+    """
+    Получение событий пользователя, записанных после события after_id.
+    """
+    result = await db.execute(
+        select(OutboxEvent)
+        .filter(OutboxEvent.user_id == user_id, OutboxEvent.id > after_id)
+        .order_by(OutboxEvent.id)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def get_last_event_id(db: AsyncSession, user_id: int) -> int:
+    """
+    Получение ID последнего события пользователя (0, если событий нет).
+    """
+    result = await db.execute(
+        select(func.max(OutboxEvent.id)).filter(
+            OutboxEvent.user_id == user_id
+        )
+    )
+    return result.scalar() or 0
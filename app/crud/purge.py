@@ -0,0 +1,206 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.models import (
+    ArchivedTransaction,
+    Hold,
+    OutboxEvent,
+    ScheduledTransfer,
+    Transaction,
+    TransferIntent,
+    TransferIntentStatus,
+    User,
+)
+from app.crud.balance_series import to_utc
+
+ARCHIVED_COLUMNS = (
+    "id",
+    "user_id",
+    "amount",
+    "type",
+    "balance_delta",
+    "created_at",
+)
+
+
+async def get_closed_user_ids(db: AsyncSession, limit: int) -> List[int]:
+    """
+    ID закрытых счетов, данные которых еще не удалены, в порядке закрытия.
+    """
+    result = await db.execute(
+        select(User.id)
+        .filter(User.closed_at.is_not(None))
+        .order_by(User.closed_at)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def archive_transactions(
+    db: AsyncSession, user_id: int, limit: int
+) -> int:
+    """
+    Перенос порции транзакций пользователя в архив с фиксацией.
+
+    Строки порции блокируются с SKIP LOCKED, поэтому параллельные
+    очистки берут разные порции и не ждут друг друга. Копирование в
+    архив и удаление выполняются в одной транзакции БД.
+
+    Returns:
+        int: Число перенесенных транзакций (0, если транзакций нет).
+    """
+    result = await db.execute(
+        select(Transaction.id)
+        .filter(Transaction.user_id == user_id)
+        .order_by(Transaction.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = result.scalars().all()
+    if not ids:
+        await db.rollback()
+        return 0
+    await db.execute(
+        insert(ArchivedTransaction).from_select(
+            ARCHIVED_COLUMNS,
+            select(
+                *(getattr(Transaction, name) for name in ARCHIVED_COLUMNS)
+            ).filter(Transaction.id.in_(ids)),
+        )
+    )
+    await db.execute(
+        delete(Transaction)
+        .where(Transaction.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return len(ids)
+
+
+async def delete_outbox_events(
+    db: AsyncSession, user_id: int, limit: int
+) -> int:
+    """
+    Удаление порции событий outbox пользователя с фиксацией.
+
+    Returns:
+        int: Число удаленных событий.
+    """
+    result = await db.execute(
+        select(OutboxEvent.id)
+        .filter(OutboxEvent.user_id == user_id)
+        .order_by(OutboxEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = result.scalars().all()
+    if not ids:
+        await db.rollback()
+        return 0
+    await db.execute(
+        delete(OutboxEvent)
+        .where(OutboxEvent.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return len(ids)
+
+
+async def delete_expired_outbox_events(
+    db: AsyncSession, before: datetime, limit: int
+) -> int:
+    """
+    Удаление порции событий outbox, созданных раньше before, с фиксацией.
+
+    Читаются limit самых старых событий по первичному ключу, без
+    сканирования таблицы по created_at, и удаляются события до первого
+    еще не устаревшего.
+
+    Returns:
+        int: Число удаленных событий.
+    """
+    result = await db.execute(
+        select(OutboxEvent.id, OutboxEvent.created_at)
+        .order_by(OutboxEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    ids = []
+    for event_id, created_at in result.all():
+        if to_utc(created_at) >= before:
+            break
+        ids.append(event_id)
+    if not ids:
+        await db.rollback()
+        return 0
+    await db.execute(
+        delete(OutboxEvent)
+        .where(OutboxEvent.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return len(ids)
+
+
+async def delete_closed_user(db: AsyncSession, user_id: int) -> bool:
+    """
+    Удаление строки закрытого счета вместе с его запланированными и
+    завершенными межшардовыми переводами и блокировками средств
+    с фиксацией.
+
+    Счет не удаляется, пока у него остались транзакции, события или
+    незавершенные переводы.
+
+    Returns:
+        bool: Был ли счет удален.
+    """
+    for query in (
+        select(Transaction.id).filter(Transaction.user_id == user_id),
+        select(OutboxEvent.id).filter(OutboxEvent.user_id == user_id),
+        select(TransferIntent.id).filter(
+            TransferIntent.from_user_id == user_id,
+            TransferIntent.status == TransferIntentStatus.PENDING,
+        ),
+    ):
+        result = await db.execute(query.limit(1))
+        if result.first() is not None:
+            await db.rollback()
+            return False
+    await db.execute(
+        delete(ScheduledTransfer).where(
+            ScheduledTransfer.from_user_id == user_id
+        )
+    )
+    await db.execute(
+        delete(TransferIntent).where(TransferIntent.from_user_id == user_id)
+    )
+    await db.execute(delete(Hold).where(Hold.user_id == user_id))
+    result = await db.execute(
+        delete(User)
+        .where(User.id == user_id, User.closed_at.is_not(None))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+async def get_replication_lag(db: AsyncSession) -> Optional[float]:
+    """
+    Максимальное отставание реплик PostgreSQL в секундах (0, если реплик
+    нет). Для остальных СУБД возвращает None.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    result = await db.execute(
+        text(
+            "SELECT COALESCE(MAX(EXTRACT(EPOCH FROM replay_lag)), 0) "
+            "FROM pg_stat_replication"
+        )
+    )
+    lag = float(result.scalar())
+    await db.rollback()
+    return lag
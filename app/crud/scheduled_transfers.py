@@ -0,0 +1,312 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.models import (
+    ScheduledTransfer,
+    ScheduledTransferStatus,
+    TransferIntent,
+    User,
+)
+from app.api.schemas import ScheduledTransferCreate
+from app.core.config import get_settings
+from app.core.db import ShardRouter, get_shard_router
+from app.core.errors import InsufficientFundsError
+from app.core.metrics import metrics
+from app.crud.concurrency import is_retryable_error
+from app.crud.cross_shard import begin_transfer, complete_transfer
+from app.crud.transactions import apply_transfer
+
+logger = logging.getLogger(__name__)
+
+
+async def create_scheduled_transfer(
+    db: AsyncSession,
+    transfer: ScheduledTransferCreate,
+    transfer_id: Optional[int] = None,
+):
+    """
+    Создание запланированного перевода. Перевод создается на шарде
+    отправителя с ID, выданным основной базой.
+    """
+    db_transfer = ScheduledTransfer(
+        id=transfer_id,
+        from_user_id=transfer.from_user_id,
+        to_user_id=transfer.to_user_id,
+        amount=transfer.amount,
+        interval_seconds=transfer.interval_seconds,
+        next_run_at=transfer.run_at,
+        status=ScheduledTransferStatus.ACTIVE,
+        attempts=0,
+    )
+    db.add(db_transfer)
+    await db.commit()
+    await db.refresh(db_transfer)
+    return db_transfer
+
+
+async def get_scheduled_transfer(db: AsyncSession, transfer_id: int):
+    """
+    Получение запланированного перевода по ID.
+    """
+    result = await db.execute(
+        select(ScheduledTransfer).filter(ScheduledTransfer.id == transfer_id)
+    )
+    return result.scalars().first()
+
+
+async def find_scheduled_transfer(
+    router: ShardRouter, transfer_id: int
+) -> Tuple[Optional[int], Optional[ScheduledTransfer]]:
+    """
+    Поиск запланированного перевода на всех шардах.
+
+    Returns:
+        Tuple: Номер шарда и перевод (None, None, если перевода нет).
+    """
+    for shard in range(router.count):
+        async with router.session(shard) as db:
+            db_transfer = await get_scheduled_transfer(db, transfer_id)
+        if db_transfer is not None:
+            return shard, db_transfer
+    return None, None
+
+
+async def cancel_scheduled_transfer(db: AsyncSession, transfer_id: int):
+    """
+    Отмена запланированного перевода.
+
+    Строка блокируется, поэтому отмена дожидается завершения группы
+    воркера, который выполняет этот перевод прямо сейчас.
+    """
+    result = await db.execute(
+        select(ScheduledTransfer)
+        .filter(ScheduledTransfer.id == transfer_id)
+        .with_for_update()
+    )
+    db_transfer = result.scalars().first()
+    if db_transfer and db_transfer.status == ScheduledTransferStatus.ACTIVE:
+        db_transfer.status = ScheduledTransferStatus.CANCELLED
+        await db.commit()
+    return db_transfer
+
+
+async def claim_due_transfers(db: AsyncSession, limit: int):
+    """
+    Захват пачки переводов, время выполнения которых наступило.
+
+    Строки блокируются с SKIP LOCKED: параллельные воркеры получают
+    разные пачки и не ждут друг друга. Блокировки держатся до конца
+    транзакции, поэтому один перевод не может выполниться дважды.
+    """
+    result = await db.execute(
+        select(ScheduledTransfer)
+        .filter(
+            ScheduledTransfer.status == ScheduledTransferStatus.ACTIVE,
+            ScheduledTransfer.next_run_at <= func.now(),
+        )
+        .order_by(ScheduledTransfer.next_run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return result.scalars().all()
+
+
+def _as_utc(value: datetime) -> datetime:
+    """
+    Приведение времени из БД к UTC (SQLite возвращает время без зоны).
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _schedule_next_run(db_transfer: ScheduledTransfer, now: datetime):
+    """
+    Перенос перевода на следующий период или его завершение.
+    Пропущенные периоды (например, пока воркеры не работали) не
+    выполняются повторно.
+    """
+    db_transfer.attempts = 0
+    db_transfer.last_error = None
+    if not db_transfer.interval_seconds:
+        db_transfer.status = ScheduledTransferStatus.COMPLETED
+        return
+    interval = timedelta(seconds=db_transfer.interval_seconds)
+    next_run_at = _as_utc(db_transfer.next_run_at) + interval
+    if next_run_at <= now:
+        next_run_at += interval * ((now - next_run_at) // interval + 1)
+    db_transfer.next_run_at = next_run_at
+
+
+def _requeue(db_transfer: ScheduledTransfer, now: datetime) -> None:
+    """
+    Повтор перевода после конфликта с параллельной операцией через
+    scheduler_poll_interval секунд. Конфликт не считается неудачной
+    попыткой: перевод корректен, и повтор, скорее всего, пройдет.
+    """
+    db_transfer.last_error = "conflict"
+    db_transfer.next_run_at = now + timedelta(
+        seconds=get_settings().scheduler_poll_interval
+    )
+
+
+def _record_failure(
+    db_transfer: ScheduledTransfer, error: str, now: datetime
+) -> None:
+    """
+    Запись неудачной попытки и планирование повтора с экспоненциальной
+    паузой. После scheduler_max_attempts попыток перевод помечается
+    неудачным.
+    """
+    settings = get_settings()
+    db_transfer.attempts += 1
+    db_transfer.last_error = error
+    if db_transfer.attempts >= settings.scheduler_max_attempts:
+        db_transfer.status = ScheduledTransferStatus.FAILED
+        return
+    db_transfer.next_run_at = now + timedelta(
+        seconds=settings.scheduler_retry_base_delay
+        * 2 ** (db_transfer.attempts - 1)
+    )
+
+
+async def _run_transfer(
+    db: AsyncSession, router: ShardRouter, db_transfer: ScheduledTransfer
+) -> Optional[TransferIntent]:
+    """
+    Выполнение перевода в текущей транзакции БД без фиксации.
+
+    Перевод получателю на другом шарде только начинается: средства
+    списываются, и возвращается межшардовый перевод, который нужно
+    завершить после фиксации.
+    """
+    args = (
+        db_transfer.from_user_id,
+        db_transfer.to_user_id,
+        db_transfer.amount,
+    )
+    if router.shard_for(db_transfer.to_user_id) == router.shard_for(
+        db_transfer.from_user_id
+    ):
+        if await apply_transfer(db, *args) is None:
+            raise LookupError("user not found")
+        return None
+    db_intent = await begin_transfer(db, *args)
+    if db_intent is None:
+        raise LookupError("user not found")
+    return db_intent
+
+
+async def _lock_transfer_users(db: AsyncSession, db_transfers) -> None:
+    """
+    Блокировка строк всех пользователей группы в порядке возрастания ID.
+
+    Переводы группы затем берут уже удерживаемые блокировки, поэтому
+    группы разных воркеров и переводы из запросов (они блокируют
+    пользователей в том же порядке) не приводят к взаимоблокировкам.
+    Строки блокируются и в оптимистичном режиме: версии читаются после
+    блокировки, поэтому изменения из запросов не вызывают конфликтов
+    версий у переводов группы, а сами запросы при конфликте повторяются.
+    """
+    user_ids = set()
+    for db_transfer in db_transfers:
+        user_ids.update((db_transfer.from_user_id, db_transfer.to_user_id))
+    await db.execute(
+        select(User.id)
+        .filter(User.id.in_(user_ids))
+        .order_by(User.id)
+        .with_for_update()
+    )
+
+
+async def _process_group(
+    db: AsyncSession, limit: int, router: ShardRouter
+) -> int:
+    """
+    Выполнение группы наступивших переводов в одной транзакции БД.
+
+    Returns:
+        int: Число обработанных переводов.
+    """
+    db_transfers = await claim_due_transfers(db, limit)
+    if not db_transfers:
+        await db.rollback()
+        return 0
+    await _lock_transfer_users(db, db_transfers)
+    now = datetime.now(timezone.utc)
+    db_intents = []
+    for db_transfer in db_transfers:
+        try:
+            async with db.begin_nested():
+                db_intent = await _run_transfer(db, router, db_transfer)
+        except InsufficientFundsError:
+            _record_failure(db_transfer, "insufficient_funds", now)
+        except LookupError:
+            _record_failure(db_transfer, "user_not_found", now)
+        except Exception as e:
+            if is_retryable_error(e):
+                _requeue(db_transfer, now)
+                metrics.increment("scheduled_transfers", "requeued")
+                continue
+            logger.exception(
+                "Запланированный перевод %d не выполнен", db_transfer.id
+            )
+            _record_failure(db_transfer, type(e).__name__, now)
+        else:
+            if db_intent is not None:
+                db_intents.append(db_intent)
+            _schedule_next_run(db_transfer, now)
+            metrics.increment("scheduled_transfers", "executed")
+            continue
+        metrics.increment("scheduled_transfers", "failed")
+    await db.commit()
+    for db_intent in db_intents:
+        try:
+            await complete_transfer(
+                router,
+                db_intent.id,
+                db_intent.from_user_id,
+                db_intent.to_user_id,
+                db_intent.amount,
+            )
+        except Exception:
+            logger.exception(
+                "Перевод %s не завершен, его завершит восстановление",
+                db_intent.id,
+            )
+    return len(db_transfers)
+
+
+async def process_due_transfers(
+    db: AsyncSession, limit: int, router: Optional[ShardRouter] = None
+) -> int:
+    """
+    Выполнение пачки наступивших переводов группами по
+    scheduler_group_size, каждая группа в своей транзакции БД.
+
+    Блокировки строк пользователей держатся только до фиксации группы.
+    Каждый перевод выполняется через общий путь перевода в отдельной
+    точке сохранения, поэтому ошибка одного перевода не отменяет
+    остальные: любая ошибка записывается как неудачная попытка, и после
+    scheduler_max_attempts попыток перевод помечается неудачным, а не
+    останавливает обработку шарда. Переводы на другие шарды завершаются
+    после фиксации группы.
+
+    Returns:
+        int: Число обработанных переводов.
+    """
+    router = router or get_shard_router()
+    group_size = get_settings().scheduler_group_size
+    processed = 0
+    while processed < limit:
+        size = min(group_size, limit - processed)
+        count = await _process_group(db, size, router)
+        processed += count
+        if count < size:
+            break
+    return processed
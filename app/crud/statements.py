@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+from typing import AsyncIterator, Tuple
+
+from sqlalchemy import and_, func
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.models import Transaction, User
+
+
+def period_bounds(period: str) -> Tuple[datetime, datetime]:
+    """
+    Начало и конец (не включительно) месяца в формате YYYY-MM, UTC.
+
+    Raises:
+        ValueError: Если период задан в другом формате.
+    """
+    start = datetime.strptime(period, "%Y-%m").replace(tzinfo=timezone.utc)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+async def iter_statement_rows(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    after_user_id: int = 0,
+    fetch_size: int = 10_000,
+) -> AsyncIterator[Row]:
+    """
+    Строки выписок открытых счетов с ID больше after_user_id, созданных
+    до конца периода, в порядке (user_id, created_at, id).
+
+    Каждая строка содержит user_id, name, closing_balance (баланс на
+    конец периода: текущий баланс минус изменения после end) и поля
+    транзакции периода: id, type, amount, balance_delta, created_at.
+    Для счета без транзакций за период возвращается одна строка с
+    пустыми полями транзакции.
+
+    Все строки читаются одним запросом через курсор на стороне сервера
+    порциями по fetch_size, поэтому балансы и транзакции согласованы,
+    а память не зависит от числа транзакций.
+    """
+    changes_after_end = (
+        select(func.coalesce(func.sum(Transaction.balance_delta), 0.0))
+        .where(
+            Transaction.user_id == User.id,
+            Transaction.created_at >= end,
+        )
+        .scalar_subquery()
+    )
+    users = (
+        select(
+            User.id.label("user_id"),
+            User.name.label("name"),
+            (User.balance - changes_after_end).label("closing_balance"),
+        )
+        .where(
+            User.id > after_user_id,
+            User.closed_at.is_(None),
+            User.created_at < end,
+        )
+        .subquery()
+    )
+    query = (
+        select(
+            users.c.user_id,
+            users.c.name,
+            users.c.closing_balance,
+            Transaction.id,
+            Transaction.type,
+            Transaction.amount,
+            Transaction.balance_delta,
+            Transaction.created_at,
+        )
+        .select_from(
+            users.outerjoin(
+                Transaction,
+                and_(
+                    Transaction.user_id == users.c.user_id,
+                    Transaction.created_at >= start,
+                    Transaction.created_at < end,
+                ),
+            )
+        )
+        .order_by(users.c.user_id, Transaction.created_at, Transaction.id)
+        .execution_options(yield_per=fetch_size)
+    )
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        for row in partition:
+            yield row
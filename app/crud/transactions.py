@@ -1,9 +1,23 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.api.models import Transaction, TransactionType
 from app.api.schemas import TransactionCreate
-from app.crud.users import get_user_by_id
+from app.core.db import explain
+from app.core.errors import InsufficientFundsError
+from app.crud.concurrency import get_user_for_update, run_balance_operation
+from app.crud.outbox import add_balance_event
+
+DEBIT_TRANSACTION_TYPES = (
+    TransactionType.WITHDRAW,
+    TransactionType.FEE,
+    TransactionType.CAPTURE,
+)
 
 
 async def create_transaction(db: AsyncSession, transaction: TransactionCreate):
@@ -14,6 +28,7 @@ async def create_transaction(db: AsyncSession, transaction: TransactionCreate):
         user_id=transaction.user_id,
         amount=transaction.amount,
         type=transaction.type,
+        balance_delta=signed_amount(transaction.amount, transaction.type),
     )
     db.add(db_transaction)
     await db.commit()
@@ -36,78 +51,247 @@ async def get_user_transactions(db: AsyncSession, user_id: int):
     Получение всех транзакций пользователя.
     """
     result = await db.execute(
-        select(Transaction).filter(Transaction.user_id == user_id)
+        select(Transaction)
+        .filter(Transaction.user_id == user_id)
+        .order_by(Transaction.id)
     )
     return result.scalars().all()
 
 
-async def deposit_to_user(db: AsyncSession, user_id: int, amount: float):
+async def get_debits_since(db: AsyncSession, since: datetime):
     """
-    Пополнение баланса пользователя.
+    Списания и исходящие переводы всех пользователей, выполненные
+    начиная с since, в порядке выполнения.
+
+    Returns:
+        Список кортежей (user_id, type, amount, created_at).
+    """
+    result = await db.execute(
+        select(
+            Transaction.user_id,
+            Transaction.type,
+            Transaction.amount,
+            Transaction.created_at,
+        )
+        .filter(
+            Transaction.created_at >= since,
+            Transaction.type.in_(
+                (TransactionType.WITHDRAW, TransactionType.TRANSFER)
+            ),
+            Transaction.balance_delta < 0,
+        )
+        .order_by(Transaction.created_at)
+    )
+    return result.all()
+
+
+def build_transactions_filter(
+    user_id: Optional[int] = None,
+    transaction_type: Optional[TransactionType] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """
+    Формирование параметризованного запроса с фильтрами по транзакциям.
+    Учитываются только переданные фильтры. Закрытые счета здесь не
+    проверяются: транзакции без фильтра по пользователю остаются в
+    выдаче, пока их не удалит фоновая очистка.
+    """
+    query = select(Transaction)
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    if transaction_type is not None:
+        query = query.filter(Transaction.type == transaction_type)
+    if amount_min is not None:
+        query = query.filter(Transaction.amount >= amount_min)
+    if amount_max is not None:
+        query = query.filter(Transaction.amount <= amount_max)
+    if date_from is not None:
+        query = query.filter(Transaction.created_at >= date_from)
+    if date_to is not None:
+        query = query.filter(Transaction.created_at < date_to)
+    return query
+
+
+async def search_transactions(
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[int] = None,
+    **filters,
+):
+    """
+    Поиск транзакций по фильтрам с keyset-пагинацией.
+
+    Транзакции возвращаются от новых к старым, cursor - ID последней
+    транзакции предыдущей страницы. Возвращает список транзакций и cursor
+    следующей страницы (None, если страница последняя).
+    """
+    query = build_transactions_filter(**filters)
+    if cursor is not None:
+        query = query.filter(Transaction.id < cursor)
+    result = await db.execute(
+        query.order_by(Transaction.id.desc()).limit(limit + 1)
+    )
+    transactions = result.scalars().all()
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        next_cursor = transactions[-1].id
+    return transactions, next_cursor
+
+
+async def estimate_transactions_count(db: AsyncSession, **filters) -> int:
+    """
+    Оценка количества транзакций по фильтрам.
+
+    Для PostgreSQL число строк берется из плана запроса (статистика
+    планировщика), поэтому стоимость не зависит от размера таблицы.
+    Для остальных СУБД выполняется точный COUNT(*).
+    """
+    query = build_transactions_filter(**filters)
+    if db.get_bind().dialect.name != "postgresql":
+        result = await db.execute(
+            select(func.count()).select_from(query.subquery())
+        )
+        return result.scalar_one()
+    result = await db.execute(explain(query))
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def signed_amount(amount: float, transaction_type: TransactionType):
+    """
+    Изменение баланса по операции: списания уменьшают баланс, остальные
+    операции увеличивают. Знак перевода определяет вызывающий код.
+    """
+    if transaction_type in DEBIT_TRANSACTION_TYPES:
+        return -amount
+    return amount
+
+
+def add_transaction(
+    db: AsyncSession,
+    user_id: int,
+    amount: float,
+    transaction_type: TransactionType,
+    balance_delta: Optional[float] = None,
+):
+    """
+    Добавление транзакции в текущую транзакцию БД без фиксации.
+
+    Args:
+        balance_delta: Изменение баланса со знаком. По умолчанию
+            определяется по типу операции (см. signed_amount).
     """
-    db_user = await get_user_by_id(db, user_id)
+    if balance_delta is None:
+        balance_delta = signed_amount(amount, transaction_type)
+    db_transaction = Transaction(
+        user_id=user_id,
+        amount=amount,
+        type=transaction_type,
+        balance_delta=balance_delta,
+    )
+    db.add(db_transaction)
+    return db_transaction
+
+
+async def _deposit(db: AsyncSession, user_id: int, amount: float):
+    """
+    Пополнение баланса в текущей транзакции БД без фиксации.
+    """
+    db_user = await get_user_for_update(db, user_id)
     if db_user:
         db_user.balance += amount
-        await create_transaction(
-            db,
-            TransactionCreate(
-                user_id=user_id, amount=amount, type=TransactionType.DEPOSIT
-            ),
+        db_transaction = add_transaction(
+            db, user_id, amount, TransactionType.DEPOSIT
         )
-        await db.commit()
-        await db.refresh(db_user)
+        await db.flush()
+        await add_balance_event(db, db_user, db_transaction)
     return db_user
 
 
-async def withdraw_from_user(db: AsyncSession, user_id: int, amount: float):
+async def _withdraw(db: AsyncSession, user_id: int, amount: float):
     """
-    Списание средств с баланса пользователя.
+    Списание средств в текущей транзакции БД без фиксации.
     """
-    db_user = await get_user_by_id(db, user_id)
+    db_user = await get_user_for_update(db, user_id)
     if db_user:
+        if db_user.available_balance < amount:
+            raise InsufficientFundsError(user_id)
         db_user.balance -= amount
-        await create_transaction(
-            db,
-            TransactionCreate(
-                user_id=user_id, amount=amount, type=TransactionType.WITHDRAW
-            ),
+        db_transaction = add_transaction(
+            db, user_id, amount, TransactionType.WITHDRAW
         )
-        await db.commit()
-        await db.refresh(db_user)
+        await db.flush()
+        await add_balance_event(db, db_user, db_transaction)
     return db_user
 
 
-async def transfer_funds(
+async def apply_transfer(
     db: AsyncSession, from_user_id: int, to_user_id: int, amount: float
 ):
     """
-    Перевод средств между пользователями.
+    Перевод средств в текущей транзакции БД без фиксации.
+
+    Пользователи читаются в порядке возрастания ID, чтобы встречные
+    переводы в пессимистичном режиме не приводили к взаимоблокировкам.
     """
-    from_user = await get_user_by_id(db, from_user_id)
-    to_user = await get_user_by_id(db, to_user_id)
+    users = {}
+    for user_id in sorted((from_user_id, to_user_id)):
+        users[user_id] = await get_user_for_update(db, user_id)
+    from_user, to_user = users[from_user_id], users[to_user_id]
 
     if not from_user or not to_user:
         return None
 
-    if from_user.balance < amount:
-        return "insufficient_funds"
+    if from_user.available_balance < amount:
+        raise InsufficientFundsError(from_user_id)
 
     from_user.balance -= amount
     to_user.balance += amount
 
-    await create_transaction(
-        db,
-        TransactionCreate(
-            user_id=from_user_id, amount=amount, type=TransactionType.TRANSFER
-        ),
+    from_transaction = add_transaction(
+        db, from_user_id, amount, TransactionType.TRANSFER, -amount
     )
-    await create_transaction(
-        db,
-        TransactionCreate(
-            user_id=to_user_id, amount=amount, type=TransactionType.TRANSFER
-        ),
+    to_transaction = add_transaction(
+        db, to_user_id, amount, TransactionType.TRANSFER
     )
+    await db.flush()
+    await add_balance_event(db, from_user, from_transaction)
+    await add_balance_event(db, to_user, to_transaction)
+    return from_user
 
-    await db.commit()
-    await db.refresh(from_user)
-    await db.refresh(to_user)
+
+async def deposit_to_user(db: AsyncSession, user_id: int, amount: float):
+    """
+    Пополнение баланса пользователя.
+    """
+    return await run_balance_operation(db, _deposit, user_id, amount)
+
+
+async def withdraw_from_user(db: AsyncSession, user_id: int, amount: float):
+    """
+    Списание средств с баланса пользователя.
+
+    Raises:
+        InsufficientFundsError: Если средств на балансе недостаточно.
+    """
+    return await run_balance_operation(db, _withdraw, user_id, amount)
+
+
+async def transfer_funds(
+    db: AsyncSession, from_user_id: int, to_user_id: int, amount: float
+):
+    """
+    Перевод средств между пользователями.
+
+    Raises:
+        InsufficientFundsError: Если у отправителя недостаточно средств.
+    """
+    return await run_balance_operation(
+        db, apply_transfer, from_user_id, to_user_id, amount
+    )
@@ -1,15 +1,30 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.api.models import User
+from app.api.models import (
+    ScheduledTransfer,
+    ScheduledTransferStatus,
+    TransferIntent,
+    TransferIntentStatus,
+    User,
+)
 from app.api.schemas import UserBase
+from app.core.errors import AccountNotEmptyError
+from app.crud.concurrency import get_user_for_update, run_balance_operation
 
 
-async def create_user(db: AsyncSession, user: UserBase):
+async def create_user(
+    db: AsyncSession, user: UserBase, user_id: Optional[int] = None
+):
     """
-    Создание нового пользователя.
+    Создание нового пользователя с ID, выданным счетчиком основной
+    базы (app.crud.ids). Без user_id ID назначает БД.
     """
-    db_user = User(name=user.name)
+    db_user = User(id=user_id, name=user.name)
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
@@ -18,32 +33,101 @@ async def create_user(db: AsyncSession, user: UserBase):
 
 async def get_user_by_id(db: AsyncSession, user_id: int):
     """
-    Получение пользователя по ID.
+    Получение пользователя по ID. Закрытые счета не возвращаются.
+    """
+    result = await db.execute(
+        select(User).filter(User.id == user_id, User.closed_at.is_(None))
+    )
+    return result.scalars().first()
+
+
+async def get_user_by_name(db: AsyncSession, name: str):
+    """
+    Получение пользователя по имени. Закрытые счета не возвращаются.
     """
-    result = await db.execute(select(User).filter(User.id == user_id))
+    result = await db.execute(
+        select(User).filter(User.name == name, User.closed_at.is_(None))
+    )
     return result.scalars().first()
 
 
+async def get_user_version(db: AsyncSession, user_id: int):
+    """
+    Получение версии строки пользователя (None, если пользователя нет).
+    """
+    result = await db.execute(
+        select(User.version).filter(
+            User.id == user_id, User.closed_at.is_(None)
+        )
+    )
+    return result.scalar()
+
+
+async def _set_balance(db: AsyncSession, user_id: int, new_balance: float):
+    """
+    Установка баланса в текущей транзакции БД без фиксации.
+    """
+    db_user = await get_user_for_update(db, user_id)
+    if db_user:
+        db_user.balance = new_balance
+        await db.flush()
+    return db_user
+
+
 async def update_user_balance(
     db: AsyncSession, user_id: int, new_balance: float
 ):
     """
     Обновление баланса пользователя.
     """
-    db_user = await get_user_by_id(db, user_id)
-    if db_user:
-        db_user.balance = new_balance
-        await db.commit()
-        await db.refresh(db_user)
-    return db_user
+    return await run_balance_operation(db, _set_balance, user_id, new_balance)
 
 
-async def delete_user(db: AsyncSession, user_id: int):
+async def _close_user(db: AsyncSession, user_id: int):
     """
-    Удаление пользователя по ID.
+    Закрытие счета в текущей транзакции БД без фиксации.
+
+    Строка пользователя блокируется (или сравнивается ее версия), поэтому
+    закрытие и параллельные операции над счетом выполняются по очереди:
+    после закрытия операции не находят пользователя. Активные
+    запланированные переводы пользователя отменяются.
     """
-    db_user = await get_user_by_id(db, user_id)
-    if db_user:
-        await db.delete(db_user)
-        await db.commit()
+    db_user = await get_user_for_update(db, user_id)
+    if db_user is None:
+        return None
+    result = await db.execute(
+        select(TransferIntent.id)
+        .filter(
+            TransferIntent.from_user_id == user_id,
+            TransferIntent.status == TransferIntentStatus.PENDING,
+        )
+        .limit(1)
+    )
+    if round(db_user.balance, 2) != 0 or result.first() is not None:
+        raise AccountNotEmptyError(user_id)
+    db_user.closed_at = datetime.now(timezone.utc)
+    await db.execute(
+        update(ScheduledTransfer)
+        .where(
+            ScheduledTransfer.from_user_id == user_id,
+            ScheduledTransfer.status == ScheduledTransferStatus.ACTIVE,
+        )
+        .values(status=ScheduledTransferStatus.CANCELLED)
+    )
+    await db.flush()
     return db_user
+
+
+async def close_user(db: AsyncSession, user_id: int):
+    """
+    Закрытие счета пользователя.
+
+    Выполняется сразу и не зависит от объема истории: счет только
+    отмечается закрытым, а операции и прочие данные счета позже удаляет
+    app.workers.purger небольшими порциями.
+
+    Raises:
+        AccountNotEmptyError: Если на балансе есть средства или исходящие
+            межшардовые переводы не завершены.
+    """
+    return await run_balance_operation(db, _close_user, user_id)
@@ -0,0 +1,22 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.transactions import get_user_transactions
+from app.crud.users import get_user_by_id, get_user_version
+
+
+async def warm_up_statements(db: AsyncSession) -> None:
+    """
+    Выполнение горячих запросов на чтение (поиск пользователя, версия
+    строки, журнал транзакций) по несуществующему пользователю.
+
+    Запросы компилируются и подготавливаются на соединении заранее, поэтому
+    первые запросы после запуска не тратят на это время. Изменяющие
+    запросы не выполняются: прогрев не расходует значения
+    последовательностей и не берет блокировок.
+    """
+    try:
+        await get_user_by_id(db, 0)
+        await get_user_version(db, 0)
+        await get_user_transactions(db, 0)
+    finally:
+        await db.rollback()
@@ -1,8 +1,94 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from app.api.routers import router
-from app.core.config import settings
+from app.core.admission import admission
+from app.core.config import get_settings
+from app.core.db import (
+    dispose_engine,
+    get_shard_router,
+    init_engine,
+    warm_up_pool,
+)
+from app.core.events import broker
+from app.core.log import CorrelationIdMiddleware
+from app.core.velocity import velocity
+from app.crud.warmup import warm_up_statements
+from app.storage.base import MEMORY_BACKEND
+from app.storage.memory import MemoryLedger
+from app.storage.sharded import ShardedLedger
+from app.storage.sql import SqlLedger
+from app.workers.hold_sweeper import create_hold_sweeper
+from app.workers.purger import create_purger
+from app.workers.scheduler import create_worker_pool
+from app.workers.transfer_recovery import create_recovery_worker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запуск и остановка компонентов приложения.
+
+    Движок БД создается здесь, а не при импорте. Пул заполняется
+    прогретыми соединениями до того, как приложение будет отмечено
+    готовым принимать запросы. С хранилищем memory вместо этого данные
+    восстанавливаются из снимка и журнала. Счетчики лимитов операций
+    восстанавливаются по последним операциям хранилища. Фоновые воркеры
+    запускаются, только если включен background_workers.
+    """
+    settings = get_settings()
+    app.title = settings.app_title
+    app.state.ready = False
+    admission.configure(settings)
+    velocity.configure(settings)
+    ledger = scheduler = recovery = purger = sweeper = None
+    if settings.storage_backend == MEMORY_BACKEND:
+        ledger = MemoryLedger(
+            data_dir=settings.ledger_data_dir,
+            snapshot_interval=settings.ledger_snapshot_interval,
+            fsync=settings.ledger_wal_fsync,
+        )
+        await ledger.open()
+        await velocity.rebuild(ledger)
+    else:
+        init_engine()
+        shard_router = get_shard_router()
+        if settings.db_warm_up:
+            await warm_up_pool(warm_up_statements, settings.db_pool_size)
+        if shard_router.sharded:
+            await velocity.rebuild(ShardedLedger(shard_router))
+        else:
+            async with shard_router.session() as db:
+                await velocity.rebuild(SqlLedger(db))
+        await broker.start(shard_router.engines)
+        if settings.background_workers:
+            scheduler = create_worker_pool()
+            scheduler.start()
+            purger = create_purger()
+            purger.start()
+            sweeper = create_hold_sweeper()
+            sweeper.start()
+            if shard_router.sharded:
+                recovery = create_recovery_worker()
+                recovery.start()
+    app.state.ledger = ledger
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    if ledger is not None:
+        await ledger.close()
+    else:
+        for worker in (recovery, sweeper, purger, scheduler):
+            if worker is not None:
+                await worker.stop()
+        await broker.stop()
+    await dispose_engine()
+
 
-app = FastAPI(title=settings.app_title)
+app = FastAPI(lifespan=lifespan)
+app.state.ready = False
+app.state.ledger = None
 
+app.add_middleware(CorrelationIdMiddleware)
 app.include_router(router, prefix="/api")
@@ -0,0 +1,294 @@
+"""
+Запуск приложения в нескольких процессах-воркерах.
+
+    python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+
+Мастер-процесс импортирует приложение до запуска воркеров (preload),
+открывает общий сокет и порождает воркеры через fork. Общий бюджет
+соединений с БД делится между воркерами, чтобы суммарно не превысить
+max_connections PostgreSQL. Фоновые воркеры (запланированные переводы,
+очистка и т. п.) запускаются только в воркере 0, их соединения входят
+в бюджет. По SIGTERM/SIGINT воркеры перестают принимать новые
+соединения и дожидаются завершения текущих запросов.
+"""
+import argparse
+import contextlib
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+import uvicorn
+
+from app.core.config import background_connections, get_settings
+from app.core.log import setup_logging, shutdown_logging
+
+logger = logging.getLogger("app.serve")
+
+HEALTH_REPORT_INTERVAL = 60
+
+
+def split_connection_budget(
+    budget: int, workers: int, background: int = 0
+) -> Tuple[int, int]:
+    """
+    Делит общий бюджет соединений с БД между воркерами.
+
+    Сначала из бюджета вычитаются background соединений фоновых
+    воркеров, которые работают только в воркере 0 и получают их сверх
+    его пула запросов. Одно соединение каждого воркера резервируется под
+    прослушивание NOTIFY, остальные делятся поровну между постоянной
+    частью пула и соединениями сверх него.
+
+    Returns:
+        Tuple[int, int]: Размер пула и max_overflow одного воркера.
+    """
+    per_worker = (budget - background) // workers - 1
+    if per_worker < 1:
+        raise ValueError(
+            f"Бюджета в {budget} соединений не хватает на {workers} воркеров"
+        )
+    pool_size = (per_worker + 1) // 2
+    return pool_size, per_worker - pool_size
+
+
+def _kill(pid: int, signum: int) -> None:
+    """
+    Отправка сигнала процессу, который мог уже завершиться.
+    """
+    with contextlib.suppress(ProcessLookupError):
+        os.kill(pid, signum)
+
+
+class WorkerServer(uvicorn.Server):
+    """
+    Сервер воркера, отмечающий в общей памяти, что его цикл событий жив.
+    """
+
+    def __init__(self, config: uvicorn.Config, heartbeats, slot: int):
+        super().__init__(config)
+        self.heartbeats = heartbeats
+        self.slot = slot
+
+    async def on_tick(self, counter: int) -> bool:
+        self.heartbeats[self.slot] = time.monotonic()
+        return await super().on_tick(counter)
+
+
+class Master:
+    """
+    Мастер-процесс: запускает воркеры, перезапускает упавшие и
+    зависшие, завершает их при остановке.
+    """
+
+    def __init__(self, app, sock: socket.socket, args: argparse.Namespace):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.heartbeats = multiprocessing.Array("d", args.workers, lock=False)
+        self.workers: Dict[int, int] = {}
+        self.restarts = [0] * args.workers
+        self.stopping_at: Optional[float] = None
+
+    def spawn(self, slot: int) -> None:
+        """
+        Запуск воркера в указанном слоте.
+
+        Дочерний процесс всегда завершается через os._exit и не
+        возвращается в цикл мастера, даже если сервер упал с исключением.
+        SIGUSR1 (отчет о состоянии) в воркерах игнорируется, чтобы сигнал,
+        отправленный группе процессов, не завершал их.
+        """
+        self.heartbeats[slot] = time.monotonic()
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = slot
+            return
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        settings = get_settings()
+        settings.background_workers = (
+            settings.background_workers and slot == 0
+        )
+        try:
+            config = uvicorn.Config(
+                self.app,
+                lifespan="on",
+                timeout_graceful_shutdown=self.args.graceful_timeout,
+                log_level=self.args.log_level,
+                log_config=None,
+            )
+            server = WorkerServer(config, self.heartbeats, slot)
+            server.run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("Воркер %d завершился с ошибкой", slot)
+            shutdown_logging()
+            os._exit(1)
+        finally:
+            shutdown_logging()
+            os._exit(0)
+
+    def stop(self, signum, frame) -> None:
+        """
+        Обработчик сигнала остановки: начинает плавное завершение воркеров.
+        """
+        if self.stopping_at is not None:
+            return
+        logger.info("Остановка, ожидание завершения запросов воркерами")
+        self.stopping_at = time.monotonic()
+        for pid in list(self.workers):
+            _kill(pid, signal.SIGTERM)
+
+    def reap(self) -> None:
+        """
+        Обработка завершившихся воркеров.
+        """
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                return
+            slot = self.workers.pop(pid, None)
+            if slot is None or self.stopping_at is not None:
+                continue
+            logger.warning(
+                "Воркер %d (pid %d) завершился с кодом %d, перезапуск",
+                slot,
+                pid,
+                os.waitstatus_to_exitcode(status),
+            )
+            self.restarts[slot] += 1
+            self.spawn(slot)
+
+    def check_heartbeats(self) -> None:
+        """
+        Принудительное завершение воркеров с зависшим циклом событий.
+        """
+        now = time.monotonic()
+        for pid, slot in self.workers.items():
+            if now - self.heartbeats[slot] > self.args.health_timeout:
+                logger.error(
+                    "Воркер %d (pid %d) не отвечает %.0f с, завершение",
+                    slot,
+                    pid,
+                    now - self.heartbeats[slot],
+                )
+                _kill(pid, signal.SIGKILL)
+
+    def report_health(self) -> None:
+        """
+        Вывод состояния воркеров в лог.
+        """
+        now = time.monotonic()
+        for pid, slot in sorted(self.workers.items(), key=lambda i: i[1]):
+            logger.info(
+                "Воркер %d: pid=%d heartbeat=%.1f с назад перезапусков=%d",
+                slot,
+                pid,
+                now - self.heartbeats[slot],
+                self.restarts[slot],
+            )
+
+    def run(self) -> None:
+        """
+        Основной цикл мастер-процесса.
+        """
+        for slot in range(self.args.workers):
+            self.spawn(slot)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(
+            signal.SIGUSR1, lambda signum, frame: self.report_health()
+        )
+        last_report = time.monotonic()
+        while self.workers:
+            time.sleep(0.5)
+            self.reap()
+            if self.stopping_at is None:
+                self.check_heartbeats()
+                if time.monotonic() - last_report > HEALTH_REPORT_INTERVAL:
+                    self.report_health()
+                    last_report = time.monotonic()
+            elif (
+                time.monotonic() - self.stopping_at
+                > self.args.graceful_timeout + 5
+            ):
+                for pid in list(self.workers):
+                    _kill(pid, signal.SIGKILL)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Разбор аргументов командной строки.
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.serve")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Число воркеров (по умолчанию - число CPU).",
+    )
+    parser.add_argument(
+        "--db-connection-budget",
+        type=int,
+        default=None,
+        help="Общее число соединений с БД на все воркеры.",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=30,
+        help="Время на завершение текущих запросов при остановке (с).",
+    )
+    parser.add_argument(
+        "--health-timeout",
+        type=float,
+        default=30,
+        help="Время без heartbeat, после которого воркер перезапускается.",
+    )
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    setup_logging(args.log_level)
+
+    settings = get_settings()
+    if settings.storage_backend == "memory" and args.workers > 1:
+        sys.exit("Хранилище memory работает только с одним воркером")
+    budget = args.db_connection_budget or settings.db_connection_budget
+    try:
+        pool_size, max_overflow = split_connection_budget(
+            budget, args.workers, background_connections(settings)
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+    settings.db_pool_size = pool_size
+    settings.db_max_overflow = max_overflow
+    logger.info(
+        "%d воркеров, пул соединений воркера: %d + %d, "
+        "фоновым воркерам воркера 0: %d",
+        args.workers,
+        pool_size,
+        max_overflow,
+        background_connections(settings),
+    )
+
+    from app.main import app
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.set_inheritable(True)
+    Master(app, sock, args).run()
+
+
+if __name__ == "__main__":
+    main()
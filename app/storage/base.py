@@ -0,0 +1,117 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+
+SQL_BACKEND = "sql"
+MEMORY_BACKEND = "memory"
+
+
+class LedgerBackend(ABC):
+    """
+    Хранилище пользователей и их операций, с которым работают основные
+    эндпоинты: создание и чтение пользователя, пополнение, списание,
+    перевод и история операций.
+
+    Возвращаемые объекты пользователей имеют атрибуты id, name, balance,
+    held_balance, available_balance, version и created_at, объекты
+    операций - id, user_id, amount, type и created_at.
+    """
+
+    @abstractmethod
+    async def get_user(self, user_id: int) -> Optional[Any]:
+        """
+        Получение пользователя по ID (None, если пользователя нет).
+        """
+
+    @abstractmethod
+    async def get_user_by_name(self, name: str) -> Optional[Any]:
+        """
+        Получение пользователя по имени (None, если пользователя нет).
+        """
+
+    @abstractmethod
+    async def get_user_version(self, user_id: int) -> Optional[int]:
+        """
+        Получение версии пользователя (None, если пользователя нет).
+        Версия увеличивается при каждом изменении баланса.
+        """
+
+    @abstractmethod
+    async def create_user(self, name: str) -> Any:
+        """
+        Создание нового пользователя с нулевым балансом.
+        """
+
+    @abstractmethod
+    async def deposit(self, user_id: int, amount: float) -> Optional[Any]:
+        """
+        Пополнение баланса. Возвращает пользователя или None, если
+        пользователя нет.
+        """
+
+    @abstractmethod
+    async def withdraw(self, user_id: int, amount: float) -> Optional[Any]:
+        """
+        Списание средств. Возвращает пользователя или None, если
+        пользователя нет.
+
+        Raises:
+            InsufficientFundsError: Если средств на балансе недостаточно.
+        """
+
+    @abstractmethod
+    async def transfer(
+        self, from_user_id: int, to_user_id: int, amount: float
+    ) -> Optional[Any]:
+        """
+        Перевод средств. Возвращает отправителя или None, если одного из
+        пользователей нет.
+
+        Raises:
+            InsufficientFundsError: Если у отправителя недостаточно средств.
+        """
+
+    @abstractmethod
+    async def close_user(self, user_id: int) -> Optional[Any]:
+        """
+        Закрытие счета: после него пользователь не изменяется и не
+        возвращается при чтении. Возвращает пользователя или None, если
+        пользователя нет.
+
+        Raises:
+            AccountNotEmptyError: Если на балансе есть средства или
+                исходящие переводы не завершены.
+        """
+
+    @abstractmethod
+    async def get_transactions(self, user_id: int) -> Sequence[Any]:
+        """
+        Получение всех операций пользователя в порядке их выполнения.
+        """
+
+    @abstractmethod
+    async def get_debits_since(
+        self, since: datetime
+    ) -> Sequence[Tuple[int, Any, float, datetime]]:
+        """
+        Списания и исходящие переводы всех пользователей, выполненные
+        начиная с since: кортежи (user_id, type, amount, created_at)
+        в порядке выполнения.
+        """
+
+    async def commit(self) -> None:
+        """
+        Фиксация изменений, если хранилище работает с транзакциями.
+        """
+
+    async def release(self) -> None:
+        """
+        Освобождение ресурсов запроса (соединения с БД) после последнего
+        обращения к хранилищу, до построения ответа.
+        """
+
+    async def rollback(self) -> None:
+        """
+        Откат незафиксированных изменений, если хранилище работает
+        с транзакциями.
+        """
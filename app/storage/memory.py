@@ -0,0 +1,639 @@
+"""
+Хранилище в памяти процесса с журналом предзаписи (WAL).
+
+Каждая операция сначала дописывается строкой JSON в журнал, затем
+применяется к данным в памяти. Периодически состояние сохраняется в снимок,
+после чего журнал начинается с нового сегмента, а старые сегменты
+удаляются. При запуске загружается последний снимок и воспроизводятся
+записи журнала после него.
+
+Данные находятся в памяти одного процесса, поэтому приложение с этим
+хранилищем запускается в одном воркере.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import pickle
+import time
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.api.models import TransactionType
+from app.core.errors import AccountNotEmptyError, InsufficientFundsError
+from app.storage.base import LedgerBackend
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.pickle"
+WAL_PREFIX = "wal-"
+WAL_SUFFIX = ".log"
+
+# Коды операций в журнале: [lsn, код, аргументы..., время].
+OP_CREATE = "c"
+OP_DEPOSIT = "d"
+OP_WITHDRAW = "w"
+OP_TRANSFER = "t"
+OP_CLOSE = "x"
+
+TRANSACTION_TYPES = tuple(TransactionType)
+TRANSACTION_TYPE_CODES = {
+    transaction_type: code
+    for code, transaction_type in enumerate(TRANSACTION_TYPES)
+}
+
+
+def _to_datetime(timestamp: float) -> datetime:
+    """
+    Преобразование метки времени UNIX в datetime с зоной UTC.
+    """
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+class Account:
+    """
+    Счет пользователя в памяти.
+
+    Баланс, версия и время создания и закрытия хранятся по колонкам
+    в массивах хранилища под номером счета index, поэтому снимок копирует
+    их целиком, не обходя счета.
+
+    Attributes:
+        closed_ts: Время закрытия счета (None, если счет открыт).
+        entries: Позиции операций пользователя в общем журнале операций.
+        lock: Блокировка счета, создается при первом изменении.
+    """
+
+    __slots__ = ("id", "name", "index", "ledger", "entries", "lock")
+
+    def __init__(
+        self, ledger: "MemoryLedger", index: int, user_id: int, name: str
+    ):
+        self.id = user_id
+        self.name = name
+        self.index = index
+        self.ledger = ledger
+        self.entries = array("q")
+        self.lock: Optional[asyncio.Lock] = None
+
+    @property
+    def balance(self) -> float:
+        return self.ledger.account_balance[self.index]
+
+    @balance.setter
+    def balance(self, value: float) -> None:
+        self.ledger.account_balance[self.index] = value
+
+    @property
+    def version(self) -> int:
+        return self.ledger.account_version[self.index]
+
+    @version.setter
+    def version(self, value: int) -> None:
+        self.ledger.account_version[self.index] = value
+
+    @property
+    def created_ts(self) -> float:
+        return self.ledger.account_created_ts[self.index]
+
+    @property
+    def closed_ts(self) -> Optional[float]:
+        # Открытый счет хранится в колонке как NaN.
+        value = self.ledger.account_closed_ts[self.index]
+        return None if math.isnan(value) else value
+
+    @closed_ts.setter
+    def closed_ts(self, value: Optional[float]) -> None:
+        self.ledger.account_closed_ts[self.index] = (
+            math.nan if value is None else value
+        )
+
+    @property
+    def created_at(self) -> datetime:
+        return _to_datetime(self.created_ts)
+
+    @property
+    def held_balance(self) -> float:
+        # Блокировки средств хранилище в памяти не поддерживает.
+        return 0.0
+
+    @property
+    def available_balance(self) -> float:
+        return self.balance
+
+
+class LedgerEntry:
+    """
+    Операция пользователя, собирается из колонок журнала при чтении.
+    """
+
+    __slots__ = ("id", "user_id", "amount", "type", "created_at")
+
+    def __init__(
+        self,
+        entry_id: int,
+        user_id: int,
+        amount: float,
+        transaction_type: TransactionType,
+        created_at: datetime,
+    ):
+        self.id = entry_id
+        self.user_id = user_id
+        self.amount = amount
+        self.type = transaction_type
+        self.created_at = created_at
+
+
+class MemoryLedger(LedgerBackend):
+    """
+    Хранилище в памяти процесса.
+
+    Счета и операции хранятся по колонкам в массивах array, ID
+    операции - ее позиция в журнале плюс один. Изменения одного счета
+    выполняются последовательно под блокировкой счета, перевод берет
+    блокировки обоих счетов в порядке возрастания ID.
+
+    Args:
+        data_dir: Каталог журнала и снимков. Без него данные не
+            сохраняются между запусками.
+        snapshot_interval: Число операций между снимками.
+        fsync: Дожидаться ли записи журнала на диск перед ответом.
+            Параллельные операции дожидаются одного общего fsync.
+    """
+
+    def __init__(
+        self,
+        data_dir: Optional[str] = None,
+        snapshot_interval: int = 100_000,
+        fsync: bool = False,
+    ):
+        self.data_dir = Path(data_dir) if data_dir else None
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        self.accounts: Dict[int, Account] = {}
+        self.names: Dict[str, int] = {}
+        self.next_user_id = 1
+        self.account_id = array("q")
+        self.account_name: List[str] = []
+        self.account_balance = array("d")
+        self.account_version = array("q")
+        self.account_created_ts = array("d")
+        self.account_closed_ts = array("d")
+        self.entry_user = array("q")
+        self.entry_amount = array("d")
+        self.entry_type = array("b")
+        self.entry_ts = array("d")
+        self.lsn = 0
+        self._synced_lsn = 0
+        self._snapshot_lsn = 0
+        self._wal = None
+        self._sync_lock = asyncio.Lock()
+        self._snapshot_lock = asyncio.Lock()
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._since_snapshot = 0
+
+    # Применение записей журнала. Методы не проверяют входные данные и
+    # используются как при выполнении операций, так и при восстановлении.
+
+    def _add_account(
+        self,
+        user_id: int,
+        name: str,
+        created_ts: float,
+        balance: float = 0.0,
+        version: int = 1,
+        closed_ts: Optional[float] = None,
+    ) -> None:
+        index = len(self.account_id)
+        self.account_id.append(user_id)
+        self.account_name.append(name)
+        self.account_balance.append(balance)
+        self.account_version.append(version)
+        self.account_created_ts.append(created_ts)
+        self.account_closed_ts.append(
+            math.nan if closed_ts is None else closed_ts
+        )
+        self._register_account(Account(self, index, user_id, name))
+
+    def _register_account(self, account: Account) -> None:
+        self.accounts[account.id] = account
+        if account.closed_ts is None:
+            self.names[account.name] = account.id
+        self.next_user_id = max(self.next_user_id, account.id + 1)
+
+    def _add_entry(
+        self, account: Account, amount: float, code: int, timestamp: float
+    ) -> None:
+        account.entries.append(len(self.entry_user))
+        self.entry_user.append(account.id)
+        self.entry_amount.append(amount)
+        self.entry_type.append(code)
+        self.entry_ts.append(timestamp)
+
+    def _apply(self, record: list) -> None:
+        """
+        Применение записи журнала к данным в памяти.
+        """
+        op = record[1]
+        if op == OP_CREATE:
+            _, _, user_id, name, timestamp = record
+            self._add_account(user_id, name, timestamp)
+        elif op == OP_DEPOSIT:
+            _, _, user_id, amount, timestamp = record
+            account = self.accounts[user_id]
+            account.balance += amount
+            account.version += 1
+            self._add_entry(
+                account,
+                amount,
+                TRANSACTION_TYPE_CODES[TransactionType.DEPOSIT],
+                timestamp,
+            )
+        elif op == OP_WITHDRAW:
+            _, _, user_id, amount, timestamp = record
+            account = self.accounts[user_id]
+            account.balance -= amount
+            account.version += 1
+            self._add_entry(
+                account,
+                amount,
+                TRANSACTION_TYPE_CODES[TransactionType.WITHDRAW],
+                timestamp,
+            )
+        elif op == OP_TRANSFER:
+            _, _, from_user_id, to_user_id, amount, timestamp = record
+            code = TRANSACTION_TYPE_CODES[TransactionType.TRANSFER]
+            from_account = self.accounts[from_user_id]
+            to_account = self.accounts[to_user_id]
+            from_account.balance -= amount
+            from_account.version += 1
+            to_account.balance += amount
+            to_account.version += 1
+            self._add_entry(from_account, amount, code, timestamp)
+            self._add_entry(to_account, amount, code, timestamp)
+        elif op == OP_CLOSE:
+            _, _, user_id, timestamp = record
+            account = self.accounts[user_id]
+            account.closed_ts = timestamp
+            account.version += 1
+            if self.names.get(account.name) == user_id:
+                del self.names[account.name]
+        else:
+            raise ValueError(f"Неизвестная операция журнала: {op!r}")
+
+    async def _execute(self, op: str, *args) -> None:
+        """
+        Запись операции в журнал и ее применение.
+
+        Между записью и применением нет точек переключения, поэтому
+        порядок записей в журнале совпадает с порядком применения.
+        """
+        self.lsn += 1
+        record = [self.lsn, op, *args, time.time()]
+        if self._wal is not None:
+            line = json.dumps(record, separators=(",", ":")) + "\n"
+            try:
+                self._write(line.encode())
+            except OSError:
+                # Недописанная строка остается последней в своем сегменте
+                # и пропускается при восстановлении.
+                self._wal.close()
+                self._start_segment()
+                raise
+        self._apply(record)
+        if self._wal is None:
+            return
+        if self.fsync:
+            await self._sync(record[0])
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_interval and (
+            self._snapshot_task is None or self._snapshot_task.done()
+        ):
+            self._since_snapshot = 0
+            self._snapshot_task = asyncio.create_task(self.snapshot())
+
+    def _write(self, data: bytes) -> None:
+        """
+        Запись в журнал без буферизации: после возврата строка целиком
+        передана ОС и переживет аварийное завершение процесса.
+        """
+        view = memoryview(data)
+        while view:
+            view = view[self._wal.write(view):]
+
+    async def _sync(self, lsn: int) -> None:
+        """
+        Ожидание записи журнала на диск до записи lsn включительно.
+        """
+        async with self._sync_lock:
+            if self._synced_lsn >= lsn:
+                return
+            target = self.lsn
+            await asyncio.to_thread(os.fsync, self._wal.fileno())
+            self._synced_lsn = target
+
+    def _lock(self, account: Account) -> asyncio.Lock:
+        if account.lock is None:
+            account.lock = asyncio.Lock()
+        return account.lock
+
+    def _open_account(self, user_id: int) -> Optional[Account]:
+        """
+        Открытый счет пользователя (None, если счета нет или он закрыт).
+        """
+        account = self.accounts.get(user_id)
+        if account is None or account.closed_ts is not None:
+            return None
+        return account
+
+    # Операции хранилища. Закрытие счета может произойти, пока операция
+    # ждет блокировку, поэтому под блокировкой счет проверяется повторно.
+
+    async def get_user(self, user_id: int):
+        return self._open_account(user_id)
+
+    async def get_user_by_name(self, name: str):
+        user_id = self.names.get(name)
+        return None if user_id is None else self.accounts[user_id]
+
+    async def get_user_version(self, user_id: int):
+        account = self._open_account(user_id)
+        return None if account is None else account.version
+
+    async def create_user(self, name: str):
+        user_id = self.next_user_id
+        await self._execute(OP_CREATE, user_id, name)
+        return self.accounts[user_id]
+
+    async def deposit(self, user_id: int, amount: float):
+        account = self._open_account(user_id)
+        if account is None:
+            return None
+        async with self._lock(account):
+            if account.closed_ts is not None:
+                return None
+            await self._execute(OP_DEPOSIT, user_id, amount)
+        return account
+
+    async def withdraw(self, user_id: int, amount: float):
+        account = self._open_account(user_id)
+        if account is None:
+            return None
+        async with self._lock(account):
+            if account.closed_ts is not None:
+                return None
+            if account.balance < amount:
+                raise InsufficientFundsError(user_id)
+            await self._execute(OP_WITHDRAW, user_id, amount)
+        return account
+
+    async def transfer(
+        self, from_user_id: int, to_user_id: int, amount: float
+    ):
+        from_account = self._open_account(from_user_id)
+        to_account = self._open_account(to_user_id)
+        if from_account is None or to_account is None:
+            return None
+        first, second = sorted(
+            (from_account, to_account), key=lambda account: account.id
+        )
+        async with self._lock(first), self._lock(second):
+            if from_account.closed_ts is not None or (
+                to_account.closed_ts is not None
+            ):
+                return None
+            if from_account.balance < amount:
+                raise InsufficientFundsError(from_user_id)
+            await self._execute(OP_TRANSFER, from_user_id, to_user_id, amount)
+        return from_account
+
+    async def close_user(self, user_id: int):
+        account = self._open_account(user_id)
+        if account is None:
+            return None
+        async with self._lock(account):
+            if account.closed_ts is not None:
+                return None
+            if round(account.balance, 2) != 0:
+                raise AccountNotEmptyError(user_id)
+            await self._execute(OP_CLOSE, user_id)
+        return account
+
+    async def get_transactions(self, user_id: int) -> List[LedgerEntry]:
+        account = self._open_account(user_id)
+        if account is None:
+            return []
+        return [
+            LedgerEntry(
+                position + 1,
+                user_id,
+                self.entry_amount[position],
+                TRANSACTION_TYPES[self.entry_type[position]],
+                _to_datetime(self.entry_ts[position]),
+            )
+            for position in account.entries
+        ]
+
+    async def get_debits_since(self, since: datetime):
+        # Записи добавляются в порядке выполнения, а перевод добавляет две
+        # записи подряд: отправителя, затем получателя.
+        since_ts = since.timestamp()
+        transfer_code = TRANSACTION_TYPE_CODES[TransactionType.TRANSFER]
+        withdraw_code = TRANSACTION_TYPE_CODES[TransactionType.WITHDRAW]
+        debits = []
+        position = len(self.entry_user) - 1
+        while position >= 0 and self.entry_ts[position] >= since_ts:
+            code = self.entry_type[position]
+            if code == transfer_code:
+                position -= 1
+            if code in (transfer_code, withdraw_code):
+                debits.append(
+                    (
+                        self.entry_user[position],
+                        TRANSACTION_TYPES[code],
+                        self.entry_amount[position],
+                        _to_datetime(self.entry_ts[position]),
+                    )
+                )
+            position -= 1
+        debits.reverse()
+        return debits
+
+    # Журнал и снимки.
+
+    def _segments(self) -> List[Path]:
+        """
+        Сегменты журнала в порядке записи. Имя сегмента содержит номер
+        первой записи в нем.
+        """
+        return sorted(self.data_dir.glob(f"{WAL_PREFIX}*{WAL_SUFFIX}"))
+
+    def _start_segment(self) -> None:
+        """
+        Начало нового сегмента журнала со следующей записи.
+        """
+        path = self.data_dir / f"{WAL_PREFIX}{self.lsn + 1:020d}{WAL_SUFFIX}"
+        self._wal = open(path, "ab", buffering=0)
+        if self._wal.tell():
+            # Сегмент с таким номером остался после сбоя: недописанная
+            # строка в его конце завершается, чтобы не склеиться с новой.
+            self._write(b"\n")
+
+    def _close_segment(self) -> None:
+        if self._wal is not None:
+            os.fsync(self._wal.fileno())
+            self._wal.close()
+            self._wal = None
+
+    def _dump_state(self) -> dict:
+        """
+        Копия состояния для снимка. Копируются только колонки, без обхода
+        счетов и операций.
+        """
+        return {
+            "lsn": self.lsn,
+            "account_id": array("q", self.account_id),
+            "account_name": list(self.account_name),
+            "account_balance": array("d", self.account_balance),
+            "account_version": array("q", self.account_version),
+            "account_created_ts": array("d", self.account_created_ts),
+            "account_closed_ts": array("d", self.account_closed_ts),
+            "entry_user": array("q", self.entry_user),
+            "entry_amount": array("d", self.entry_amount),
+            "entry_type": array("b", self.entry_type),
+            "entry_ts": array("d", self.entry_ts),
+        }
+
+    def _load_state(self, state: dict) -> None:
+        """
+        Загрузка состояния из снимка.
+        """
+        self.lsn = state["lsn"]
+        if "accounts" in state:
+            # В старых снимках счета хранятся кортежами, а в созданных до
+            # закрытия счетов нет времени закрытия.
+            for user_id, name, balance, version, created_ts, *closed in (
+                state["accounts"]
+            ):
+                closed_ts = closed[0] if closed else None
+                self._add_account(
+                    user_id, name, created_ts, balance, version, closed_ts
+                )
+        else:
+            self.account_id = state["account_id"]
+            self.account_name = state["account_name"]
+            self.account_balance = state["account_balance"]
+            self.account_version = state["account_version"]
+            self.account_created_ts = state["account_created_ts"]
+            self.account_closed_ts = state["account_closed_ts"]
+            for index, user_id in enumerate(self.account_id):
+                self._register_account(
+                    Account(self, index, user_id, self.account_name[index])
+                )
+        self.entry_user = state["entry_user"]
+        self.entry_amount = state["entry_amount"]
+        self.entry_type = state["entry_type"]
+        self.entry_ts = state["entry_ts"]
+        for position, user_id in enumerate(self.entry_user):
+            self.accounts[user_id].entries.append(position)
+
+    def _write_snapshot(self, state: dict, segments: List[Path]) -> None:
+        """
+        Атомарная запись снимка и удаление вошедших в него сегментов.
+        """
+        path = self.data_dir / SNAPSHOT_FILE
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as snapshot_file:
+            pickle.dump(state, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(tmp_path, path)
+        for segment in segments:
+            segment.unlink()
+
+    def _recover(self) -> None:
+        """
+        Загрузка последнего снимка и воспроизведение журнала после него.
+
+        Недописанные строки (процесс завершился или диск переполнился во
+        время записи) пропускаются.
+        """
+        snapshot_path = self.data_dir / SNAPSHOT_FILE
+        if snapshot_path.exists():
+            with open(snapshot_path, "rb") as snapshot_file:
+                self._load_state(pickle.load(snapshot_file))
+            self._snapshot_lsn = self.lsn
+        replayed = 0
+        for segment in self._segments():
+            with open(segment, "rb") as wal:
+                for line in wal:
+                    if line == b"\n":
+                        continue
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError(line)
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(
+                            "Пропущена недописанная запись журнала в %s",
+                            segment.name,
+                        )
+                        continue
+                    if record[0] <= self.lsn:
+                        continue
+                    self._apply(record)
+                    self.lsn = record[0]
+                    replayed += 1
+        self._synced_lsn = self.lsn
+        logger.info(
+            "Хранилище восстановлено: %d счетов, %d операций, "
+            "воспроизведено записей журнала: %d",
+            len(self.accounts),
+            len(self.entry_user),
+            replayed,
+        )
+
+    async def open(self) -> None:
+        """
+        Восстановление данных и открытие журнала.
+        """
+        if self.data_dir is None:
+            return
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self._recover()
+        self._start_segment()
+
+    async def snapshot(self) -> None:
+        """
+        Сохранение снимка состояния.
+
+        Копия состояния снимается без переключений, после чего журнал
+        продолжается в новом сегменте, а снимок пишется в отдельном потоке.
+        """
+        if self.data_dir is None:
+            return
+        async with self._snapshot_lock:
+            if self.lsn == self._snapshot_lsn:
+                return
+            async with self._sync_lock:
+                state = self._dump_state()
+                segments = self._segments()
+                self._close_segment()
+                self._start_segment()
+                self._synced_lsn = state["lsn"]
+            await asyncio.to_thread(self._write_snapshot, state, segments)
+            self._snapshot_lsn = state["lsn"]
+
+    async def close(self) -> None:
+        """
+        Сохранение снимка и закрытие журнала.
+        """
+        if self._wal is None:
+            return
+        if self._snapshot_task is not None:
+            await self._snapshot_task
+        await self.snapshot()
+        self._close_segment()
@@ -0,0 +1,120 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime
+
+from app.api.schemas import UserBase
+from app.core.db import ShardRouter
+from app.crud.concurrency import run_balance_operation
+from app.crud.cross_shard import begin_transfer, complete_transfer
+from app.crud.ids import allocate_id
+from app.crud.transactions import (
+    deposit_to_user,
+    get_debits_since,
+    get_user_transactions,
+    transfer_funds,
+    withdraw_from_user,
+)
+from app.crud.users import (
+    close_user,
+    create_user,
+    get_user_by_id,
+    get_user_by_name,
+    get_user_version,
+)
+from app.storage.base import LedgerBackend
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedLedger(LedgerBackend):
+    """
+    Хранилище, распределенное между несколькими базами данных.
+
+    Каждая операция выполняется в короткой сессии шарда пользователя.
+    Перевод между пользователями разных шардов выполняется через
+    app.crud.cross_shard: средства списываются сразу, а если зачислить
+    их не удалось, перевод позже завершает восстановление.
+    """
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+
+    async def get_user(self, user_id: int):
+        async with self.router.session_for_user(user_id) as db:
+            return await get_user_by_id(db, user_id)
+
+    async def get_user_by_name(self, name: str):
+        async def _get_user_by_name(shard: int):
+            async with self.router.session(shard) as db:
+                return await get_user_by_name(db, name)
+
+        users = await asyncio.gather(
+            *(_get_user_by_name(shard) for shard in range(self.router.count))
+        )
+        return next((user for user in users if user is not None), None)
+
+    async def get_user_version(self, user_id: int):
+        async with self.router.session_for_user(user_id) as db:
+            return await get_user_version(db, user_id)
+
+    async def create_user(self, name: str):
+        async with self.router.session() as db:
+            user_id = await allocate_id(db, "users")
+        async with self.router.session_for_user(user_id) as db:
+            return await create_user(db, UserBase(name=name), user_id)
+
+    async def deposit(self, user_id: int, amount: float):
+        async with self.router.session_for_user(user_id) as db:
+            return await deposit_to_user(db, user_id, amount)
+
+    async def withdraw(self, user_id: int, amount: float):
+        async with self.router.session_for_user(user_id) as db:
+            return await withdraw_from_user(db, user_id, amount)
+
+    async def transfer(
+        self, from_user_id: int, to_user_id: int, amount: float
+    ):
+        shard = self.router.shard_for(from_user_id)
+        if shard == self.router.shard_for(to_user_id):
+            async with self.router.session(shard) as db:
+                return await transfer_funds(
+                    db, from_user_id, to_user_id, amount
+                )
+        async with self.router.session(shard) as db:
+            db_intent = await run_balance_operation(
+                db, begin_transfer, from_user_id, to_user_id, amount
+            )
+            if db_intent is None:
+                return None
+            from_user = await get_user_by_id(db, from_user_id)
+        try:
+            await complete_transfer(
+                self.router, db_intent.id, from_user_id, to_user_id, amount
+            )
+        except Exception:
+            logger.exception(
+                "Перевод %s не завершен, его завершит восстановление",
+                db_intent.id,
+            )
+        return from_user
+
+    async def close_user(self, user_id: int):
+        async with self.router.session_for_user(user_id) as db:
+            return await close_user(db, user_id)
+
+    async def get_transactions(self, user_id: int):
+        async with self.router.session_for_user(user_id) as db:
+            return await get_user_transactions(db, user_id)
+
+    async def get_debits_since(self, since: datetime):
+        async def _get_debits_since(shard: int):
+            async with self.router.session(shard) as db:
+                return await get_debits_since(db, since)
+
+        shard_debits = await asyncio.gather(
+            *(_get_debits_since(shard) for shard in range(self.router.count))
+        )
+        # Списания каждого шарда уже упорядочены по времени, лимиты
+        # восстанавливаются в общем порядке выполнения.
+        return list(heapq.merge(*shard_debits, key=lambda debit: debit[3]))
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.schemas import UserBase
+from app.core.db import release_session
+from app.crud.ids import allocate_id
+from app.crud.transactions import (
+    deposit_to_user,
+    get_debits_since,
+    get_user_transactions,
+    transfer_funds,
+    withdraw_from_user,
+)
+from app.crud.users import (
+    close_user,
+    create_user,
+    get_user_by_id,
+    get_user_by_name,
+    get_user_version,
+)
+from app.storage.base import LedgerBackend
+
+
+class SqlLedger(LedgerBackend):
+    """
+    Хранилище в реляционной БД поверх функций app.crud.
+
+    Работает в рамках одной сессии, созданной на время запроса.
+    Соединение сессии возвращается в пул при фиксации, откате или
+    вызове release.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_user(self, user_id: int):
+        return await get_user_by_id(self.db, user_id)
+
+    async def get_user_by_name(self, name: str):
+        return await get_user_by_name(self.db, name)
+
+    async def get_user_version(self, user_id: int):
+        return await get_user_version(self.db, user_id)
+
+    async def create_user(self, name: str):
+        user_id = await allocate_id(self.db, "users")
+        return await create_user(self.db, UserBase(name=name), user_id)
+
+    async def deposit(self, user_id: int, amount: float):
+        return await deposit_to_user(self.db, user_id, amount)
+
+    async def withdraw(self, user_id: int, amount: float):
+        return await withdraw_from_user(self.db, user_id, amount)
+
+    async def transfer(
+        self, from_user_id: int, to_user_id: int, amount: float
+    ):
+        return await transfer_funds(
+            self.db, from_user_id, to_user_id, amount
+        )
+
+    async def close_user(self, user_id: int):
+        return await close_user(self.db, user_id)
+
+    async def get_transactions(self, user_id: int):
+        return await get_user_transactions(self.db, user_id)
+
+    async def get_debits_since(self, since: datetime):
+        return await get_debits_since(self.db, since)
+
+    async def commit(self) -> None:
+        await self.db.commit()
+
+    async def release(self) -> None:
+        await release_session(self.db)
+
+    async def rollback(self) -> None:
+        await self.db.rollback()
@@ -0,0 +1,297 @@
+"""
+Пакетное начисление процентов и списание комиссий.
+
+Правило задается или изменяется командой rule, а применяется за период
+командой run:
+
+    python -m app.workers.accrual rule monthly-interest --type interest \\
+        --rate 0.01 --min-balance 100
+    python -m app.workers.accrual run monthly-interest --period 2026-10
+
+Пользователи делятся на порции по диапазонам ID, порции всех шардов
+выполняются параллельно в отдельных сессиях. Каждая порция изменяет
+балансы, записывает операции и события в одной транзакции БД вместе
+с отметкой о выполнении, поэтому прерванный запуск можно повторить той
+же командой: выполненные порции будут пропущены.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from app.api.models import AccrualRule, AccrualRuleType, AccrualRunStatus
+from app.core.config import get_settings
+from app.core.db import (
+    ShardRouter,
+    dispose_engine,
+    get_shard_router,
+    init_engine,
+)
+from app.core.log import setup_logging
+from app.crud.accrual import (
+    apply_accrual_chunk,
+    finish_accrual_run,
+    get_accrual_rule,
+    get_accrual_run_totals,
+    get_finished_chunks,
+    get_max_user_id,
+    get_or_create_accrual_run,
+    save_accrual_rule,
+)
+from app.crud.concurrency import run_balance_operation
+
+logger = logging.getLogger(__name__)
+
+# Интервал вывода прогресса запуска (в секундах).
+PROGRESS_INTERVAL = 5.0
+
+
+class AccrualRunner:
+    """
+    Выполнение запуска правила: очередь порций (шард, начало диапазона)
+    и concurrency воркеров, забирающих порции из очереди.
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter,
+        rule: AccrualRule,
+        run_id: int,
+        chunk_size: int,
+        max_user_id: int,
+        concurrency: int,
+    ):
+        self.router = router
+        self.rule = rule
+        self.run_id = run_id
+        self.chunk_size = chunk_size
+        self.max_user_id = max_user_id
+        self.concurrency = concurrency
+        self.accounts = 0
+        self.chunks = 0
+        self.failed = 0
+
+    async def _fill_queue(self, queue: asyncio.Queue) -> int:
+        """
+        Добавление в очередь невыполненных порций всех шардов.
+        """
+        starts = range(1, self.max_user_id + 1, self.chunk_size)
+        pending = 0
+        for shard in range(self.router.count):
+            async with self.router.session(shard) as db:
+                finished = await get_finished_chunks(db, self.run_id)
+            for start_id in starts:
+                if start_id not in finished:
+                    queue.put_nowait((shard, start_id))
+                    pending += 1
+        return pending
+
+    async def _apply_chunk(self, shard: int, start_id: int) -> int:
+        """
+        Выполнение одной порции с фиксацией.
+        """
+        end_id = min(start_id + self.chunk_size, self.max_user_id + 1)
+        async with self.router.session(shard) as db:
+            try:
+                accounts, _ = await run_balance_operation(
+                    db,
+                    apply_accrual_chunk,
+                    self.run_id,
+                    self.rule,
+                    start_id,
+                    end_id,
+                )
+            except IntegrityError:
+                # Порцию уже выполнил другой процесс.
+                return 0
+        return accounts
+
+    async def _run_worker(self, queue: asyncio.Queue) -> None:
+        """
+        Основной цикл воркера: выполнение порций, пока очередь не пуста.
+        """
+        while True:
+            try:
+                shard, start_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                self.accounts += await self._apply_chunk(shard, start_id)
+                self.chunks += 1
+            except Exception:
+                self.failed += 1
+                logger.exception(
+                    "Шард %d: порция с ID %d не выполнена", shard, start_id
+                )
+
+    async def _report_progress(self, total: int, started_at: float) -> None:
+        """
+        Периодический вывод прогресса и скорости обработки.
+        """
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            elapsed = time.perf_counter() - started_at
+            logger.info(
+                "Порций: %d/%d, счетов: %d, %.0f счетов/с",
+                self.chunks,
+                total,
+                self.accounts,
+                self.accounts / elapsed,
+            )
+
+    async def run(self) -> bool:
+        """
+        Выполнение всех невыполненных порций.
+
+        Returns:
+            bool: Выполнены ли все порции.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        total = await self._fill_queue(queue)
+        logger.info("Порций к выполнению: %d", total)
+        started_at = time.perf_counter()
+        progress = asyncio.create_task(
+            self._report_progress(total, started_at)
+        )
+        try:
+            await asyncio.gather(
+                *(
+                    self._run_worker(queue)
+                    for _ in range(min(self.concurrency, total) or 1)
+                )
+            )
+        finally:
+            progress.cancel()
+        elapsed = time.perf_counter() - started_at
+        logger.info(
+            "Выполнено порций: %d, ошибок: %d, счетов: %d за %.1f с "
+            "(%.0f счетов/с)",
+            self.chunks,
+            self.failed,
+            self.accounts,
+            elapsed,
+            self.accounts / elapsed if elapsed else 0.0,
+        )
+        return self.failed == 0
+
+
+async def save_rule(args: argparse.Namespace) -> int:
+    """
+    Команда rule: создание или изменение правила.
+    """
+    async with get_shard_router().session() as db:
+        db_rule = await save_accrual_rule(
+            db,
+            args.name,
+            AccrualRuleType(args.type),
+            rate=args.rate,
+            fixed_amount=args.fixed,
+            min_balance=args.min_balance,
+        )
+    logger.info("Правило %s (ID %d) сохранено", db_rule.name, db_rule.id)
+    return 0
+
+
+async def run_accrual(args: argparse.Namespace) -> int:
+    """
+    Команда run: применение правила за период.
+    """
+    settings = get_settings()
+    router = get_shard_router()
+    async with router.session() as db:
+        db_rule = await get_accrual_rule(db, args.rule)
+        if db_rule is None:
+            logger.error("Правило %s не найдено", args.rule)
+            return 1
+        max_user_ids = []
+        for shard in range(router.count):
+            async with router.session(shard) as shard_db:
+                max_user_ids.append(await get_max_user_id(shard_db))
+        db_run = await get_or_create_accrual_run(
+            db,
+            db_rule.id,
+            args.period,
+            args.chunk_size or settings.accrual_chunk_size,
+            max(max_user_ids),
+        )
+    if db_run.status == AccrualRunStatus.COMPLETED:
+        logger.error(
+            "Правило %s за период %s уже применено", args.rule, args.period
+        )
+        return 1
+    runner = AccrualRunner(
+        router,
+        db_rule,
+        db_run.id,
+        db_run.chunk_size,
+        db_run.max_user_id,
+        args.concurrency or settings.accrual_concurrency,
+    )
+    if not await runner.run():
+        logger.error("Запуск не завершен, повторите команду")
+        return 1
+    accounts = 0
+    total_amount = 0.0
+    for shard in range(router.count):
+        async with router.session(shard) as db:
+            shard_accounts, shard_amount = await get_accrual_run_totals(
+                db, db_run.id
+            )
+        accounts += shard_accounts
+        total_amount += shard_amount or 0.0
+    async with router.session() as db:
+        await finish_accrual_run(db, db_run.id)
+    logger.info(
+        "Правило %s за период %s применено: счетов %d, сумма %.2f",
+        args.rule,
+        args.period,
+        accounts,
+        total_amount,
+    )
+    return 0
+
+
+async def run(args: argparse.Namespace) -> int:
+    init_engine()
+    try:
+        return await args.command(args)
+    finally:
+        await dispose_engine()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.workers.accrual")
+    commands = parser.add_subparsers(required=True)
+
+    rule = commands.add_parser("rule", help="создать или изменить правило")
+    rule.set_defaults(command=save_rule)
+    rule.add_argument("name")
+    rule.add_argument(
+        "--type",
+        required=True,
+        choices=[rule_type.value for rule_type in AccrualRuleType],
+    )
+    rule.add_argument("--rate", type=float, default=0.0)
+    rule.add_argument("--fixed", type=float, default=0.0)
+    rule.add_argument("--min-balance", type=float, default=0.0)
+
+    run_parser = commands.add_parser("run", help="применить правило")
+    run_parser.set_defaults(command=run_accrual)
+    run_parser.add_argument("rule")
+    run_parser.add_argument("--period", required=True)
+    run_parser.add_argument("--chunk-size", type=int, default=None)
+    run_parser.add_argument("--concurrency", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    setup_logging()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Снятие истекших блокировок средств.
+
+Истекшие блокировки выбираются пачками по индексу на expires_at
+(только активные блокировки) с SKIP LOCKED, поэтому несколько процессов
+воркера снимают разные пачки. Запускается внутри приложения или
+отдельным процессом:
+
+    python -m app.workers.hold_sweeper
+"""
+import asyncio
+import logging
+import signal
+
+from app.core.config import get_settings
+from app.core.db import (
+    ShardRouter,
+    dispose_engine,
+    get_shard_router,
+    init_engine,
+)
+from app.core.log import setup_logging
+from app.core.metrics import metrics
+from app.crud.holds import release_expired_holds
+
+logger = logging.getLogger(__name__)
+
+
+class HoldSweeper:
+    """
+    Воркер, снимающий истекшие блокировки на всех шардах.
+
+    Пока находятся полные пачки, следующая берется сразу, иначе воркер
+    ждет interval секунд.
+    """
+
+    def __init__(self, router: ShardRouter, interval: float, batch_size: int):
+        self.router = router
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stopping = asyncio.Event()
+        self._task = None
+
+    async def sweep_shard(self, shard: int) -> int:
+        """
+        Снятие истекших блокировок одного шарда.
+
+        Returns:
+            int: Число снятых блокировок.
+        """
+        released = 0
+        while not self._stopping.is_set():
+            async with self.router.session(shard) as db:
+                count = await release_expired_holds(db, self.batch_size)
+            if count:
+                metrics.increment("expired_holds", value=count)
+            released += count
+            if count < self.batch_size:
+                break
+        return released
+
+    async def _run(self) -> None:
+        """
+        Основной цикл воркера.
+        """
+        while not self._stopping.is_set():
+            for shard in range(self.router.count):
+                try:
+                    await self.sweep_shard(shard)
+                except Exception:
+                    logger.exception(
+                        "Шард %d: ошибка снятия истекших блокировок", shard
+                    )
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """
+        Запуск воркера.
+        """
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Остановка воркера после завершения текущей пачки.
+        """
+        self._stopping.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def create_hold_sweeper() -> HoldSweeper:
+    """
+    Создание воркера по настройкам приложения.
+    """
+    settings = get_settings()
+    return HoldSweeper(
+        get_shard_router(),
+        interval=settings.hold_sweep_interval,
+        batch_size=settings.hold_sweep_batch_size,
+    )
+
+
+async def run() -> None:
+    """
+    Работа воркера до получения SIGTERM/SIGINT.
+    """
+    init_engine()
+    sweeper = create_hold_sweeper()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    sweeper.start()
+    await stop.wait()
+    await sweeper.stop()
+    await dispose_engine()
+
+
+def main() -> None:
+    setup_logging()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
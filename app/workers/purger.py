@@ -0,0 +1,272 @@
+"""
+Удаление данных закрытых счетов.
+
+Счет закрывается сразу (users.closed_at), а его транзакции переносятся
+в архив (transactions_archive) и удаляются здесь небольшими порциями,
+каждая в своей короткой транзакции БД. Между порциями выдерживается
+пауза, а при отставании реплик PostgreSQL больше допустимого очистка
+ждет, пока реплики догонят основную базу. После удаления всех данных
+удаляется строка пользователя.
+
+Здесь же удаляются события outbox старше outbox_retention: это окно,
+в пределах которого подписчик может переподключиться с Last-Event-ID
+и получить пропущенные события.
+
+Запускается внутри приложения или отдельным процессом:
+
+    python -m app.workers.purger
+"""
+import asyncio
+import logging
+import signal
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from app.core.config import get_settings
+from app.core.db import (
+    ShardRouter,
+    dispose_engine,
+    get_shard_router,
+    init_engine,
+)
+from app.core.log import setup_logging
+from app.core.metrics import metrics
+from app.crud.purge import (
+    archive_transactions,
+    delete_closed_user,
+    delete_expired_outbox_events,
+    delete_outbox_events,
+    get_closed_user_ids,
+    get_replication_lag,
+)
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = 100
+
+
+class AccountPurger:
+    """
+    Воркер, периодически удаляющий данные закрытых счетов и устаревшие
+    события outbox на всех шардах.
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter,
+        interval: float,
+        chunk_size: int,
+        chunk_delay: float,
+        max_replication_lag: float,
+        outbox_retention: float,
+    ):
+        self.router = router
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.max_replication_lag = max_replication_lag
+        self.outbox_retention = outbox_retention
+        self._stopping = asyncio.Event()
+        self._task = None
+
+    async def _wait(self, seconds: float) -> bool:
+        """
+        Пауза, прерываемая остановкой воркера.
+
+        Returns:
+            bool: Остановлен ли воркер.
+        """
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self._stopping.is_set()
+
+    async def _throttle(self, shard: int) -> bool:
+        """
+        Пауза после порции и ожидание, пока отставание реплик шарда не
+        станет допустимым.
+
+        Returns:
+            bool: Остановлен ли воркер.
+        """
+        if await self._wait(self.chunk_delay):
+            return True
+        while True:
+            async with self.router.session(shard) as db:
+                lag = await get_replication_lag(db)
+            if lag is None or lag <= self.max_replication_lag:
+                return False
+            logger.info(
+                "Шард %d: отставание реплик %.1f с, очистка приостановлена",
+                shard,
+                lag,
+            )
+            if await self._wait(self.interval):
+                return True
+
+    async def _purge_chunks(
+        self,
+        shard: int,
+        user_id: int,
+        purge_chunk: Callable[..., Awaitable[int]],
+        metric: str,
+    ) -> bool:
+        """
+        Удаление данных пользователя порциями до их окончания.
+
+        Returns:
+            bool: Удалены ли все данные (False, если воркер остановлен).
+        """
+        while True:
+            async with self.router.session(shard) as db:
+                purged = await purge_chunk(db, user_id, self.chunk_size)
+            if not purged:
+                return True
+            metrics.increment(metric, value=purged)
+            if await self._throttle(shard):
+                return False
+
+    async def purge_user(self, shard: int, user_id: int) -> bool:
+        """
+        Архивация транзакций и удаление данных одного закрытого счета.
+
+        Returns:
+            bool: Был ли счет удален.
+        """
+        for purge_chunk, metric in (
+            (archive_transactions, "purged_transactions"),
+            (delete_outbox_events, "purged_outbox_events"),
+        ):
+            if not await self._purge_chunks(
+                shard, user_id, purge_chunk, metric
+            ):
+                return False
+        async with self.router.session(shard) as db:
+            deleted = await delete_closed_user(db, user_id)
+        if deleted:
+            metrics.increment("purged_accounts")
+            logger.info("Шард %d: данные счета %d удалены", shard, user_id)
+        return deleted
+
+    async def purge_shard(self, shard: int) -> int:
+        """
+        Удаление данных закрытых счетов одного шарда.
+
+        Returns:
+            int: Число удаленных счетов.
+        """
+        async with self.router.session(shard) as db:
+            user_ids = await get_closed_user_ids(db, PURGE_BATCH_SIZE)
+        purged = 0
+        for user_id in user_ids:
+            if self._stopping.is_set():
+                break
+            try:
+                purged += await self.purge_user(shard, user_id)
+            except Exception:
+                logger.exception(
+                    "Шард %d: ошибка удаления данных счета %d",
+                    shard,
+                    user_id,
+                )
+        return purged
+
+    async def expire_events(self, shard: int) -> int:
+        """
+        Удаление порциями событий outbox шарда старше outbox_retention
+        секунд (0 - события не удаляются).
+
+        Returns:
+            int: Число удаленных событий.
+        """
+        if not self.outbox_retention:
+            return 0
+        before = datetime.now(timezone.utc) - timedelta(
+            seconds=self.outbox_retention
+        )
+        expired = 0
+        while True:
+            async with self.router.session(shard) as db:
+                count = await delete_expired_outbox_events(
+                    db, before, self.chunk_size
+                )
+            if count:
+                metrics.increment("expired_outbox_events", value=count)
+            expired += count
+            if count < self.chunk_size or await self._throttle(shard):
+                return expired
+
+    async def _run(self) -> None:
+        """
+        Основной цикл воркера.
+        """
+        while not self._stopping.is_set():
+            for shard in range(self.router.count):
+                try:
+                    await self.purge_shard(shard)
+                except Exception:
+                    logger.exception("Шард %d: ошибка очистки", shard)
+                try:
+                    await self.expire_events(shard)
+                except Exception:
+                    logger.exception(
+                        "Шард %d: ошибка удаления устаревших событий", shard
+                    )
+            await self._wait(self.interval)
+
+    def start(self) -> None:
+        """
+        Запуск воркера.
+        """
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Остановка воркера после завершения текущей порции.
+        """
+        self._stopping.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def create_purger() -> AccountPurger:
+    """
+    Создание воркера по настройкам приложения.
+    """
+    settings = get_settings()
+    return AccountPurger(
+        get_shard_router(),
+        interval=settings.purge_interval,
+        chunk_size=settings.purge_chunk_size,
+        chunk_delay=settings.purge_chunk_delay,
+        max_replication_lag=settings.purge_max_replication_lag,
+        outbox_retention=settings.outbox_retention,
+    )
+
+
+async def run() -> None:
+    """
+    Работа воркера до получения SIGTERM/SIGINT.
+    """
+    init_engine()
+    purger = create_purger()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    purger.start()
+    await stop.wait()
+    await purger.stop()
+    await dispose_engine()
+
+
+def main() -> None:
+    setup_logging()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Пул воркеров запланированных переводов.
+
+Пул запускается внутри приложения (scheduler_workers воркеров на процесс)
+или отдельным процессом:
+
+    python -m app.workers.scheduler --workers 8
+"""
+import argparse
+import asyncio
+import logging
+import signal
+from typing import List, Optional
+
+from app.core.config import get_settings
+from app.core.db import dispose_engine, get_shard_router, init_engine
+from app.core.log import setup_logging
+from app.crud.scheduled_transfers import process_due_transfers
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledTransferWorkerPool:
+    """
+    Набор асинхронных воркеров, выполняющих наступившие переводы пачками.
+
+    Воркер по очереди обходит все шарды. Пока находятся полные пачки,
+    воркер берет следующую сразу, иначе ждет poll_interval секунд.
+    """
+
+    def __init__(self, workers: int, batch_size: int, poll_interval: float):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stopping = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def _run_worker(self, number: int) -> None:
+        """
+        Основной цикл воркера.
+        """
+        router = get_shard_router()
+        while not self._stopping.is_set():
+            processed = 0
+            for shard in range(router.count):
+                try:
+                    async with router.session(shard) as db:
+                        processed = max(
+                            processed,
+                            await process_due_transfers(
+                                db, self.batch_size, router
+                            ),
+                        )
+                except Exception:
+                    logger.exception(
+                        "Воркер %d: ошибка обработки пачки шарда %d",
+                        number,
+                        shard,
+                    )
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(
+                        self._stopping.wait(), timeout=self.poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        """
+        Запуск воркеров.
+        """
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._run_worker(number))
+            for number in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """
+        Остановка воркеров после завершения текущих пачек.
+        """
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def create_worker_pool(
+    workers: Optional[int] = None,
+) -> ScheduledTransferWorkerPool:
+    """
+    Создание пула воркеров по настройкам приложения.
+    """
+    settings = get_settings()
+    return ScheduledTransferWorkerPool(
+        workers=settings.scheduler_workers if workers is None else workers,
+        batch_size=settings.scheduler_batch_size,
+        poll_interval=settings.scheduler_poll_interval,
+    )
+
+
+async def run(workers: int) -> None:
+    """
+    Работа пула до получения SIGTERM/SIGINT.
+    """
+    init_engine()
+    pool = create_worker_pool(workers)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    pool.start()
+    await stop.wait()
+    await pool.stop()
+    await dispose_engine()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.workers.scheduler")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    setup_logging()
+    workers = args.workers or get_settings().scheduler_workers or 1
+    asyncio.run(run(workers))
+
+
+if __name__ == "__main__":
+    main()
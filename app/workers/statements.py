@@ -0,0 +1,436 @@
+"""
+Ежемесячные выписки по счетам.
+
+    python -m app.workers.statements --period 2026-09
+
+Для каждого открытого счета создается файл выписки (CSV) с балансами на
+начало и конец периода и транзакциями за период. Транзакции шарда
+читаются одним запросом через курсор на стороне сервера в порядке
+(user_id, created_at) и группируются по пользователям за один проход.
+Выписки формируются пачками в пуле процессов, чтобы форматирование
+использовало все ядра.
+
+Файлы записываются в каталог <output-dir>/<период>, а после записи
+файлов пачки в manifest.jsonl дописывается ее строка. Прерванный запуск
+продолжается той же командой: пользователи из записанных пачек
+пропускаются, а чтение начинается после последней непрерывно
+выполненной пачки.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import get_settings
+from app.core.db import (
+    ShardRouter,
+    dispose_engine,
+    get_shard_router,
+    init_engine,
+)
+from app.core.log import setup_logging
+from app.crud.balance_series import to_utc
+from app.crud.statements import iter_statement_rows, period_bounds
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.jsonl"
+
+# Интервал вывода прогресса запуска (в секундах).
+PROGRESS_INTERVAL = 5.0
+
+# Число файлов выписок в одном подкаталоге.
+FILES_PER_DIRECTORY = 1000
+
+# Выписка: user_id, имя, баланс на конец периода и транзакции
+# (id, created_at, type, amount, balance_delta).
+Statement = Tuple[int, str, float, List[Tuple[int, str, str, float, float]]]
+
+
+def render_statements(
+    directory: str, period: str, statements: List[Statement]
+) -> List[dict]:
+    """
+    Запись файлов пачки выписок. Выполняется в процессе пула.
+
+    Файл записывается во временный и переименовывается, поэтому после
+    сбоя не остается недописанных выписок.
+
+    Returns:
+        List[dict]: Строки манифеста о выписках пачки.
+    """
+    entries = []
+    for user_id, name, closing_balance, transactions in statements:
+        opening_balance = closing_balance - sum(
+            balance_delta for *_, balance_delta in transactions
+        )
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(
+            ["user_id", "name", "period", "opening_balance", "closing_balance"]
+        )
+        writer.writerow(
+            [
+                user_id,
+                name,
+                period,
+                f"{opening_balance:.2f}",
+                f"{closing_balance:.2f}",
+            ]
+        )
+        writer.writerow([])
+        writer.writerow(
+            ["id", "created_at", "type", "amount", "balance_delta", "balance"]
+        )
+        balance = opening_balance
+        for transaction_id, created_at, type_, amount, balance_delta in (
+            transactions
+        ):
+            balance += balance_delta
+            writer.writerow(
+                [
+                    transaction_id,
+                    created_at,
+                    type_,
+                    f"{amount:.2f}",
+                    f"{balance_delta:.2f}",
+                    f"{balance:.2f}",
+                ]
+            )
+        relative_path = Path(str(user_id // FILES_PER_DIRECTORY)) / (
+            f"{user_id}.csv"
+        )
+        path = Path(directory) / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(output.getvalue(), encoding="utf-8")
+        os.replace(tmp_path, path)
+        entries.append(
+            {
+                "user_id": user_id,
+                "file": str(relative_path),
+                "transactions": len(transactions),
+                "opening_balance": round(opening_balance, 2),
+                "closing_balance": round(closing_balance, 2),
+            }
+        )
+    return entries
+
+
+class StatementManifest:
+    """
+    Манифест запуска: строка JSON на каждую записанную пачку
+    (шард, диапазон ID пользователей (after_user_id, last_user_id] и
+    выписки) и итоговая строка после завершения запуска.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.completed = False
+        self.done: Set[int] = set()
+        self._ranges: Dict[int, Dict[int, int]] = defaultdict(dict)
+
+    def load(self) -> None:
+        """
+        Чтение манифеста прерванного запуска. Недописанная последняя
+        строка удаляется из файла, чтобы не испортить следующую запись.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, "rb+") as manifest:
+            data = manifest.read()
+            if data and not data.endswith(b"\n"):
+                data = data[: data.rfind(b"\n") + 1]
+                manifest.truncate(len(data))
+        for line in data.decode("utf-8").splitlines():
+            entry = json.loads(line)
+            if entry.get("completed"):
+                self.completed = True
+                continue
+            self._ranges[entry["shard"]][entry["after_user_id"]] = entry[
+                "last_user_id"
+            ]
+            self.done.update(
+                statement["user_id"] for statement in entry["statements"]
+            )
+
+    def watermark(self, shard: int) -> int:
+        """
+        ID пользователя, до которого включительно все пачки шарда
+        выполнены без пропусков.
+        """
+        ranges = self._ranges[shard]
+        user_id = 0
+        while user_id in ranges:
+            user_id = ranges[user_id]
+        return user_id
+
+    def append(self, entry: dict) -> None:
+        """
+        Запись строки манифеста на диск.
+        """
+        with open(self.path, "a", encoding="utf-8") as manifest:
+            manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            manifest.flush()
+            os.fsync(manifest.fileno())
+
+
+class StatementRunner:
+    """
+    Формирование выписок за период: чтение шардов, группировка строк по
+    пользователям и передача пачек выписок в пул процессов. Число пачек,
+    ожидающих пула, ограничено, поэтому чтение из БД не опережает
+    форматирование.
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter,
+        period: str,
+        directory: Path,
+        batch_size: int,
+        fetch_size: int,
+        processes: int,
+    ):
+        self.router = router
+        self.period = period
+        self.start, self.end = period_bounds(period)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.fetch_size = fetch_size
+        self.processes = processes
+        self.manifest = StatementManifest(directory / MANIFEST_FILE)
+        self.statements = 0
+        self.rows = 0
+        self.failed = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(processes * 2)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _render(
+        self,
+        shard: int,
+        after_user_id: int,
+        statements: List[Statement],
+    ) -> None:
+        """
+        Формирование пачки в пуле процессов и запись ее в манифест.
+        """
+        try:
+            entries = await asyncio.get_running_loop().run_in_executor(
+                self._pool,
+                render_statements,
+                str(self.directory),
+                self.period,
+                statements,
+            )
+            self.manifest.append(
+                {
+                    "shard": shard,
+                    "after_user_id": after_user_id,
+                    "last_user_id": statements[-1][0],
+                    "statements": entries,
+                }
+            )
+            self.statements += len(entries)
+        except Exception:
+            self.failed += 1
+            logger.exception(
+                "Шард %d: пачка выписок после ID %d не сформирована",
+                shard,
+                after_user_id,
+            )
+        finally:
+            self._slots.release()
+
+    async def _submit(
+        self, shard: int, after_user_id: int, statements: List[Statement]
+    ) -> None:
+        """
+        Передача пачки в пул, когда в нем освободится место.
+        """
+        await self._slots.acquire()
+        task = asyncio.create_task(
+            self._render(shard, after_user_id, statements)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_shard(self, shard: int) -> None:
+        """
+        Чтение строк шарда и группировка их в выписки за один проход.
+        """
+        after_user_id = self.manifest.watermark(shard)
+        batch: List[Statement] = []
+        statement: Optional[Statement] = None
+        async with self.router.session(shard) as db:
+            async for row in iter_statement_rows(
+                db, self.start, self.end, after_user_id, self.fetch_size
+            ):
+                self.rows += 1
+                if statement is not None and statement[0] != row.user_id:
+                    batch.append(statement)
+                    statement = None
+                    if len(batch) >= self.batch_size:
+                        await self._submit(shard, after_user_id, batch)
+                        after_user_id = batch[-1][0]
+                        batch = []
+                if row.user_id in self.manifest.done:
+                    # Выписка уже сформирована: текущая пачка
+                    # завершается, следующая начнется после этого ID.
+                    if batch:
+                        await self._submit(shard, after_user_id, batch)
+                        batch = []
+                    after_user_id = row.user_id
+                    continue
+                if statement is None:
+                    statement = (
+                        row.user_id,
+                        row.name,
+                        row.closing_balance,
+                        [],
+                    )
+                if row.id is not None:
+                    statement[3].append(
+                        (
+                            row.id,
+                            to_utc(row.created_at).isoformat(),
+                            row.type.value,
+                            row.amount,
+                            row.balance_delta,
+                        )
+                    )
+        if statement is not None:
+            batch.append(statement)
+        if batch:
+            await self._submit(shard, after_user_id, batch)
+
+    async def _report_progress(self, started_at: float) -> None:
+        """
+        Периодический вывод прогресса и скорости обработки.
+        """
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            elapsed = time.perf_counter() - started_at
+            logger.info(
+                "Выписок: %d (%.0f/с), строк: %d (%.0f/с)",
+                self.statements,
+                self.statements / elapsed,
+                self.rows,
+                self.rows / elapsed,
+            )
+
+    async def run(self) -> bool:
+        """
+        Формирование всех невыполненных выписок.
+
+        Returns:
+            bool: Сформированы ли все выписки.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest.load()
+        if self.manifest.completed:
+            logger.info("Выписки за период %s уже сформированы", self.period)
+            return True
+        if self.manifest.done:
+            logger.info(
+                "Продолжение запуска, уже сформировано выписок: %d",
+                len(self.manifest.done),
+            )
+        started_at = time.perf_counter()
+        progress = asyncio.create_task(self._report_progress(started_at))
+        # Процессы пула запускаются через spawn и не наследуют соединения
+        # с БД и потоки этого процесса.
+        self._pool = ProcessPoolExecutor(
+            self.processes, mp_context=multiprocessing.get_context("spawn")
+        )
+        try:
+            await asyncio.gather(
+                *(self._run_shard(shard) for shard in range(self.router.count))
+            )
+            await asyncio.gather(*self._tasks)
+        finally:
+            progress.cancel()
+            self._pool.shutdown(cancel_futures=True)
+        elapsed = time.perf_counter() - started_at
+        logger.info(
+            "Сформировано выписок: %d, ошибок: %d, строк: %d за %.1f с "
+            "(%.0f выписок/с, %.0f строк/с)",
+            self.statements,
+            self.failed,
+            self.rows,
+            elapsed,
+            self.statements / elapsed if elapsed else 0.0,
+            self.rows / elapsed if elapsed else 0.0,
+        )
+        if self.failed:
+            return False
+        self.manifest.append(
+            {
+                "completed": True,
+                "period": self.period,
+                "total": len(self.manifest.done) + self.statements,
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+            }
+        )
+        return True
+
+
+async def run(args: argparse.Namespace) -> int:
+    settings = get_settings()
+    try:
+        _, end = period_bounds(args.period)
+    except ValueError:
+        logger.error("Период %s должен быть в формате YYYY-MM", args.period)
+        return 1
+    if end > datetime.now(timezone.utc):
+        logger.error("Период %s еще не закончился", args.period)
+        return 1
+    init_engine()
+    try:
+        runner = StatementRunner(
+            get_shard_router(),
+            args.period,
+            Path(args.output_dir or settings.statement_output_dir)
+            / args.period,
+            args.batch_size or settings.statement_batch_size,
+            args.fetch_size or settings.statement_fetch_size,
+            args.processes or settings.statement_processes or os.cpu_count(),
+        )
+        if not await runner.run():
+            logger.error("Запуск не завершен, повторите команду")
+            return 1
+        return 0
+    finally:
+        await dispose_engine()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.workers.statements")
+    parser.add_argument("--period", required=True)
+    parser.add_argument("--output-dir", default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--fetch-size", type=int, default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    setup_logging()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
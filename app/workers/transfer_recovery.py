@@ -0,0 +1,145 @@
+"""
+Восстановление межшардовых переводов.
+
+Завершает переводы, средства по которым списаны, но которые не были
+завершены (например, процесс остановился или шард получателя был
+недоступен). Запускается внутри приложения при нескольких шардах
+или отдельным процессом:
+
+    python -m app.workers.transfer_recovery
+"""
+import asyncio
+import logging
+import signal
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import get_settings
+from app.core.db import (
+    ShardRouter,
+    dispose_engine,
+    get_shard_router,
+    init_engine,
+)
+from app.core.log import setup_logging
+from app.crud.cross_shard import complete_transfer, get_stale_transfers
+
+logger = logging.getLogger(__name__)
+
+RECOVERY_BATCH_SIZE = 100
+
+
+class TransferRecoveryWorker:
+    """
+    Воркер, периодически завершающий зависшие межшардовые переводы
+    на всех шардах.
+    """
+
+    def __init__(self, router: ShardRouter, interval: float, delay: float):
+        self.router = router
+        self.interval = interval
+        self.delay = delay
+        self._stopping = asyncio.Event()
+        self._task = None
+
+    async def recover_shard(self, shard: int) -> int:
+        """
+        Завершение зависших переводов одного шарда.
+
+        Returns:
+            int: Число обработанных переводов.
+        """
+        created_before = datetime.now(timezone.utc) - timedelta(
+            seconds=self.delay
+        )
+        async with self.router.session(shard) as db:
+            db_intents = await get_stale_transfers(
+                db, created_before, RECOVERY_BATCH_SIZE
+            )
+        for db_intent in db_intents:
+            try:
+                await complete_transfer(
+                    self.router,
+                    db_intent.id,
+                    db_intent.from_user_id,
+                    db_intent.to_user_id,
+                    db_intent.amount,
+                )
+            except Exception:
+                logger.exception("Перевод %s не завершен", db_intent.id)
+        return len(db_intents)
+
+    async def _run(self) -> None:
+        """
+        Основной цикл воркера.
+        """
+        while not self._stopping.is_set():
+            for shard in range(self.router.count):
+                try:
+                    recovered = await self.recover_shard(shard)
+                    if recovered:
+                        logger.info(
+                            "Шард %d: завершено переводов: %d",
+                            shard,
+                            recovered,
+                        )
+                except Exception:
+                    logger.exception("Шард %d: ошибка восстановления", shard)
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """
+        Запуск воркера.
+        """
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Остановка воркера после завершения текущего прохода.
+        """
+        self._stopping.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def create_recovery_worker() -> TransferRecoveryWorker:
+    """
+    Создание воркера по настройкам приложения.
+    """
+    settings = get_settings()
+    return TransferRecoveryWorker(
+        get_shard_router(),
+        interval=settings.transfer_recovery_interval,
+        delay=settings.transfer_recovery_delay,
+    )
+
+
+async def run() -> None:
+    """
+    Работа воркера до получения SIGTERM/SIGINT.
+    """
+    init_engine()
+    worker = create_recovery_worker()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    worker.start()
+    await stop.wait()
+    await worker.stop()
+    await dispose_engine()
+
+
+def main() -> None:
+    setup_logging()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Контроль нагрузки: лимиты пользователей (429), глобальный лимит
+конкурентности (503) и заголовок Retry-After в ответах.
+"""
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import admit_read, admit_user_write
+from app.core.admission import (
+    ConcurrencyLimiter,
+    Overloaded,
+    Priority,
+    RateLimited,
+    TokenBucket,
+    UserRateLimiter,
+    admission,
+)
+from app.core.config import Settings
+from app.core.errors import ErrorMessages
+
+
+def _settings(**overrides) -> Settings:
+    values = dict(
+        app_title="test",
+        database_url="sqlite+aiosqlite://",
+        secret="secret",
+        postgres_db="test",
+    )
+    values.update(overrides)
+    return Settings(**values)
+
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5, abs=0.01)
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.take()
+    bucket.updated_at -= 1
+    assert [bucket.take() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.take() > 0
+    bucket.updated_at -= 100
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() > 0
+
+
+def test_user_rate_limiter_is_per_user():
+    limiter = UserRateLimiter(rate=0.5, burst=1)
+    limiter.check(1)
+    with pytest.raises(RateLimited) as exc_info:
+        limiter.check(1)
+    assert exc_info.value.retry_after == 2
+    limiter.check(2)
+
+
+def test_user_rate_limiter_forgets_least_recent_users():
+    limiter = UserRateLimiter(rate=0.5, burst=1, max_users=2)
+    limiter.check(1)
+    limiter.check(2)
+    limiter.check(3)
+    limiter.check(1)
+    with pytest.raises(RateLimited):
+        limiter.check(3)
+
+
+def test_writes_leave_slots_for_reads():
+    async def scenario():
+        limiter = ConcurrencyLimiter(
+            limit=2, read_reserve=1, queue_timeout=0.01, max_queue=10
+        )
+        await limiter.acquire(Priority.WRITE)
+        with pytest.raises(Overloaded) as exc_info:
+            await limiter.acquire(Priority.WRITE)
+        assert exc_info.value.retry_after == 1
+        await limiter.acquire(Priority.READ)
+        assert limiter.active == 2
+        assert limiter.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_rejected_without_waiting():
+    async def scenario():
+        limiter = ConcurrencyLimiter(
+            limit=1, read_reserve=0, queue_timeout=10, max_queue=0
+        )
+        await limiter.acquire(Priority.READ)
+        with pytest.raises(Overloaded):
+            await asyncio.wait_for(limiter.acquire(Priority.READ), 1)
+
+    asyncio.run(scenario())
+
+
+def test_released_slot_goes_to_waiting_read_first():
+    async def scenario():
+        limiter = ConcurrencyLimiter(
+            limit=1, read_reserve=0, queue_timeout=1, max_queue=10
+        )
+        await limiter.acquire(Priority.WRITE)
+        order = []
+
+        async def request(priority: Priority):
+            async with limiter.slot(priority):
+                order.append(priority)
+
+        write = asyncio.create_task(request(Priority.WRITE))
+        await asyncio.sleep(0)
+        read = asyncio.create_task(request(Priority.READ))
+        await asyncio.sleep(0)
+        assert limiter.queued == 2
+        limiter.release()
+        await asyncio.gather(write, read)
+        assert order == [Priority.READ, Priority.WRITE]
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(admission, "_limiter", None)
+    monkeypatch.setattr(admission, "_user_limiter", None)
+    app = FastAPI()
+
+    @app.post("/write/{user_id}", dependencies=[Depends(admit_user_write)])
+    async def write(user_id: int):
+        return {"user_id": user_id}
+
+    @app.get("/read", dependencies=[Depends(admit_read)])
+    async def read():
+        return {}
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_rate_limited_user_gets_429_with_retry_after(client):
+    admission.configure(_settings(user_write_rate=0.25, user_write_burst=1))
+    assert client.post("/write/1").status_code == 200
+    response = client.post("/write/1")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "4"
+    assert response.json()["detail"] == ErrorMessages.TOO_MANY_REQUESTS
+    assert client.post("/write/2").status_code == 200
+    assert admission.limiter.active == 0
+
+
+def test_overloaded_service_gets_503_with_retry_after(client):
+    admission.configure(
+        _settings(
+            db_pool_size=1,
+            db_max_overflow=0,
+            admission_read_reserve=0,
+            admission_queue_timeout=0.01,
+            admission_max_queue=10,
+        )
+    )
+    admission.limiter.active = admission.limiter.limit
+    response = client.get("/read")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["detail"] == ErrorMessages.SERVICE_OVERLOADED
+    admission.limiter.release()
+    assert client.get("/read").status_code == 200
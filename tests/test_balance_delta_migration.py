@@ -0,0 +1,184 @@
+"""
+Заполнение balance_delta миграцией f1d4b8e2a6c3 на данных в формате
+исходной версии: записи перевода отправителя и получателя создавались
+в отдельных транзакциях БД с разным created_at.
+"""
+import importlib.util
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+
+MIGRATION = (
+    Path(__file__).resolve().parent.parent
+    / "alembic"
+    / "versions"
+    / "f1d4b8e2a6c3_transactions_balance_delta.py"
+)
+
+metadata = sa.MetaData()
+users = sa.Table(
+    "users",
+    metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("balance", sa.Float),
+)
+transactions = sa.Table(
+    "transactions",
+    metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("user_id", sa.Integer),
+    sa.Column("amount", sa.Float),
+    sa.Column("type", sa.String),
+    sa.Column("balance_delta", sa.Float),
+    sa.Column("created_at", sa.DateTime(timezone=True)),
+)
+transfer_intents = sa.Table(
+    "transfer_intents",
+    metadata,
+    sa.Column("id", sa.String, primary_key=True),
+    sa.Column("from_user_id", sa.Integer),
+    sa.Column("amount", sa.Float),
+    sa.Column("created_at", sa.DateTime(timezone=True)),
+)
+applied_transfers = sa.Table(
+    "applied_transfers",
+    metadata,
+    sa.Column("id", sa.String, primary_key=True),
+    sa.Column("to_user_id", sa.Integer),
+    sa.Column("amount", sa.Float),
+    sa.Column("created_at", sa.DateTime(timezone=True)),
+)
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def migration():
+    spec = importlib.util.spec_from_file_location("migration", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _at(seconds: float) -> datetime:
+    return START + timedelta(seconds=seconds)
+
+
+def _backfill(
+    migration, balances, rows, intents=(), applied=(), **overrides
+):
+    engine = sa.create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            users.insert(),
+            [{"id": i, "balance": b} for i, b in balances.items()],
+        )
+        conn.execute(
+            transactions.insert(),
+            [
+                {
+                    "id": row_id,
+                    "user_id": user_id,
+                    "amount": amount,
+                    "type": type_,
+                    "created_at": created_at,
+                }
+                for row_id, user_id, amount, type_, created_at in rows
+            ],
+        )
+        if intents:
+            conn.execute(transfer_intents.insert(), list(intents))
+        if applied:
+            conn.execute(applied_transfers.insert(), list(applied))
+        migration.backfill_balance_delta(conn, **overrides)
+        result = conn.execute(
+            sa.select(transactions.c.id, transactions.c.balance_delta)
+        )
+        return dict(result.all())
+
+
+def test_baseline_transfer_pair_gets_opposite_signs(migration):
+    deltas = _backfill(
+        migration,
+        {1: 70.0, 2: 30.0},
+        [
+            (1, 1, 100.0, "DEPOSIT", _at(0)),
+            (2, 1, 30.0, "TRANSFER", _at(10)),
+            (3, 2, 30.0, "TRANSFER", _at(10.02)),
+        ],
+    )
+    assert deltas == {1: 100.0, 2: -30.0, 3: 30.0}
+
+
+INTERLEAVED = [
+    (1, 1, 100.0, "DEPOSIT", _at(0)),
+    (2, 3, 20.0, "DEPOSIT", _at(0)),
+    (3, 1, 20.0, "TRANSFER", _at(10)),
+    (4, 3, 15.0, "TRANSFER", _at(10.01)),
+    (5, 2, 20.0, "TRANSFER", _at(10.02)),
+    (6, 4, 15.0, "TRANSFER", _at(10.03)),
+    (7, 2, 15.0, "WITHDRAW", _at(11)),
+    (8, 1, 20.0, "FEE", _at(12)),
+    (9, 3, 10.0, "TRANSFER", _at(20)),
+    (10, 3, 10.0, "TRANSFER", _at(40)),
+]
+INTERLEAVED_BALANCES = {1: 60.0, 2: 5.0, 3: 5.0, 4: 15.0}
+
+
+def test_ambiguous_transfers_abort_backfill(migration):
+    # Две записи без пары у одного пользователя не определяются по
+    # балансу: миграция прерывается и называет их ID.
+    with pytest.raises(migration.AmbiguousTransfersError) as error:
+        _backfill(migration, INTERLEAVED_BALANCES, INTERLEAVED)
+    assert error.value.ids == [9, 10]
+
+
+def test_interleaved_pairs_with_explicit_directions(migration):
+    deltas = _backfill(
+        migration,
+        INTERLEAVED_BALANCES,
+        INTERLEAVED,
+        debit_ids=[10],
+        credit_ids=[9],
+    )
+    assert deltas[3] == -20.0 and deltas[5] == 20.0
+    assert deltas[4] == -15.0 and deltas[6] == 15.0
+    assert deltas[7] == -15.0 and deltas[8] == -20.0
+    assert deltas[9] == 10.0 and deltas[10] == -10.0
+
+
+def test_unpaired_transfer_is_resolved_by_balance(migration):
+    deltas = _backfill(
+        migration,
+        {1: 60.0, 2: 40.0},
+        [
+            (1, 1, 100.0, "DEPOSIT", _at(0)),
+            (2, 1, 40.0, "TRANSFER", _at(10)),
+            (3, 2, 40.0, "TRANSFER", _at(60)),
+        ],
+    )
+    assert deltas == {1: 100.0, 2: -40.0, 3: 40.0}
+
+
+def test_cross_shard_rows_use_intents(migration):
+    deltas = _backfill(
+        migration,
+        {1: 75.0, 2: 25.0},
+        [
+            (1, 1, 100.0, "DEPOSIT", _at(0)),
+            (2, 1, 25.0, "TRANSFER", _at(10)),
+            (3, 2, 25.0, "TRANSFER", _at(10.5)),
+        ],
+        intents=[
+            {"id": "a", "from_user_id": 1, "amount": 25.0,
+             "created_at": _at(10)},
+        ],
+        applied=[
+            {"id": "a", "to_user_id": 2, "amount": 25.0,
+             "created_at": _at(10.5)},
+        ],
+    )
+    assert deltas == {1: 100.0, 2: -25.0, 3: 25.0}
@@ -0,0 +1,161 @@
+"""
+Восстановление хранилища в памяти: воспроизведение журнала, снимки
+и недописанные записи в конце сегмента.
+"""
+import asyncio
+import pickle
+import time
+from array import array
+
+import pytest
+
+from app.core.errors import InsufficientFundsError
+from app.storage.memory import SNAPSHOT_FILE, MemoryLedger
+
+
+def _crash(ledger: MemoryLedger) -> None:
+    """
+    Завершение без снимка, как при аварийной остановке процесса.
+    """
+    ledger._wal.close()
+    ledger._wal = None
+
+
+def _open(data_dir, **kwargs) -> MemoryLedger:
+    ledger = MemoryLedger(str(data_dir), **kwargs)
+    asyncio.run(ledger.open())
+    return ledger
+
+
+def _state(ledger: MemoryLedger):
+    accounts = [
+        (
+            account.id,
+            account.name,
+            account.balance,
+            account.version,
+            account.closed_ts is not None,
+        )
+        for account in ledger.accounts.values()
+    ]
+    entries = {
+        user_id: [
+            (entry.id, entry.amount, entry.type)
+            for entry in asyncio.run(ledger.get_transactions(user_id))
+        ]
+        for user_id in ledger.accounts
+    }
+    return ledger.lsn, accounts, entries, dict(ledger.names)
+
+
+async def _operations(ledger: MemoryLedger) -> None:
+    await ledger.create_user("a")
+    await ledger.create_user("b")
+    await ledger.create_user("c")
+    await ledger.deposit(1, 100)
+    await ledger.withdraw(1, 30)
+    await ledger.transfer(1, 2, 50)
+    with pytest.raises(InsufficientFundsError):
+        await ledger.withdraw(3, 1)
+    await ledger.close_user(3)
+
+
+def test_wal_is_replayed_after_crash(tmp_path):
+    ledger = _open(tmp_path)
+    asyncio.run(_operations(ledger))
+    expected = _state(ledger)
+    _crash(ledger)
+
+    recovered = _open(tmp_path)
+    assert _state(recovered) == expected
+    assert recovered.accounts[1].balance == 20
+    assert recovered.accounts[2].balance == 50
+    assert "c" not in recovered.names
+    assert recovered.next_user_id == 4
+
+
+def test_snapshot_replaces_replayed_segments(tmp_path):
+    ledger = _open(tmp_path)
+    asyncio.run(_operations(ledger))
+    asyncio.run(ledger.snapshot())
+    segments = ledger._segments()
+    assert len(segments) == 1
+    assert (tmp_path / SNAPSHOT_FILE).exists()
+    asyncio.run(ledger.deposit(2, 5))
+    expected = _state(ledger)
+    _crash(ledger)
+
+    recovered = _open(tmp_path)
+    assert _state(recovered) == expected
+    assert recovered._snapshot_lsn == expected[0] - 1
+
+
+def test_snapshot_is_taken_every_interval(tmp_path):
+    async def scenario():
+        ledger = MemoryLedger(str(tmp_path), snapshot_interval=3)
+        await ledger.open()
+        await _operations(ledger)
+        await ledger._snapshot_task
+        return ledger
+
+    ledger = asyncio.run(scenario())
+    assert ledger._snapshot_lsn >= 3
+    expected = _state(ledger)
+    _crash(ledger)
+    assert _state(_open(tmp_path)) == expected
+
+
+def test_truncated_record_is_skipped(tmp_path):
+    ledger = _open(tmp_path)
+    asyncio.run(_operations(ledger))
+    expected = _state(ledger)
+    _crash(ledger)
+    segment = ledger._segments()[-1]
+    with open(segment, "ab") as wal:
+        wal.write(b'[9,"d",1,')
+
+    recovered = _open(tmp_path)
+    assert _state(recovered) == expected
+    asyncio.run(recovered.deposit(1, 1))
+    expected = _state(recovered)
+    _crash(recovered)
+    assert _state(_open(tmp_path)) == expected
+
+
+def test_segment_reopened_after_crash_is_not_glued(tmp_path):
+    ledger = _open(tmp_path)
+    asyncio.run(ledger.create_user("a"))
+    _crash(ledger)
+    segment = ledger._segments()[-1]
+    # Сегмент нового запуска начинается с той же записи, что и сегмент
+    # с недописанной строкой.
+    segment.write_bytes(b'[1,"c",1,"a"')
+
+    recovered = _open(tmp_path)
+    assert recovered.accounts == {}
+    asyncio.run(recovered.create_user("b"))
+    expected = _state(recovered)
+    _crash(recovered)
+    assert _state(_open(tmp_path)) == expected
+
+
+def test_snapshot_with_account_tuples_is_loaded(tmp_path):
+    created_ts = time.time()
+    state = {
+        "lsn": 2,
+        "accounts": [(1, "a", 5.0, 2, created_ts)],
+        "entry_user": array("q", [1]),
+        "entry_amount": array("d", [5.0]),
+        "entry_type": array("b", [0]),
+        "entry_ts": array("d", [created_ts]),
+    }
+    with open(tmp_path / SNAPSHOT_FILE, "wb") as snapshot_file:
+        pickle.dump(state, snapshot_file)
+
+    ledger = _open(tmp_path)
+    assert ledger.names == {"a": 1}
+    assert ledger.accounts[1].balance == 5.0
+    assert ledger.accounts[1].closed_ts is None
+    asyncio.run(ledger.deposit(1, 1))
+    asyncio.run(ledger.close())
+    assert _open(tmp_path).accounts[1].version == 3
@@ -0,0 +1,49 @@
+"""
+Применение и откат всех миграций на SQLite, в том числе на нескольких
+шардах (SHARD_URLS), как в инструкции для локального запуска.
+"""
+import json
+import sqlite3
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _config() -> Config:
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    return config
+
+
+def _tables(path: Path) -> set:
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        ).fetchall()
+    return {name for name, in rows}
+
+
+def test_upgrade_and_downgrade_on_sqlite_shards(tmp_path, monkeypatch):
+    shard0 = tmp_path / "shard0.db"
+    shard1 = tmp_path / "shard1.db"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{shard0}")
+    monkeypatch.setenv(
+        "SHARD_URLS", json.dumps([f"sqlite+aiosqlite:///{shard1}"])
+    )
+    config = _config()
+
+    command.upgrade(config, "head")
+    for path in (shard0, shard1):
+        assert {"users", "transactions", "holds", "id_counters"} <= (
+            _tables(path)
+        )
+    with sqlite3.connect(shard0) as conn:
+        counters = dict(conn.execute("SELECT id, last_id FROM id_counters"))
+    assert counters == {"users": 0, "scheduled_transfers": 0, "holds": 0}
+
+    command.downgrade(config, "base")
+    for path in (shard0, shard1):
+        assert _tables(path) == {"alembic_version"}
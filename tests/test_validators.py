@@ -0,0 +1,28 @@
+"""
+Проверки существования пользователей перевода.
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.api.models import User
+from app.api.validators import validate_users_exist
+from app.core.errors import ErrorMessages
+
+
+@pytest.mark.parametrize(
+    "from_user, to_user, detail",
+    [
+        (None, None, ErrorMessages.USER_SENDER_NOT_FOUND),
+        (None, User(id=2), ErrorMessages.USER_SENDER_NOT_FOUND),
+        (User(id=1), None, ErrorMessages.USER_RECIPIENT_NOT_FOUND),
+    ],
+)
+def test_missing_users_are_not_found(from_user, to_user, detail):
+    with pytest.raises(HTTPException) as exc_info:
+        validate_users_exist(from_user, to_user)
+    assert exc_info.value.status_code == 404
+    assert exc_info.value.detail == detail
+
+
+def test_existing_users_pass():
+    validate_users_exist(User(id=1), User(id=2))
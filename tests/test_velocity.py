@@ -0,0 +1,158 @@
+"""
+Лимиты списаний и переводов за скользящие окна: учет операций, время
+до повтора, отмена учета при ошибке запроса и восстановление счетчиков.
+"""
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import limit_withdraw_velocity
+from app.api.models import TransactionType
+from app.api.schemas import WithdrawRequest
+from app.core.config import Settings, VelocityRuleSettings
+from app.core.errors import ErrorMessages
+from app.core.velocity import (
+    VelocityChecker,
+    VelocityLimitExceeded,
+    velocity,
+)
+from app.storage.memory import MemoryLedger
+
+WITHDRAW = TransactionType.WITHDRAW
+TRANSFER = TransactionType.TRANSFER
+
+
+def _settings(*rules: VelocityRuleSettings) -> Settings:
+    return Settings(
+        app_title="test",
+        database_url="sqlite+aiosqlite://",
+        secret="secret",
+        postgres_db="test",
+        velocity_rules=list(rules),
+        velocity_buckets=6,
+    )
+
+
+def _checker(**rule) -> VelocityChecker:
+    checker = VelocityChecker()
+    checker.configure(
+        _settings(
+            VelocityRuleSettings(
+                name="rule", operations=["withdraw"], window=60, **rule
+            )
+        )
+    )
+    return checker
+
+
+def test_count_limit_slides_with_window():
+    checker = _checker(max_count=2)
+    checker.check(1, WITHDRAW, 10, now=5)
+    checker.check(1, WITHDRAW, 10, now=15)
+    with pytest.raises(VelocityLimitExceeded) as exc_info:
+        checker.check(1, WITHDRAW, 10, now=25)
+    assert exc_info.value.rule == "rule"
+    assert exc_info.value.retry_after == 35
+    checker.check(2, WITHDRAW, 10, now=25)
+    checker.check(1, WITHDRAW, 10, now=60)
+    with pytest.raises(VelocityLimitExceeded):
+        checker.check(1, WITHDRAW, 10, now=65)
+
+
+def test_amount_limit_reports_time_until_amount_fits():
+    checker = _checker(max_amount=100)
+    checker.check(1, WITHDRAW, 70, now=5)
+    checker.check(1, WITHDRAW, 20, now=15)
+    with pytest.raises(VelocityLimitExceeded) as exc_info:
+        checker.check(1, WITHDRAW, 40, now=25)
+    assert exc_info.value.retry_after == 35
+    checker.check(1, WITHDRAW, 10, now=25)
+
+
+def test_rule_applies_only_to_its_operations():
+    checker = _checker(max_count=1)
+    checker.check(1, WITHDRAW, 10, now=5)
+    for _ in range(3):
+        checker.check(1, TRANSFER, 10, now=5)
+
+
+def test_released_operation_is_not_counted():
+    checker = _checker(max_count=1, max_amount=100)
+    reservation = checker.check(1, WITHDRAW, 70, now=5)
+    checker.release(reservation)
+    checker.check(1, WITHDRAW, 100, now=6)
+    with pytest.raises(VelocityLimitExceeded):
+        checker.check(1, WITHDRAW, 1, now=7)
+
+
+def test_counters_are_rebuilt_from_ledger():
+    async def scenario():
+        ledger = MemoryLedger()
+        await ledger.create_user("a")
+        await ledger.create_user("b")
+        await ledger.deposit(1, 100)
+        await ledger.withdraw(1, 60)
+        await ledger.transfer(1, 2, 20)
+        return ledger
+
+    checker = VelocityChecker()
+    checker.configure(
+        _settings(
+            VelocityRuleSettings(
+                name="debits",
+                operations=["withdraw", "transfer"],
+                window=3600,
+                max_amount=100,
+            )
+        )
+    )
+    assert asyncio.run(checker.rebuild(asyncio.run(scenario()))) == 2
+    with pytest.raises(VelocityLimitExceeded):
+        checker.check(1, WITHDRAW, 30)
+    checker.check(1, WITHDRAW, 20)
+    checker.check(2, TRANSFER, 100)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(velocity, "_rules", None)
+    velocity.configure(
+        _settings(
+            VelocityRuleSettings(
+                name="withdrawals",
+                operations=["withdraw"],
+                window=60,
+                max_count=1,
+            )
+        )
+    )
+    app = FastAPI()
+
+    @app.post(
+        "/withdraw/{user_id}",
+        dependencies=[Depends(limit_withdraw_velocity)],
+    )
+    async def withdraw(
+        user_id: int, transaction: WithdrawRequest, fail: bool = False
+    ):
+        if fail:
+            raise HTTPException(status_code=400)
+        return {"user_id": user_id}
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_failed_request_releases_its_operation(client):
+    response = client.post(
+        "/withdraw/1", params={"fail": True}, json={"amount": 10}
+    )
+    assert response.status_code == 400
+    assert client.post("/withdraw/1", json={"amount": 10}).status_code == 200
+    response = client.post("/withdraw/1", json={"amount": 10})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+    assert response.json()["detail"] == ErrorMessages.VELOCITY_LIMIT_EXCEEDED
+    assert client.post("/withdraw/2", json={"amount": 10}).status_code == 200